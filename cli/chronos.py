@@ -3,19 +3,52 @@
 from __future__ import print_function
 import os
 import sys
-import requests
+import re
+import csv
+import copy
 import json
+import calendar
+import datetime
+import threading
+from requests.exceptions import RequestException
 from cli.framework import Framework
 from cli.appconfig import AppConfig
 from cli.utils import Utils
+from cli.httpclient import http_client
+from cli.responsecache import response_cache
+from cli.deploymentdocument import DeploymentDocument
+from cli.jsonstream import iter_json_items
+from cli.records import JobRecord
+from cli.definitiondiff import DefinitionDiff
 utils = Utils()
 
 
 class Chronos(Framework):
 
+    stream_chunk_size = 65536
+    job_fields = ('name', 'successCount', 'errorCount', 'lastSuccess', 'lastError', 'container')
+
+    # Fields Chronos fills in itself, ignored when comparing definitions
+    server_managed_fields = ['successCount', 'errorCount', 'lastSuccess', 'lastError', 'errorsSinceLastSuccess']
+    unordered_fields = ['parents', 'uris', 'fetch', 'environmentVariables', 'constraints']
+    # Values Chronos fills in for fields a job leaves out. A push replaces the
+    # whole job, so any other field the job does not set is a change.
+    default_fields = {
+        'shell': True, 'epsilon': 'PT60S', 'executor': '', 'executorFlags': '', 'taskInfoData': '',
+        'retries': 2, 'owner': '', 'ownerName': '', 'description': '', 'async': False, 'cpus': 0.1,
+        'mem': 128, 'disk': 256, 'disabled': False, 'softError': False, 'dataProcessingJobType': False,
+        'uris': [], 'fetch': [], 'environmentVariables': [], 'arguments': [], 'highPriority': False,
+        'runAsUser': 'root', 'constraints': [], 'concurrent': False, 'scheduleTimeZone': '',
+        'maxCompletionTime': 0, 'container': None, 'parents': [], 'schedule': ''}
+
     def __init__(self):
         self.user = None
         self.passw = None
+        # {environment: {job name: definition}}, fetched once per run
+        self.job_indexes = {}
+        self.job_index_lock = threading.Lock()
+        self.definitiondiff = DefinitionDiff(self.server_managed_fields, self.unordered_fields,
+                                             defaults=self.default_fields)
 
     def getName(self):
         return "Chronos"
@@ -24,43 +57,215 @@ class Chronos(Framework):
         self.fetchUserPass(environment)
         url = roger_env['environments'][environment][
             'chronos_endpoint'] + "/scheduler/jobs"
-        resp = requests.get(url, auth=(self.user, self.passw))
+        resp = response_cache.get(environment, url, auth=(self.user, self.passw))
         return resp.json()
 
     def put(self, file_path, environmentObj, container, environment, act_as_user):
         self.fetchUserPass(environment)
-        data = open(file_path).read()
+        document = DeploymentDocument.load(file_path)
+        data = document.data
         chronos_resource = "scheduler/iso8601"
-        if 'parents' in json.loads(data):
+        if 'parents' in document.tree:
             chronos_resource = "scheduler/dependency"
 
         print("TRIGGERING CHRONOS FRAMEWORK UPDATE FOR: {}".format(container))
         print("curl -X PUT -H 'Content-type: application/json' --data-binary @{} {}/{}".format(
-            file_path, environmentObj['chronos_endpoint'], chronos_resource))
+            document.location, environmentObj['chronos_endpoint'], chronos_resource))
         endpoint = environmentObj['chronos_endpoint']
         deploy_url = "{}/{}".format(endpoint, chronos_resource)
 
         if not act_as_user:
-            resp = requests.put(deploy_url, data=data, headers={
-                                'Content-type': 'application/json'}, auth=(self.user, self.passw))
+            resp = http_client.put(deploy_url, data=data, headers={
+                                   'Content-type': 'application/json'}, auth=(self.user, self.passw))
         else:
-            resp = requests.put(deploy_url, data=data, headers={
-                                'Content-type': 'application/json', 'act-as-user': act_as_user}, auth=(self.user, self.passw))
+            resp = http_client.put(deploy_url, data=data, headers={
+                                   'Content-type': 'application/json', 'act-as-user': act_as_user}, auth=(self.user, self.passw))
         chronos_message = "{}".format(resp)
         print(chronos_message)
+        response_cache.invalidate(environment)
         task_id = []
-        body = json.loads(data)
-        if 'name' in body:
-            task_id.append(body['name'])
+        if 'name' in document.tree:
+            task_id.append(document.name)
+            if str(resp.status_code).startswith("20"):
+                self.updateJobIndex(environment, document.tree)
 
         return resp, task_id
 
+    def isBatchable(self, file_path):
+        return False
+
+    def getPushLevels(self, file_paths, environmentObj, environment):
+        """
+        orders jobs by their parents so that parents are pushed before their
+        children. Cycles are found locally first, then parents that are not part
+        of this push are looked up in the jobs already in Chronos, with a single
+        request.
+
+        :params:
+        :file_paths [list]: rendered job definitions, as paths or DeploymentDocuments
+        :environmentObj [dict]: environment section of roger-mesos-tools.config
+        :environment [str]: environment name
+        :return: [list] levels of indexes into file_paths. Jobs in a level do not
+                 depend on each other, and every parent is in an earlier level.
+        :raises ValueError: on parents neither pushed nor in Chronos, or dependency cycles
+        """
+        documents = [DeploymentDocument.load(file_path) for file_path in file_paths]
+        index_by_name = {}
+        for index, document in enumerate(documents):
+            index_by_name[document.tree.get('name')] = index
+
+        children = [[] for document in documents]
+        parent_counts = [0] * len(documents)
+        missing = []
+        for index, document in enumerate(documents):
+            for parent in document.tree.get('parents', []):
+                if parent in index_by_name:
+                    children[index_by_name[parent]].append(index)
+                    parent_counts[index] += 1
+                else:
+                    missing.append((parent, document.tree.get('name')))
+
+        levels = []
+        level = [index for index in range(len(documents)) if parent_counts[index] == 0]
+        while level:
+            levels.append(level)
+            next_level = []
+            for index in level:
+                for child in children[index]:
+                    parent_counts[child] -= 1
+                    if parent_counts[child] == 0:
+                        next_level.append(child)
+            level = sorted(next_level)
+
+        cyclic = [documents[index].tree.get('name') for index in range(len(documents)) if parent_counts[index] > 0]
+        if cyclic:
+            raise ValueError("Dependency cycle between Chronos jobs: {}".format(", ".join(cyclic)))
+
+        # Parents outside the push need a request, so they are checked last
+        if missing:
+            try:
+                jobs = self.getJobIndex(environmentObj['chronos_endpoint'], environment)
+            except (RequestException, ValueError) as e:
+                print("WARNING: Could not check that parent jobs {} exist in Chronos: {}".format(
+                    ", ".join(sorted(set(parent for parent, child in missing))), e), file=sys.stderr)
+                jobs = None
+            missing = [(parent, child) for parent, child in missing if jobs is not None and parent not in jobs]
+            if missing:
+                raise ValueError("Parent jobs neither part of this push nor in Chronos: {}".format(
+                    ", ".join("{} (parent of {})".format(parent, child) for parent, child in missing)))
+        return levels
+
     def runDeploymentChecks(self, file_path, environment):
         print("No deployment checks for Chronos")
         return True
 
+    def waitForDeployment(self, resp, environmentObj, environment, timeout):
+        print("No deployments to wait for in Chronos")
+        return True
+
+    def matchesRunningDefinition(self, file_path, environmentObj, environment, act_as_user):
+        """
+        compares the rendered job with the one in Chronos and prints a compact diff
+        when they differ. All jobs of the environment are fetched once and indexed
+        by name, so checking many jobs costs a single request.
+
+        :params:
+        :file_path [str]: path to the rendered job, or its DeploymentDocument
+        :environmentObj [dict]: environment section of roger-mesos-tools.config
+        :environment [str]: environment name
+        :act_as_user [str]: user to act as, if any
+        :return: [bool] True if nothing meaningful changed, False if it changed and
+                 None if the job is not in Chronos yet
+        """
+        document = DeploymentDocument.load(file_path)
+        name = document.tree.get('name')
+        try:
+            jobs = self.getJobIndex(environmentObj['chronos_endpoint'], environment)
+        except (RequestException, ValueError) as e:
+            print("Could not fetch jobs from Chronos: {}".format(e), file=sys.stderr)
+            return False
+        if name not in jobs:
+            print("{} is not in Chronos yet.".format(name))
+            return None
+
+        changes = self.definitiondiff.diff(self.normalizeJob(document.tree), self.normalizeJob(jobs[name]))
+        if not changes:
+            print("{} matches the job in Chronos.".format(name))
+            return True
+        print("Changes for {} ({} total):".format(name, len(changes)))
+        for change in changes[:20]:
+            print("  {}".format(change))
+        if len(changes) > 20:
+            print("  ...")
+        return False
+
+    iso_start = re.compile(r'^(\d{4}-\d{2}-\d{2})T(\d{2}):(\d{2}):(\d{2}(?:\.\d+)?)(Z|[+-]\d{2}:?\d{2})?$')
+    iso_period = re.compile(r'^P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+(?:\.\d+)?)S)?)?$')
+
+    def normalizeJob(self, job):
+        if 'schedule' not in job:
+            return job
+        job = copy.copy(job)
+        job['schedule'] = self.normalizeSchedule(job['schedule'])
+        return job
+
+    def normalizeSchedule(self, schedule):
+        """
+        Chronos moves the start of an ISO8601 schedule forward by its period as
+        the job runs. Replaces the start with its first run after 1970-01-01 UTC,
+        so only the date Chronos advances is ignored: the time of day, timezone
+        and repetitions are still compared. For periods in months or years, whose
+        length varies, only the date of the start is dropped.
+        """
+        parts = schedule.split('/')
+        match = self.iso_start.match(parts[1]) if len(parts) == 3 else None
+        if match is None:
+            return schedule
+        date, hours, minutes, seconds, zone = match.groups()
+        zone = zone or 'Z'
+        period = self.iso_period.match(parts[2])
+        if period is None:
+            seconds = seconds.rstrip('0').rstrip('.') if '.' in seconds else seconds
+            return '/'.join([parts[0], 'T{}:{}:{}{}'.format(hours, minutes, seconds, zone), parts[2]])
+        weeks, days, period_hours, period_minutes, period_seconds = [float(value or 0) for value in period.groups()]
+        length = (((weeks * 7 + days) * 24 + period_hours) * 60 + period_minutes) * 60 + period_seconds
+        if length <= 0:
+            return schedule
+        offset = 0
+        if zone != 'Z':
+            sign = -1 if zone[0] == '-' else 1
+            offset = sign * (int(zone[1:3]) * 3600 + int(zone[-2:]) * 60)
+        start = (calendar.timegm(datetime.datetime.strptime(date, '%Y-%m-%d').timetuple()) +
+                 int(hours) * 3600 + int(minutes) * 60 + float(seconds) - offset)
+        first_run = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=start % length)
+        return '/'.join([parts[0], first_run.isoformat() + 'Z', parts[2]])
+
+    def getJobIndex(self, endpoint, environment):
+        """
+        returns {job name: definition} for all jobs of the environment, fetching
+        /scheduler/jobs only the first time
+        """
+        with self.job_index_lock:
+            if environment not in self.job_indexes:
+                jobs = {}
+                # Not from the response cache, the index decides what gets pushed
+                for job in self.iterJobs(endpoint, environment, cached=False):
+                    if 'name' in job:
+                        jobs[job['name']] = job
+                self.job_indexes[environment] = jobs
+            return self.job_indexes[environment]
+
+    def updateJobIndex(self, environment, job):
+        with self.job_index_lock:
+            if environment in self.job_indexes:
+                self.job_indexes[environment][job['name']] = job
+
     def getCurrentImageVersion(self, roger_env, environment, application):
-        data = self.get(roger_env, environment)
+        self.fetchUserPass(environment)
+        url = roger_env['environments'][environment][
+            'chronos_endpoint'] + "/scheduler/jobs/search"
+        resp = response_cache.get(environment, url, params={'name': application}, auth=(self.user, self.passw))
+        data = resp.json()
         for app in data:
             if 'name' in app:
                 if application in app['name'] and 'container' in app:
@@ -75,7 +280,65 @@ class Chronos(Framework):
                         return docker_image
 
     def getTasks(self, roger_env, environment):
-        print("Not yet implemented!")
+        return list(self.iterJobStatus(roger_env, environment))
+
+    def iterJobStatus(self, roger_env, environment):
+        """
+        yields a JobRecord per job, joining the scheduler graph (last run status and
+        state) with the job definitions (run counts, last run and image). Both
+        responses are parsed as they are downloaded, only the graph is kept in memory.
+        """
+        endpoint = roger_env['environments'][environment]['chronos_endpoint']
+        graph = self.getGraph(endpoint, environment)
+        for job in self.iterJobs(endpoint, environment, self.job_fields):
+            name = job.get('name')
+            last_status, state = graph.get(name, ("", ""))
+            image = (job.get('container') or {}).get('image', "")
+            yield JobRecord(name, state, last_status, max(job.get('lastSuccess') or "", job.get('lastError') or ""),
+                            job.get('successCount', 0), job.get('errorCount', 0), image)
+
+    def getGraph(self, endpoint, environment):
+        """
+        returns {job name: (last run status, state)} from /scheduler/graph/csv,
+        e.g. ("success", "idle") or ("failure", "running")
+        """
+        resp = self.fetch(endpoint, environment, '/scheduler/graph/csv', 'graph', True)
+        graph = {}
+        try:
+            for row in csv.reader(resp.iter_lines(self.stream_chunk_size)):
+                # node,<name>,<last status>[,<state>]; link rows describe dependencies
+                if len(row) >= 3 and row[0] == 'node':
+                    graph[row[1]] = (row[2], row[3] if len(row) > 3 else "")
+        finally:
+            resp.close()
+        return graph
+
+    def iterJobs(self, endpoint, environment, fields=None, cached=True):
+        """
+        yields the job definitions one at a time, parsing /scheduler/jobs as it is
+        downloaded
+
+        :params:
+        :fields [tuple]: keep only these keys of each job
+        :cached [bool]: allow an answer from the response cache
+        """
+        resp = self.fetch(endpoint, environment, '/scheduler/jobs', 'jobs', True, cached)
+        try:
+            for job in iter_json_items(resp.iter_content(self.stream_chunk_size), None, fields):
+                yield job
+        finally:
+            resp.close()
+
+    def fetch(self, endpoint, environment, path, name, stream=False, cached=True):
+        self.fetchUserPass(environment)
+        url = endpoint + path
+        if cached:
+            resp = response_cache.get(environment, url, stream=stream, auth=(self.user, self.passw))
+        else:
+            resp = http_client.get(url, stream=stream, auth=(self.user, self.passw))
+        print (
+            "Server response for {}: [ {} - {} ]".format(name, resp.status_code, resp.reason))
+        return resp
 
     def get_image_name(
         self,
@@ -92,6 +355,6 @@ class Chronos(Framework):
         url = '{location}/scheduler/jobs/search?name={name}'.format(
             location=location, name=name)
 
-        res = requests.get(url, auth=(username, password))
+        res = response_cache.get(env, url, auth=(username, password))
         imagename = res.json()[0]['container']['image']
         return imagename
@@ -18,10 +18,9 @@ class ContainerConfig:
     def get_hostname_from_marathon(self, environment, roger_env, appTaskId):
         hostname = ''
         marathon = Marathon()
-        tasks = marathon.getTasks(roger_env, environment)
-        for task in tasks:
-            if task['id'].startswith(appTaskId):
-                hostname = task['host']
+        task = marathon.findTask(roger_env, environment, appTaskId)
+        if task is not None:
+            hostname = task['host']
 
         return hostname
 
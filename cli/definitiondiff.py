@@ -0,0 +1,154 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import json
+
+
+# Default value of a field that the framework picks itself, any value matches
+ANY_VALUE = object()
+NO_DEFAULT = object()
+
+
+class DefinitionDiff:
+    '''Compares a rendered framework definition with the one that is running.
+
+    Both sides are canonicalised first: server-managed fields are stripped, ids
+    are made relative, nested apps and groups are matched by id and set-like
+    lists are sorted.
+
+    A running value that the rendered definition does not set is a change,
+    except where the framework fills it in itself: fields listed in defaults
+    (by path, like 'container.docker.portMappings[].servicePort') whose running
+    value is their default, and, with partial_update, every top-level field of
+    the definition, as a PUT leaves the fields it does not set unchanged.'''
+
+    def __init__(self, ignored_fields, unordered_fields=(), nested_fields=(), defaults=None,
+                 partial_update=False):
+        self.ignored_fields = set(ignored_fields)
+        self.unordered_fields = set(unordered_fields)
+        self.nested_fields = set(nested_fields)
+        self.defaults = defaults if defaults is not None else {}
+        self.partial_update = partial_update
+
+    def normalize_id(self, value):
+        if isinstance(value, basestring):
+            return value.rstrip('/').split('/')[-1]
+        return value
+
+    def sort_key(self, value):
+        return json.dumps(value, sort_keys=True)
+
+    def is_default(self, path, value):
+        default = self.defaults.get(path, NO_DEFAULT)
+        if default is NO_DEFAULT:
+            return False
+        return default is ANY_VALUE or default == value
+
+    def child_path(self, path, key):
+        return "{}.{}".format(path, key) if path else key
+
+    def canonicalize(self, desired, live, is_definition=False, path='', is_root=False):
+        '''Returns (desired, live) reduced to comparable values. path is the
+        position in the definition, with '[]' for list items.'''
+        if isinstance(desired, dict):
+            if not isinstance(live, dict):
+                return self.canonicalize(desired, {}, is_definition, path)[0], live
+            desired_c = {}
+            live_c = {}
+            for key, value in desired.items():
+                if is_definition and key in self.ignored_fields:
+                    continue
+                if key == 'id' and is_definition:
+                    desired_c[key] = self.normalize_id(value)
+                    if key in live:
+                        live_c[key] = self.normalize_id(live[key])
+                    continue
+                live_value = live.get(key, None)
+                if key in self.nested_fields and isinstance(value, list):
+                    desired_c[key], live_c[key] = self.canonicalize_nested(value, live_value)
+                elif key in self.unordered_fields and isinstance(value, list):
+                    desired_c[key] = sorted(value, key=self.sort_key)
+                    if isinstance(live_value, list):
+                        live_c[key] = sorted(live_value, key=self.sort_key)
+                    elif key in live:
+                        live_c[key] = live_value
+                else:
+                    desired_c[key], live_value = self.canonicalize(value, live_value,
+                                                                   path=self.child_path(path, key))
+                    if key in live:
+                        live_c[key] = live_value
+            for key, live_value in live.items():
+                if key in desired or (is_definition and key in self.ignored_fields):
+                    continue
+                if (is_root and self.partial_update) or self.is_default(self.child_path(path, key), live_value):
+                    continue
+                live_c[key] = live_value
+            return desired_c, live_c
+        if isinstance(desired, list):
+            if not isinstance(live, list):
+                return desired, live
+            desired_c = []
+            live_c = []
+            for index, value in enumerate(desired):
+                if index < len(live):
+                    value, live_value = self.canonicalize(value, live[index], path=path + '[]')
+                    live_c.append(live_value)
+                desired_c.append(value)
+            live_c.extend(live[len(desired):])
+            return desired_c, live_c
+        return desired, live
+
+    def canonicalize_nested(self, desired, live):
+        '''Matches nested definitions (apps/groups) by their relative id'''
+        live_by_id = {}
+        if isinstance(live, list):
+            for item in live:
+                if isinstance(item, dict):
+                    live_by_id[self.normalize_id(item.get('id'))] = item
+        desired_c = {}
+        live_c = {}
+        for item in desired:
+            if isinstance(item, list):
+                # Some templates nest the apps of a group in an extra list
+                nested_desired, nested_live = self.canonicalize_nested(item, live)
+                desired_c.update(nested_desired)
+                live_c.update(nested_live)
+                continue
+            item_id = self.normalize_id(item.get('id'))
+            value, live_value = self.canonicalize(item, live_by_id.get(item_id, {}), True)
+            desired_c[item_id] = value
+            if item_id in live_by_id:
+                live_c[item_id] = live_value
+        for item_id in live_by_id:
+            if item_id not in desired_c:
+                live_c[item_id] = '<running>'
+        return desired_c, live_c
+
+    def compare(self, desired, live, path, changes):
+        if isinstance(desired, dict) and isinstance(live, dict):
+            for key in sorted(set(desired.keys()) | set(live.keys())):
+                child_path = "{}.{}".format(path, key) if path else str(key)
+                if key not in live:
+                    changes.append("{}: (missing) -> {}".format(child_path, self.format_value(desired[key])))
+                elif key not in desired:
+                    changes.append("{}: {} -> (removed)".format(child_path, self.format_value(live[key])))
+                else:
+                    self.compare(desired[key], live[key], child_path, changes)
+        elif isinstance(desired, list) and isinstance(live, list) and len(desired) == len(live):
+            for index in range(len(desired)):
+                self.compare(desired[index], live[index], "{}[{}]".format(path, index), changes)
+        elif desired != live:
+            changes.append("{}: {} -> {}".format(path or '.', self.format_value(live), self.format_value(desired)))
+
+    def format_value(self, value, max_length=80):
+        text = json.dumps(value, sort_keys=True)
+        if len(text) > max_length:
+            text = text[:max_length - 3] + "..."
+        return text
+
+    def diff(self, desired, live):
+        '''Returns a list of "path: running -> rendered" changes, empty if both match'''
+        desired_c, live_c = self.canonicalize(desired, live, True, is_root=True)
+        changes = []
+        self.compare(desired_c, live_c, "", changes)
+        return changes
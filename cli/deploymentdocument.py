@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import json
+from collections import OrderedDict
+from cli.utils import Utils
+
+utils = Utils()
+
+
+class DeploymentDocument:
+    '''A rendered framework definition (Marathon app or group, Chronos job),
+    parsed once and shared by validation, the diff against the running
+    definition, the PUT and task id generation.
+
+    Holds the parsed tree, the serialized text that is sent to the framework and
+    the facts derived from them.'''
+
+    def __init__(self, tree, data=None, path=None):
+        self.tree = tree
+        self.data = data if data is not None else json.dumps(tree)
+        self.path = path
+        self.is_group = isinstance(tree, dict) and 'groups' in tree
+        self._app_details = None
+        self._task_ids = None
+
+    @classmethod
+    def parse(cls, data, path=None):
+        return cls(json.loads(data), data, path)
+
+    @classmethod
+    def load(cls, source):
+        '''Returns source itself if it is a DeploymentDocument, otherwise reads and
+        parses the rendered file at the path source'''
+        if isinstance(source, DeploymentDocument):
+            return source
+        with open(source) as fh:
+            return cls.parse(fh.read(), source)
+
+    @property
+    def id(self):
+        return self.tree['id']
+
+    @property
+    def name(self):
+        '''Name of a Chronos job'''
+        return self.tree['name']
+
+    @property
+    def location(self):
+        '''Path of the rendered file, for messages'''
+        return self.path if self.path is not None else "<{}>".format(self.tree.get('id', self.tree.get('name', '')))
+
+    @property
+    def app_details(self):
+        '''{absolute app id: (HTTP_PREFIX, list of TCP_PORTS, affinity enabled)} for
+        the app, or for every app of a group, in document order'''
+        if self._app_details is None:
+            details = OrderedDict()
+            if self.is_group:
+                base_id = self.absolute_id(self.tree['id'])
+                for group in self.tree['groups']:
+                    if 'id' not in group:
+                        continue
+                    group_id = self.absolute_id(group['id'])
+                    for app in self.iter_apps(group.get('apps', [])):
+                        app_id = self.absolute_id(app.get('id', ''))
+                        details["{}{}{}".format(base_id, group_id, app_id)] = self.get_env_details(app)
+            else:
+                details[self.absolute_id(self.tree['id'])] = self.get_env_details(self.tree)
+            self._app_details = details
+        return self._app_details
+
+    @property
+    def app_ids(self):
+        return self.app_details.keys()
+
+    @property
+    def task_ids(self):
+        if self._task_ids is None:
+            self._task_ids = utils.generate_task_id_list(self.tree)
+        return self._task_ids
+
+    def absolute_id(self, app_id):
+        if not app_id.startswith("/"):
+            app_id = "/" + app_id
+        return app_id
+
+    def iter_apps(self, apps):
+        # Some templates nest the apps of a group in an extra list
+        for app in apps:
+            if isinstance(app, list):
+                for item in self.iter_apps(app):
+                    yield item
+            else:
+                yield app
+
+    def get_env_details(self, app):
+        http_prefix = ""
+        tcp_port_list = []
+        enable_affinity = False
+        env = app.get('env') or {}
+        if 'HTTP_PREFIX' in env:
+            http_prefix = env['HTTP_PREFIX']
+        if 'TCP_PORTS' in env:
+            tcp_port_list = json.loads(env['TCP_PORTS']).keys()
+        if 'ENABLE_AFFINITY' in env and env['ENABLE_AFFINITY'] != "":
+            enable_affinity = True
+        return (http_prefix, tcp_port_list, enable_affinity)
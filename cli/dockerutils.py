@@ -5,8 +5,8 @@ import os
 import subprocess
 import sys
 import contextlib
-import requests
 import json
+from cli.httpclient import http_client
 
 
 @contextlib.contextmanager
@@ -47,7 +47,7 @@ class DockerUtils:
 
     def docker_search_v2(self, registry):
         url = 'http://{}/v2/_catalog?n=500'.format(registry)
-        response = requests.get(url)
+        response = http_client.get(url)
         data = response.json()
         tmp_repos_list = data['repositories']
         result = ""
@@ -56,7 +56,7 @@ class DockerUtils:
                 result += item + '\n'
             last_fetched_repo = tmp_repos_list[-1]
             url = 'http://{}/v2/_catalog?n=100&last={}'.format(registry, last_fetched_repo)
-            response = requests.get(url)
+            response = http_client.get(url)
             data = response.json()
             tmp_repos_list = data['repositories']
 
@@ -5,8 +5,8 @@ import os
 import sys
 import yaml
 
-from jinja2 import Environment, FileSystemLoader
 from cli.settings import Settings
+from cli.templatecache import template_cache
 from abc import ABCMeta, abstractmethod
 
 settings = Settings()
@@ -37,7 +37,12 @@ class Framework(object):
             key = "name"
         dir_name = os.path.dirname(template_file)
         file_name = os.path.basename(template_file)
-        env = Environment(loader=FileSystemLoader(dir_name))
+        try:
+            cache_dir = template_cache.get_cache_dir(settings.getComponentsDir())
+        except ValueError:
+            # No $ROGER_COMPONENTS_DIR, compiled templates are only kept in memory
+            cache_dir = None
+        env = template_cache.get_environment(dir_name, cache_dir)
         template = env.get_template(file_name)
         return yaml.safe_load(str(template.module))[key]
 
@@ -53,10 +58,42 @@ class Framework(object):
     def put(self, file_path, environmentObj, container, environment, act_as_user):
         pass
 
+    @abstractmethod
+    def isBatchable(self, file_path):
+        pass
+
+    def putBatch(self, file_paths, environmentObj, containers, environment, act_as_user):
+        """
+        pushes the definitions one by one, for frameworks without a request that
+        takes several of them. Returns the first failed response, else the last
+        one, and the task ids of each definition.
+        """
+        resp = None
+        failed_resp = None
+        task_id_lists = []
+        for file_path, container in zip(file_paths, containers):
+            resp, task_id = self.put(file_path, environmentObj, container, environment, act_as_user)
+            task_id_lists.append(task_id)
+            if failed_resp is None and not str(getattr(resp, "status_code", "")).startswith("20"):
+                failed_resp = resp
+        return (failed_resp if failed_resp is not None else resp), task_id_lists
+
+    @abstractmethod
+    def getPushLevels(self, file_paths, environmentObj, environment):
+        pass
+
     @abstractmethod
     def runDeploymentChecks(self, file_path, environment):
         pass
 
+    @abstractmethod
+    def waitForDeployment(self, resp, environmentObj, environment, timeout):
+        pass
+
+    @abstractmethod
+    def matchesRunningDefinition(self, file_path, environmentObj, environment, act_as_user):
+        pass
+
     @abstractmethod
     def getCurrentImageVersion(self, roger_env, environment, application):
         pass
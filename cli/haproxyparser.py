@@ -2,64 +2,315 @@
 
 from __future__ import print_function
 import os
-import requests
 import subprocess
 import sys
 import re
+import json
+import tempfile
+import threading
+import time
+from requests.exceptions import HTTPError
 from cli.appconfig import AppConfig
 from cli.settings import Settings
+from cli.httpclient import http_client
+from cli.records import ReadOnlyDict
+
+
+class RoutingSnapshot(object):
+    '''The routes of one environment's HAProxy config as of one fetch. Snapshots
+    never change once built: a refresh builds a new snapshot and swaps it in, so
+    threads holding the previous one keep a consistent view without locking.
+
+    Has the same getters as HAProxyParser, so it can be passed wherever a parsed
+    parser is read, e.g. to the MarathonValidator checks.'''
+
+    __slots__ = ('environment', 'fetched_at', 'etag', 'last_modified', 'path_begin_values',
+                 'backend_tcp_ports', 'backend_path_begin_values', 'backend_tcp_port_lists')
+
+    def __init__(self, environment, path_begin_values, backend_tcp_ports, backend_path_begin_values=None,
+                 backend_tcp_port_lists=None, fetched_at=None, etag=None, last_modified=None):
+        if backend_path_begin_values is None:
+            backend_path_begin_values = self.invert(path_begin_values)
+        if backend_tcp_port_lists is None:
+            backend_tcp_port_lists = self.invert(backend_tcp_ports)
+        values = {
+            'environment': environment,
+            'fetched_at': fetched_at if fetched_at is not None else time.time(),
+            'etag': etag,
+            'last_modified': last_modified,
+            'path_begin_values': ReadOnlyDict(path_begin_values),
+            'backend_tcp_ports': ReadOnlyDict(backend_tcp_ports),
+            'backend_path_begin_values': ReadOnlyDict(
+                (key, tuple(value)) for key, value in backend_path_begin_values.items()),
+            'backend_tcp_port_lists': ReadOnlyDict(
+                (key, tuple(value)) for key, value in backend_tcp_port_lists.items())
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Routing snapshots are read-only")
+
+    def invert(self, routes):
+        inverse = {}
+        for key in sorted(routes):
+            inverse.setdefault(routes[key], []).append(key)
+        return inverse
+
+    def refreshed(self, fetched_at=None):
+        '''Returns a snapshot with the same routes, e.g. after a 304 Not Modified'''
+        return RoutingSnapshot(self.environment, self.path_begin_values, self.backend_tcp_ports,
+                               self.backend_path_begin_values, self.backend_tcp_port_lists,
+                               fetched_at, self.etag, self.last_modified)
+
+    def save(self, path):
+        '''Writes the snapshot to path as compact JSON, e.g. for validation without
+        access to the HAProxy config. The inverse maps are rebuilt on load.'''
+        data = {
+            'format': 1,
+            'environment': self.environment,
+            'created_at': self.fetched_at,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'path_begin_values': self.path_begin_values,
+            'backend_tcp_ports': self.backend_tcp_ports
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(data, fh, separators=(',', ':'), sort_keys=True)
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fh:
+            data = json.load(fh)
+        if data.get('format') != 1:
+            raise ValueError("Unsupported routing snapshot format in {}.".format(path))
+        return cls(data['environment'], data['path_begin_values'], data['backend_tcp_ports'],
+                   fetched_at=data['created_at'], etag=data.get('etag'), last_modified=data.get('last_modified'))
+
+    def get_path_begin_values(self):
+        return self.path_begin_values
+
+    def get_backend_tcp_ports(self):
+        return self.backend_tcp_ports
+
+    def get_path_begin_values_by_backend(self):
+        return self.backend_path_begin_values
+
+    def get_tcp_ports_by_backend(self):
+        return self.backend_tcp_port_lists
 
 
 class HAProxyParser:
 
-    path_begin_values = {}
-    backend_services_tcp_ports = {}
+    # Snapshot read by the getters, set by parseConfig
+    snapshot = RoutingSnapshot(None, {}, {}, fetched_at=0)
+
+    # Rules are matched line by line, and only on lines that can contain them
+    backend_rule_pattern = re.compile("^( ).*use_backend (.*)-cluster.* if (.*)-aclrule$")
+    backend_service_pattern = re.compile("^listen (.*)-cluster-tcp-(.*) :(.*)")
+
+    # RoutingSnapshots shared by every parser in the process, keyed by
+    # environment. Snapshots are replaced once they are older than the ttl,
+    # using a conditional request when the server sent ETag/Last-Modified.
+    # Reading a fresh snapshot takes no lock; refreshes take a lock per
+    # environment so that only one thread fetches each config.
+    snapshots = {}
+    # The ttl of each environment's snapshot, read from roger-mesos-tools.config
+    # when it was fetched, so fresh snapshots are returned without reading it
+    snapshot_ttls = {}
+    refresh_locks = {}
+    cache_lock = threading.Lock()
 
-    def get_haproxy_config(self, environment):
-        haproxy_config = ""
+    # Snapshots loaded from files written by `roger routes snapshot`, keyed by
+    # environment: (snapshot, path, max age in seconds or None). They are used
+    # instead of the HAProxy config until they are older than their max age.
+    saved_snapshots = {}
+    default_cache_ttl = 60
+
+    def get_roger_env(self):
         settingObj = Settings()
         appObj = AppConfig()
         config_dir = settingObj.getConfigDir()
-        roger_env = appObj.getRogerEnv(config_dir)
+        return appObj.getRogerEnv(config_dir)
+
+    def get_haproxy_config_url(self, roger_env, environment):
         host = roger_env['environments'][environment]['host']
         haproxy_config_path = roger_env['environments'][
             environment]['haproxy_config_path']
-        url = "{}{}".format(host, haproxy_config_path)
-        haproxy_config = requests.get(url, stream=True)
-        return haproxy_config.text
+        return "{}{}".format(host, haproxy_config_path)
 
-    def parseConfig(self, environment):
+    def get_cache_ttl(self, roger_env):
+        return float(roger_env.get('haproxy_cache_ttl', self.default_cache_ttl))
+
+    def fetch_haproxy_config(self, url, etag=None, last_modified=None):
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return http_client.get(url, stream=True, headers=headers)
+
+    def parse_config_text(self, config):
+        path_begin_values, backend_tcp_ports, backend_path_begins, backend_ports = \
+            self.parse_config_lines(config.splitlines())
+        return path_begin_values, backend_tcp_ports
+
+    def parse_config_lines(self, lines):
+        '''Builds the routing maps in a single pass over the config lines. Returns
+        (path begin value -> backend, tcp port -> backend, backend -> list of path
+        begin values, backend -> list of tcp ports), lists in config order.'''
         path_begin_values = {}
         backend_tcp_ports = {}
-        config = self.get_haproxy_config(environment)
-
-        backend_rules_pattern = re.compile(
-            "^( ).*use_backend (.*)-cluster.* if (.*)-aclrule$", re.MULTILINE)
-        backend_rules = backend_rules_pattern.findall(config)
-        backend_service_pattern = re.compile(
-            "^listen (.*)-cluster-tcp-(.*) :(.*)", flags=re.MULTILINE)
-        backends_service_names = backend_service_pattern.findall(config)
-        for rule in backend_rules:
-            backend_name = rule[1].replace("::", "/")
-            path_begin_value = rule[2].replace("::", "/")
-            path_begin_values[path_begin_value] = backend_name
-
-        for service in backends_service_names:
-            backend_service_name = service[0].replace("::", "/")
-            tcp_port = service[2]
-            backend_tcp_ports[tcp_port] = backend_service_name
-
-        self.set_path_begin_values(path_begin_values)
-        self.set_backend_tcp_ports(backend_tcp_ports)
+        backend_path_begins = {}
+        backend_ports = {}
+
+        for line in lines:
+            if line.startswith(' '):
+                if 'use_backend' not in line:
+                    continue
+                rule = self.backend_rule_pattern.match(line)
+                if rule is None:
+                    continue
+                backend_name = rule.group(2).replace("::", "/")
+                path_begin_value = rule.group(3).replace("::", "/")
+                self.add_route(path_begin_values, backend_path_begins, path_begin_value, backend_name)
+            elif line.startswith('listen '):
+                service = self.backend_service_pattern.match(line)
+                if service is None:
+                    continue
+                backend_service_name = service.group(1).replace("::", "/")
+                tcp_port = service.group(3)
+                self.add_route(backend_tcp_ports, backend_ports, tcp_port, backend_service_name)
+
+        return path_begin_values, backend_tcp_ports, backend_path_begins, backend_ports
+
+    def add_route(self, routes, backend_routes, key, backend_name):
+        # The last rule for a key wins, as with the former findall over the config
+        previous = routes.get(key)
+        if previous is not None:
+            backend_routes[previous].remove(key)
+            if not backend_routes[previous]:
+                del backend_routes[previous]
+        routes[key] = backend_name
+        backend_routes.setdefault(backend_name, []).append(key)
+
+    def get_refresh_lock(self, environment):
+        with self.cache_lock:
+            if environment not in self.refresh_locks:
+                self.refresh_locks[environment] = threading.Lock()
+            return self.refresh_locks[environment]
+
+    def is_fresh(self, snapshot, ttl):
+        return snapshot is not None and time.time() - snapshot.fetched_at < ttl
+
+    def use_snapshot_file(self, path, environment=None, max_age=None):
+        '''Validates against the routes saved at path instead of fetching the HAProxy
+        config, until the saved routes are older than max_age seconds'''
+        snapshot = RoutingSnapshot.load(path)
+        if environment is not None and snapshot.environment != environment:
+            raise ValueError("Routing snapshot {} is for environment '{}', not '{}'.".format(
+                path, snapshot.environment, environment))
+        with self.cache_lock:
+            self.saved_snapshots[snapshot.environment] = (snapshot, path, max_age)
+        return snapshot
+
+    def get_saved_snapshot(self, environment):
+        saved = self.saved_snapshots.get(environment)
+        if saved is None:
+            return None
+        snapshot, path, max_age = saved
+        if max_age is None or time.time() - snapshot.fetched_at < max_age:
+            return snapshot
+        with self.cache_lock:
+            if self.saved_snapshots.pop(environment, None) is not None:
+                print("Routing snapshot {} is older than {} seconds. Using the current HAProxy config instead.".format(
+                    path, max_age))
+        return None
+
+    def get_snapshot(self, environment):
+        '''Returns the current RoutingSnapshot of the environment, fetching and
+        parsing its HAProxy config when there is none or it is older than the ttl'''
+        snapshot = self.get_saved_snapshot(environment)
+        if snapshot is not None:
+            return snapshot
+        snapshot = self.snapshots.get(environment)
+        if self.is_fresh(snapshot, self.snapshot_ttls.get(environment, 0)):
+            return snapshot
+
+        with self.get_refresh_lock(environment):
+            roger_env = self.get_roger_env()
+            ttl = self.get_cache_ttl(roger_env)
+            self.snapshot_ttls[environment] = ttl
+            # Another thread may have refreshed it while this one waited
+            snapshot = self.snapshots.get(environment)
+            if self.is_fresh(snapshot, ttl):
+                return snapshot
+
+            url = self.get_haproxy_config_url(roger_env, environment)
+            if snapshot is not None:
+                resp = self.fetch_haproxy_config(url, snapshot.etag, snapshot.last_modified)
+                if resp.status_code == 304:
+                    resp.close()
+                    snapshot = snapshot.refreshed()
+                    self.snapshots[environment] = snapshot
+                    return snapshot
+            else:
+                resp = self.fetch_haproxy_config(url)
+            if resp.status_code != 200:
+                # An error page has no routes, it must not pass as an empty config
+                resp.close()
+                raise HTTPError("Could not fetch the HAProxy config from {}: {} {}".format(
+                    url, resp.status_code, getattr(resp, 'reason', '') or ''), response=resp)
+
+            try:
+                path_begin_values, backend_tcp_ports, backend_path_begins, backend_ports = \
+                    self.parse_config_lines(resp.iter_lines())
+            finally:
+                resp.close()
+            snapshot = RoutingSnapshot(environment, path_begin_values, backend_tcp_ports, backend_path_begins,
+                                       backend_ports, time.time(), resp.headers.get('ETag'),
+                                       resp.headers.get('Last-Modified'))
+            self.snapshots[environment] = snapshot
+            return snapshot
+
+    def clear_cache(self, environment=None):
+        with self.cache_lock:
+            if environment is None:
+                self.snapshots.clear()
+                self.snapshot_ttls.clear()
+                self.saved_snapshots.clear()
+            else:
+                self.snapshots.pop(environment, None)
+                self.snapshot_ttls.pop(environment, None)
+                self.saved_snapshots.pop(environment, None)
+
+    def parseConfig(self, environment):
+        '''Makes the getters of this parser read the environment's current snapshot,
+        and returns it. Code that shares a parser between threads should use the
+        returned snapshot (or get_snapshot) instead of the getters.'''
+        self.snapshot = self.get_snapshot(environment)
+        return self.snapshot
 
     def set_path_begin_values(self, path_begin_values_aclnames):
-        self.path_begin_values = path_begin_values_aclnames
+        self.snapshot = RoutingSnapshot(self.snapshot.environment, path_begin_values_aclnames,
+                                        self.snapshot.backend_tcp_ports, None, self.snapshot.backend_tcp_port_lists)
 
     def get_path_begin_values(self):
-        return self.path_begin_values
+        return self.snapshot.get_path_begin_values()
 
     def set_backend_tcp_ports(self, backend_services_tcp_ports):
-        self.backend_services_tcp_ports = backend_services_tcp_ports
+        self.snapshot = RoutingSnapshot(self.snapshot.environment, self.snapshot.path_begin_values,
+                                        backend_services_tcp_ports, self.snapshot.backend_path_begin_values, None)
 
     def get_backend_tcp_ports(self):
-        return self.backend_services_tcp_ports
+        return self.snapshot.get_backend_tcp_ports()
+
+    def get_path_begin_values_by_backend(self):
+        '''{backend: (path begin values)}, the inverse of get_path_begin_values'''
+        return self.snapshot.get_path_begin_values_by_backend()
+
+    def get_tcp_ports_by_backend(self):
+        '''{backend: (tcp ports)}, the inverse of get_backend_tcp_ports'''
+        return self.snapshot.get_tcp_ports_by_backend()
@@ -0,0 +1,121 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import os
+import sys
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urlparse import urlparse
+from cli.settings import Settings
+from cli.appconfig import AppConfig
+
+
+class HttpClient:
+    '''Process-wide HTTP client that keeps one pooled requests.Session per endpoint
+    (scheme://host:port), so repeated calls to Marathon, Chronos, HAProxy or the
+    docker registry reuse keep-alive connections instead of opening new ones.
+
+    Pool size and timeouts can be set in roger-mesos-tools.config with the keys
+    http_pool_size, http_connect_timeout and http_read_timeout.'''
+
+    default_pool_size = 10
+    default_connect_timeout = 10
+    default_read_timeout = 60
+
+    def __init__(self):
+        self.sessions = {}
+        self.request_counts = {}
+        self.lock = threading.Lock()
+        self.pool_size = None
+        self.connect_timeout = None
+        self.read_timeout = None
+
+    def configure(self, pool_size=None, connect_timeout=None, read_timeout=None):
+        if pool_size is not None:
+            self.pool_size = int(pool_size)
+        if connect_timeout is not None:
+            self.connect_timeout = float(connect_timeout)
+        if read_timeout is not None:
+            self.read_timeout = float(read_timeout)
+
+    def load_settings(self):
+        roger_env = {}
+        try:
+            settingObj = Settings()
+            appObj = AppConfig()
+            roger_env = appObj.getRogerEnv(settingObj.getConfigDir()) or {}
+        except (IOError, ValueError):
+            pass
+        self.configure(roger_env.get('http_pool_size', self.default_pool_size),
+                       roger_env.get('http_connect_timeout', self.default_connect_timeout),
+                       roger_env.get('http_read_timeout', self.default_read_timeout))
+
+    def get_endpoint(self, url):
+        parsed = urlparse(url)
+        return "{}://{}".format(parsed.scheme, parsed.netloc)
+
+    def get_session(self, url, auth=None):
+        endpoint = self.get_endpoint(url)
+        with self.lock:
+            if self.pool_size is None:
+                self.load_settings()
+            session = self.sessions.get(endpoint)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.sessions[endpoint] = session
+                self.request_counts[endpoint] = 0
+            if auth is not None and session.auth is None:
+                session.auth = auth
+            self.request_counts[endpoint] += 1
+        return session
+
+    def request(self, method, url, auth=None, read_timeout=None, **kwargs):
+        session = self.get_session(url, auth)
+        if auth is not None and auth != session.auth:
+            kwargs['auth'] = auth
+        kwargs.setdefault('timeout', (self.connect_timeout, read_timeout or self.read_timeout))
+        return session.request(method, url, **kwargs)
+
+    def get(self, url, auth=None, **kwargs):
+        return self.request('GET', url, auth=auth, **kwargs)
+
+    def put(self, url, auth=None, **kwargs):
+        return self.request('PUT', url, auth=auth, **kwargs)
+
+    def get_stats(self):
+        '''Returns {endpoint: (requests, connections opened, connections reused)}'''
+        stats = {}
+        with self.lock:
+            for endpoint, session in self.sessions.items():
+                num_requests = self.request_counts.get(endpoint, 0)
+                num_connections = 0
+                for adapter in set(session.adapters.values()):
+                    pools = adapter.poolmanager.pools
+                    for key in pools.keys():
+                        pool = pools.get(key)
+                        if pool is not None:
+                            num_connections += pool.num_connections
+                num_connections = min(num_connections, num_requests)
+                stats[endpoint] = (num_requests, num_connections, num_requests - num_connections)
+        return stats
+
+    def report(self, stream=None):
+        '''Prints the connection stats of each endpoint, to stderr by default so
+        they do not mix with command output'''
+        stream = stream if stream is not None else sys.stderr
+        for endpoint, stat in sorted(self.get_stats().items()):
+            print("HTTP connections for {}: {} requests over {} connection(s), {} reused".format(
+                endpoint, stat[0], stat[1], stat[2]), file=stream)
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+            self.request_counts = {}
+
+http_client = HttpClient()
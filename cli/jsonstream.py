@@ -0,0 +1,116 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import codecs
+import json
+
+
+class JsonStream:
+    '''Incrementally decodes the items of one array member of a top level JSON
+    object, e.g. the tasks in {"tasks": [...]}, from an iterable of byte chunks.
+
+    Only one item (and the unparsed part of the current chunk) is held in memory
+    at a time, so large Marathon responses can be walked without building the
+    whole document.'''
+
+    whitespace = ' \t\n\r'
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = u''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self):
+        '''Appends the next chunk to the buffer. Returns False at the end of the stream'''
+        if self.eof:
+            return False
+        # Drop what has been consumed so the buffer doesn't grow with the document
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer += self.text_decoder.decode(chunk)
+                return True
+        self.buffer += self.text_decoder.decode(b'', True)
+        self.eof = True
+        return False
+
+    def peek(self):
+        '''Returns the next non-whitespace character, None at the end of the stream'''
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.whitespace:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                return None
+
+    def expect(self, chars):
+        char = self.peek()
+        if char is None or char not in chars:
+            raise ValueError("Expected one of '{}' at offset {} but found {!r}".format(chars, self.pos, char))
+        self.pos += 1
+        return char
+
+    def decode_value(self):
+        '''Decodes the next complete JSON value'''
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A value that ends with the buffer (e.g. a number) may continue
+                # in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self.read_more()
+
+    def iter_array(self):
+        '''Yields the items of an array, starting at the current position'''
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.decode_value()
+            if self.expect(',]') == ']':
+                return
+
+    def iter_items(self, key=None):
+        '''Yields the items of the array stored under key in the top level object,
+        or of the top level array when key is None (e.g. Chronos /scheduler/jobs).
+        Yields nothing if the key is missing or its value is not an array.'''
+        if key is None:
+            for item in self.iter_array():
+                yield item
+            return
+        self.expect('{')
+        if self.peek() == '}':
+            return
+        while True:
+            name = self.decode_value()
+            self.expect(':')
+            if name == key and self.peek() == '[':
+                for item in self.iter_array():
+                    yield item
+                return
+            self.decode_value()
+            if self.expect(',}') == '}':
+                return
+
+
+def iter_json_items(chunks, key, fields=None):
+    '''Yields the items of the array under key in a streamed JSON object, or of a
+    streamed top level array when key is None. With fields, each item is reduced
+    to a dict of only those keys.'''
+    for item in JsonStream(chunks).iter_items(key):
+        if fields is not None and isinstance(item, dict):
+            item = dict((field, item[field]) for field in fields if field in item)
+        yield item
@@ -3,9 +3,11 @@
 from __future__ import print_function
 import os
 import sys
-import requests
 import json
+import time
 import yaml
+import urlparse
+from requests.exceptions import RequestException
 from jinja2 import Environment, FileSystemLoader
 from cli.framework import Framework
 from cli.utils import Utils
@@ -13,6 +15,12 @@ from cli.settings import Settings
 from cli.marathonvalidator import MarathonValidator
 from cli.haproxyparser import HAProxyParser
 from cli.appconfig import AppConfig
+from cli.definitiondiff import DefinitionDiff, ANY_VALUE
+from cli.httpclient import http_client
+from cli.responsecache import response_cache
+from cli.jsonstream import iter_json_items
+from cli.records import TaskRecord
+from cli.deploymentdocument import DeploymentDocument
 
 utils = Utils()
 settings = Settings()
@@ -20,11 +28,52 @@ settings = Settings()
 
 class Marathon(Framework):
 
+    # Polling backoff (seconds) and event stream read timeout used by
+    # waitForDeployment
+    min_poll_interval = 1
+    max_poll_interval = 10
+    event_stream_timeout = 15
+
+    # Bytes read at a time when streaming /v2/apps and /v2/tasks
+    stream_chunk_size = 65536
+
+    # Fields Marathon fills in itself, ignored when comparing definitions
+    server_managed_fields = ['version', 'versionInfo', 'tasks', 'deployments', 'tasksStaged',
+                             'tasksRunning', 'tasksHealthy', 'tasksUnhealthy', 'taskStats',
+                             'lastTaskFailure', 'readinessCheckResults']
+    unordered_fields = ['constraints', 'uris', 'dependencies', 'acceptedResourceRoles', 'storeUrls']
+    # Values Marathon fills in for fields a definition leaves out, by path. An app
+    # PUT keeps the top-level fields it does not set, but the apps of a group
+    # PUT are replaced whole, so these also apply to their top-level fields.
+    default_fields = {
+        'cmd': None, 'args': None, 'user': None, 'env': {}, 'instances': 1, 'cpus': 1, 'mem': 128, 'disk': 0,
+        'gpus': 0, 'executor': '', 'constraints': [], 'uris': [], 'fetch': [], 'storeUrls': [],
+        'backoffSeconds': 1, 'backoffFactor': 1.15, 'maxLaunchDelaySeconds': 3600, 'healthChecks': [],
+        'readinessChecks': [], 'dependencies': [], 'labels': {}, 'ipAddress': None, 'residency': None,
+        'secrets': {}, 'taskKillGracePeriodSeconds': None, 'killSelection': 'YOUNGEST_FIRST',
+        'requirePorts': False, 'acceptedResourceRoles': None, 'apps': [], 'groups': [],
+        'ports': ANY_VALUE, 'portDefinitions': ANY_VALUE, 'upgradeStrategy': ANY_VALUE,
+        'unreachableStrategy': ANY_VALUE,
+        'upgradeStrategy.minimumHealthCapacity': 1, 'upgradeStrategy.maximumOverCapacity': 1,
+        'container.type': 'DOCKER', 'container.volumes': [], 'container.docker.privileged': False,
+        'container.docker.parameters': [], 'container.docker.forcePullImage': False,
+        'container.docker.portMappings[].servicePort': ANY_VALUE,
+        'container.docker.portMappings[].hostPort': 0, 'container.docker.portMappings[].protocol': 'tcp',
+        'container.docker.portMappings[].labels': {},
+        'healthChecks[].gracePeriodSeconds': 300, 'healthChecks[].intervalSeconds': 60,
+        'healthChecks[].timeoutSeconds': 20, 'healthChecks[].maxConsecutiveFailures': 3,
+        'healthChecks[].ignoreHttp1xx': False, 'healthChecks[].delaySeconds': 15,
+        'healthChecks[].portIndex': ANY_VALUE, 'healthChecks[].path': '/', 'healthChecks[].protocol': 'HTTP'}
+
     def __init__(self):
         self.user = None
         self.passw = None
         self.marathonvalidator = MarathonValidator()
         self.haproxyparser = HAProxyParser()
+        self.app_indexes = {}
+        self.definitiondiff = DefinitionDiff(
+            self.server_managed_fields, self.unordered_fields, ['apps', 'groups'], self.default_fields,
+            partial_update=True)
 
     def getName(self):
         return "Marathon"
@@ -33,86 +82,326 @@ class Marathon(Framework):
         url = roger_env['environments'][environment][
             'marathon_endpoint'] + "/v2/apps"
         self.fetchUserPass(environment)
-        resp = requests.get(url, auth=(self.user, self.passw))
+        resp = response_cache.get(environment, url, auth=(self.user, self.passw))
         print (
             "Server response: [ {} - {} ]".format(resp.status_code, resp.reason))
         return resp.json()
 
     def put(self, file_path, environmentObj, container, environment, act_as_user):
-        data = open(file_path).read()
-        appName = json.loads(data)['id']
+        document = DeploymentDocument.load(file_path)
+        data = document.data
+        appName = document.id
         self.fetchUserPass(environment)
 
         print("TRIGGERING MARATHON FRAMEWORK UPDATE FOR: {}".format(container))
         resp = ""
-        if 'groups' in data:
+        if document.is_group:
             if not act_as_user:
-                resp = requests.put("{}/v2/groups/{}".format(environmentObj['marathon_endpoint'], appName),
-                                    data=data,
-                                    headers={'Content-type': 'application/json'}, auth=(self.user, self.passw))
+                resp = http_client.put("{}/v2/groups/{}".format(environmentObj['marathon_endpoint'], appName),
+                                       data=data,
+                                       headers={'Content-type': 'application/json'}, auth=(self.user, self.passw))
             else:
-                resp = requests.put("{}/v2/groups/{}".format(environmentObj['marathon_endpoint'], appName),
-                                    data=data,
-                                    headers={'Content-type': 'application/json', 'act-as-user': act_as_user}, auth=(self.user, self.passw))
+                resp = http_client.put("{}/v2/groups/{}".format(environmentObj['marathon_endpoint'], appName),
+                                       data=data,
+                                       headers={'Content-type': 'application/json', 'act-as-user': act_as_user}, auth=(self.user, self.passw))
 
             print("curl -X PUT -H 'Content-type: application/json' --data-binary @{} {}/v2/groups/{}".format(
-                file_path, environmentObj['marathon_endpoint'], appName))
+                document.location, environmentObj['marathon_endpoint'], appName))
             print (
                 "Server response: [ {} - {} ]".format(resp.status_code, resp.reason))
         else:
             endpoint = environmentObj['marathon_endpoint']
             deploy_url = "{}/v2/apps/{}".format(endpoint, appName)
             if not act_as_user:
-                resp = requests.put(deploy_url, data=data, headers={
-                                    'Content-type': 'application/json'}, auth=(self.user, self.passw))
+                resp = http_client.put(deploy_url, data=data, headers={
+                                       'Content-type': 'application/json'}, auth=(self.user, self.passw))
             else:
-                resp = requests.put(deploy_url, data=data, headers={
-                                    'Content-type': 'application/json', 'act-as-user': act_as_user}, auth=(self.user, self.passw))
+                resp = http_client.put(deploy_url, data=data, headers={
+                                       'Content-type': 'application/json', 'act-as-user': act_as_user}, auth=(self.user, self.passw))
             print("curl -X PUT -H 'Content-type: application/json' --data-binary @{} {}/v2/apps/{}".format(
-                file_path, environmentObj['marathon_endpoint'], appName))
+                document.location, environmentObj['marathon_endpoint'], appName))
             print (
                 "Server response: [ {} - {} ]".format(resp.status_code, resp.reason))
 
         marathon_message = "{0}: {1}".format(appName, resp)
         print(marathon_message)
+        response_cache.invalidate(environment)
+
+        return resp, list(document.task_ids)
+
+    def isBatchable(self, file_path):
+        # Groups have their own endpoint, only plain apps can go in a batch
+        return not DeploymentDocument.load(file_path).is_group
+
+    def putBatch(self, file_paths, environmentObj, containers, environment, act_as_user):
+        """
+        pushes several app definitions with a single PUT /v2/apps, which Marathon
+        rolls out as one deployment
+
+        :params:
+        :file_paths [list]: rendered app definitions (no groups), as paths or DeploymentDocuments
+        :environmentObj [dict]: environment section of roger-mesos-tools.config
+        :containers [list]: container names, in the same order as file_paths
+        :environment [str]: environment name
+        :act_as_user [str]: user to act as, if any
+        :return: (response, [task id list of each definition, in file_paths order])
+        """
+        documents = [DeploymentDocument.load(file_path) for file_path in file_paths]
+        data = "[{}]".format(",".join(document.data for document in documents))
+        self.fetchUserPass(environment)
+
+        print("TRIGGERING MARATHON FRAMEWORK BATCH UPDATE FOR: {}".format(", ".join(containers)))
+        deploy_url = "{}/v2/apps".format(environmentObj['marathon_endpoint'])
+        headers = {'Content-type': 'application/json'}
+        if act_as_user:
+            headers['act-as-user'] = act_as_user
+        resp = http_client.put(deploy_url, data=data, headers=headers, auth=(self.user, self.passw))
+        for document in documents:
+            print("Batched definition: {}".format(document.location))
+        print("curl -X PUT -H 'Content-type: application/json' --data-binary @<batch of {}> {}".format(
+            len(documents), deploy_url))
+        print (
+            "Server response: [ {} - {} ]".format(resp.status_code, resp.reason))
+
+        response_cache.invalidate(environment)
+
+        task_id_lists = [list(document.task_ids) for document in documents]
+        return resp, task_id_lists
+
+    def getPushLevels(self, file_paths, environmentObj, environment):
+        # Apps and groups don't depend on each other, they can go in any order
+        return None
+
+    def matchesRunningDefinition(self, file_path, environmentObj, environment, act_as_user):
+        """
+        compares the rendered definition with the app or group running in Marathon
+        and prints a compact diff when they differ
+
+        :params:
+        :file_path [str]: path to the rendered definition, or its DeploymentDocument
+        :environmentObj [dict]: environment section of roger-mesos-tools.config
+        :environment [str]: environment name
+        :act_as_user [str]: user to act as, if any
+        :return: [bool] True if nothing meaningful changed, False if it changed and
+                 None if it is not running yet
+        """
+        document = DeploymentDocument.load(file_path)
+        data = document.tree
+        appName = document.id
+        try:
+            if document.is_group:
+                live = self.getGroup(environmentObj, environment, appName, act_as_user)
+            else:
+                live = self.getApp(environmentObj, environment, appName, act_as_user)
+        except (RequestException, ValueError) as e:
+            print("Could not fetch running definition for {}: {}".format(appName, e), file=sys.stderr)
+            return False
+        if live is None:
+            print("{} is not running in Marathon yet.".format(appName))
+            return None
+
+        changes = self.definitiondiff.diff(data, live)
+        if not changes:
+            print("{} matches the running definition.".format(appName))
+            return True
+        print("Changes for {} ({} total):".format(appName, len(changes)))
+        for change in changes[:20]:
+            print("  {}".format(change))
+        if len(changes) > 20:
+            print("  ...")
+        return False
+
+    def getDeploymentId(self, resp):
+        try:
+            return resp.json().get('deploymentId')
+        except (AttributeError, ValueError):
+            return None
+
+    def getDeploymentTargets(self, resp):
+        """
+        returns the (resource, id) of each app or group the PUT of resp changed:
+        the app or group in its URL, or the apps in its body for a batch
+        """
+        path = urlparse.urlparse(getattr(resp, 'url', None) or '').path.rstrip('/')
+        for resource in ('groups', 'apps'):
+            marker = "/v2/{}/".format(resource)
+            if marker in path:
+                return [(resource, path.split(marker, 1)[1])]
+        if path.endswith('/v2/apps'):
+            try:
+                return [('apps', app['id'].lstrip('/')) for app in json.loads(resp.request.body)]
+            except (AttributeError, TypeError, ValueError, KeyError):
+                return []
+        return []
+
+    def checkFinishedDeployment(self, environmentObj, environment, deployment_id, version, targets):
+        """
+        Marathon drops deployments that succeeded, but also ones that were
+        canceled, rolled back or replaced by a newer deployment. Returns True only
+        if every app or group of the deployment runs the version it deployed.
+        """
+        if not version or not targets:
+            print("Deployment {} is gone, but its outcome cannot be checked".format(deployment_id), file=sys.stderr)
+            return False
+        for resource, target_id in targets:
+            try:
+                if resource == 'groups':
+                    live = self.getGroup(environmentObj, environment, target_id)
+                else:
+                    live = self.getApp(environmentObj, environment, target_id)
+            except (RequestException, ValueError) as e:
+                print("Deployment {} is gone, but {} could not be checked: {}".format(
+                    deployment_id, target_id, e), file=sys.stderr)
+                return False
+            live_version = live.get('version') if live is not None else None
+            if live_version != version:
+                print("Deployment {} is gone, but {} runs version {} instead of {}. It was canceled, rolled back or "
+                      "replaced.".format(deployment_id, target_id, live_version, version), file=sys.stderr)
+                return False
+        print("Deployment {} finished".format(deployment_id))
+        return True
+
+    def getDeployment(self, environmentObj, deployment_id):
+        url = "{}/v2/deployments".format(environmentObj['marathon_endpoint'])
+        resp = http_client.get(url, auth=(self.user, self.passw))
+        for deployment in resp.json():
+            if deployment.get('id') == deployment_id:
+                return deployment
+        return None
+
+    def describeDeploymentStep(self, deployment_id, current_step, total_steps, step):
+        actions = []
+        for action in (step or {}).get('actions', []):
+            actions.append("{} {}".format(action.get('action', ''), action.get('app', '')).strip())
+        return "Deployment {}: step {}/{} {}".format(
+            deployment_id, current_step, total_steps, ", ".join(actions)).strip()
+
+    def waitForDeployment(self, resp, environmentObj, environment, timeout):
+        """
+        waits for the Marathon deployment started by a put to finish. Follows the
+        /v2/events stream when it is available, otherwise polls /v2/deployments
+        with an increasing interval.
 
-        task_id_list = utils.generate_task_id_list(data)
-        return resp, task_id_list
+        :params:
+        :resp [requests.Response]: response of the PUT that started the deployment
+        :environmentObj [dict]: environment section of roger-mesos-tools.config
+        :environment [str]: environment name
+        :timeout [int]: seconds to wait before giving up
+        :return: [bool] True if the deployment succeeded, False if it failed, timed out
+                 or its outcome cannot be checked
+        """
+        deployment_id = self.getDeploymentId(resp)
+        if deployment_id is None:
+            print("No deployment id in Marathon response. Nothing to wait for.")
+            return True
+        self.fetchUserPass(environment)
+        deadline = time.time() + timeout
+        print("Waiting up to {} seconds for deployment {} to finish".format(timeout, deployment_id))
+        version = resp.json().get('version')
+        targets = self.getDeploymentTargets(resp)
+
+        def finished():
+            return self.checkFinishedDeployment(environmentObj, environment, deployment_id, version, targets)
+
+        result = self.watchDeploymentEvents(environmentObj, deployment_id, deadline, finished)
+        if result is None:
+            result = self.pollDeployment(environmentObj, deployment_id, deadline, finished)
+        if result is None:
+            print("Deployment {} did not finish within {} seconds".format(deployment_id, timeout), file=sys.stderr)
+            return False
+        return result
+
+    def pollDeployment(self, environmentObj, deployment_id, deadline, finished):
+        interval = self.min_poll_interval
+        last_progress = None
+        while time.time() < deadline:
+            deployment = self.getDeployment(environmentObj, deployment_id)
+            if deployment is None:
+                return finished()
+            current_actions = deployment.get('currentActions', [])
+            progress = self.describeDeploymentStep(deployment_id, deployment.get('currentStep', 0),
+                                                   deployment.get('totalSteps', 0), {'actions': current_actions})
+            if progress != last_progress:
+                print(progress)
+                last_progress = progress
+            time.sleep(max(0, min(interval, deadline - time.time())))
+            interval = min(interval * 2, self.max_poll_interval)
+        return None
+
+    def watchDeploymentEvents(self, environmentObj, deployment_id, deadline, finished):
+        """
+        follows the Marathon event stream until the deployment succeeds or fails.
+        Returns None when the stream is not available so the caller can poll instead.
+        finished() checks the outcome of a deployment Marathon no longer lists.
+        """
+        url = "{}/v2/events".format(environmentObj['marathon_endpoint'])
+        while time.time() < deadline:
+            try:
+                stream = http_client.get(url, auth=(self.user, self.passw), stream=True,
+                                         headers={'Accept': 'text/event-stream'},
+                                         read_timeout=self.event_stream_timeout)
+            except RequestException:
+                return None
+            if stream.status_code != 200:
+                stream.close()
+                return None
+            try:
+                # The deployment may have finished before we subscribed
+                deployment = self.getDeployment(environmentObj, deployment_id)
+                if deployment is None:
+                    return finished()
+                affected_apps = set(deployment.get('affectedApps', []))
+                result = self.readDeploymentEvents(stream, deployment_id, affected_apps, deadline)
+                if result is not None:
+                    return result
+            except RequestException:
+                # Idle or dropped stream, check where the deployment is and reconnect
+                if self.getDeployment(environmentObj, deployment_id) is None:
+                    return finished()
+            finally:
+                stream.close()
+        return None
+
+    def readDeploymentEvents(self, stream, deployment_id, affected_apps, deadline):
+        event_type = None
+        data_lines = []
+        for line in stream.iter_lines():
+            if time.time() >= deadline:
+                return None
+            if line:
+                if line.startswith('event:'):
+                    event_type = line[len('event:'):].strip()
+                elif line.startswith('data:'):
+                    data_lines.append(line[len('data:'):].strip())
+                continue
+            if not data_lines:
+                continue
+            try:
+                event = json.loads("\n".join(data_lines))
+            except ValueError:
+                event = {}
+            event_type = event.get('eventType', event_type)
+            data_lines = []
+            if event_type in ('deployment_success', 'deployment_failed') and event.get('id') == deployment_id:
+                if event_type == 'deployment_success':
+                    print("Deployment {} succeeded".format(deployment_id))
+                    return True
+                print("Deployment {} failed".format(deployment_id), file=sys.stderr)
+                return False
+            if event_type in ('deployment_step_success', 'deployment_step_failure') and \
+                    event.get('plan', {}).get('id') == deployment_id:
+                steps = event['plan'].get('steps', [])
+                step = event.get('currentStep', {})
+                current_step = steps.index(step) + 1 if step in steps else '?'
+                print("{} ({})".format(self.describeDeploymentStep(
+                    deployment_id, current_step, len(steps), step), event_type.replace('deployment_step_', '')))
+            elif event_type == 'status_update_event' and event.get('appId') in affected_apps:
+                print("Deployment {}: task {} is {} on {}".format(
+                    deployment_id, event.get('taskId'), event.get('taskStatus'), event.get('host')))
+        return None
 
     def getGroupDetails(self, data):
-        group_details = {}
-        base_id = data['id']
-        if not base_id.startswith("/"):
-            base_id = "/" + base_id
-        for group in data['groups']:
-            if 'id' in group.keys():
-                group_id = group['id']
-                if not group_id.startswith("/"):
-                    group_id = "/" + group_id
-                for app in group['apps']:
-                    http_prefix = ""
-                    tcp_port_list = []
-                    enable_affinity = False
-                    if 'id' in app.keys():
-                        app_id = app['id']
-                    if not app_id.startswith("/"):
-                        app_id = "/" + app_id
-                    container_id = "{}{}{}".format(base_id, group_id, app_id)
-                    if 'env' in app:
-                        if 'HTTP_PREFIX' in app['env']:
-                            http_prefix = app['env']['HTTP_PREFIX']
-
-                        if 'TCP_PORTS' in app['env']:
-                            tcp_ports_value = app['env']['TCP_PORTS']
-                            tcp_port_list = json.loads(tcp_ports_value).keys()
-
-                        if 'ENABLE_AFFINITY' in app['env'] and app['env']['ENABLE_AFFINITY'] != "":
-                            enable_affinity = True
-
-                    envs = (http_prefix, tcp_port_list, enable_affinity)
-                    group_details[container_id] = envs
-
-        return group_details
+        return DeploymentDocument(data).app_details
 
     def validateGroupDetails(self, group_details, message_list):
         http_prefixes = {}
@@ -149,35 +438,11 @@ class Marathon(Framework):
     def runDeploymentChecks(self, file_path, environment):
         message_list = []
         valid = True
-        app_ids = []
-        group_details = {}
-        data = open(file_path).read()
-        marathon_data = json.loads(data)
-        if 'groups' in marathon_data:
-            group_details = self.getGroupDetails(marathon_data)
+        document = DeploymentDocument.load(file_path)
+        group_details = document.app_details
+        app_ids = group_details.keys()
+        if document.is_group:
             valid = self.validateGroupDetails(group_details, message_list)
-            app_ids = group_details.keys()
-        else:
-            app_id = marathon_data['id']
-            if not app_id.startswith("/"):
-                app_id = "/" + app_id
-            http_prefix = ""
-            tcp_port_list = []
-            enable_affinity = False
-            if 'env' in marathon_data:
-                if 'HTTP_PREFIX' in marathon_data['env']:
-                    http_prefix = marathon_data['env']['HTTP_PREFIX']
-
-                if 'TCP_PORTS' in marathon_data['env']:
-                    tcp_ports_value = marathon_data['env']['TCP_PORTS']
-                    tcp_port_list = json.loads(tcp_ports_value).keys()
-
-                if 'ENABLE_AFFINITY' in marathon_data['env'] and app['env']['ENABLE_AFFINITY'] != "":
-                    enable_affinity = True
-
-            app_ids = []
-            app_ids.append(app_id)
-            group_details[app_id] = (http_prefix, tcp_port_list, enable_affinity)
 
         for app_id in app_ids:
             app_http_prefix = group_details[app_id][0]
@@ -193,72 +458,192 @@ class Marathon(Framework):
         return valid
 
     def getCurrentImageVersion(self, roger_env, environment, application):
-        data = self.get(roger_env, environment)
+        # Apps whose id contains the application name usually run its image, so
+        # look there first and only scan every app when none of them matches
+        for app in self.getApps(roger_env, environment, id_filter=application):
+            docker_image = self.getAppImage(app)
+            if docker_image is not None and application in docker_image:
+                return self.extractImageVersion(docker_image)
+        index = self.getAppIndex(roger_env, environment)
+        for app_id in index['app_ids']:
+            docker_image = index['images'].get(app_id)
+            if docker_image is not None and application in docker_image:
+                return self.extractImageVersion(docker_image)
+
+    def extractImageVersion(self, docker_image):
+        if len(docker_image.split('/v')) == 2:
+            # Image format expected
+            # moz-content-kairos-7da406eb9e8937875e0548ae1149/v0.46
+            return utils.extractFullShaAndVersion(docker_image)
+        else:
+            # Docker images of the format: grafana/grafana:2.1.3 or
+            # postgres:9.4.1
+            return docker_image
+
+    def getAppImage(self, app):
+        container = app.get('container')
+        if container is None or container.get('docker') is None:
+            return None
+        return container['docker'].get('image')
+
+    def getApp(self, environmentObj, environment, app_id, act_as_user=None):
+        """
+        returns the definition of a single app from /v2/apps/{app_id}, None if it
+        is not running
+        """
+        app = self.fetchDefinition(environmentObj, environment, 'apps', app_id, act_as_user)
+        return app.get('app', app) if app is not None else None
+
+    def getGroup(self, environmentObj, environment, group_id, act_as_user=None):
+        """
+        returns the definition of a group and its apps from /v2/groups/{group_id},
+        None if it is not running
+        """
+        return self.fetchDefinition(environmentObj, environment, 'groups', group_id, act_as_user)
+
+    def fetchDefinition(self, environmentObj, environment, resource, definition_id, act_as_user):
+        # Always fetched from Marathon, not the response cache, as it decides
+        # what gets pushed
+        self.fetchUserPass(environment)
+        headers = {'Accept': 'application/json'}
+        if act_as_user:
+            headers['act-as-user'] = act_as_user
+        url = "{}/v2/{}/{}".format(environmentObj['marathon_endpoint'], resource, definition_id.lstrip('/'))
+        resp = http_client.get(url, headers=headers, auth=(self.user, self.passw))
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        return resp.json()
+
+    def getAppTasks(self, environmentObj, environment, app_id):
+        """
+        returns the tasks of a single app from /v2/apps/{app_id}/tasks, an empty
+        list if it is not running
+        """
         self.fetchUserPass(environment)
-        for app in data['apps']:
-            if app['container'] is not None:
-                docker_image = app['container']['docker']['image']
-                if application in docker_image:
-                    if len(docker_image.split('/v')) == 2:
-                        # Image format expected
-                        # moz-content-kairos-7da406eb9e8937875e0548ae1149/v0.46
-                        return utils.extractFullShaAndVersion(docker_image)
-                    else:
-                        # Docker images of the format: grafana/grafana:2.1.3 or
-                        # postgres:9.4.1
-                        return docker_image
+        url = "{}/v2/apps/{}/tasks".format(environmentObj['marathon_endpoint'], app_id.lstrip('/'))
+        resp = response_cache.get(environment, url, headers={'Accept': 'application/json'},
+                                  auth=(self.user, self.passw))
+        if resp.status_code == 404:
+            return []
+        resp.raise_for_status()
+        return resp.json().get('tasks', [])
+
+    def getAppIndex(self, roger_env, environment):
+        """
+        returns an index of every app in the environment, built from a single
+        streamed /v2/apps fetch that keeps only the id and container of each app,
+        and kept for the life of this object
+
+        :return: [dict] with 'app_ids' (in Marathon order) and 'images'
+                 (app id -> docker image)
+        """
+        if environment not in self.app_indexes:
+            index = {'app_ids': [], 'images': {}}
+            for app in self.iterApps(roger_env, environment, fields=('id', 'container')):
+                app_id = app['id']
+                index['app_ids'].append(app_id)
+                index['images'][app_id] = self.getAppImage(app)
+            self.app_indexes[environment] = index
+        return self.app_indexes[environment]
+
+    def findTask(self, roger_env, environment, task_id_prefix):
+        """
+        returns the running task whose id starts with task_id_prefix, None if
+        there is none. When the prefix names a whole app, only the tasks of that
+        app are fetched, otherwise all running tasks are scanned.
+        """
+        # Task ids are the app id with '/' replaced by '_', followed by '.' and
+        # a uuid, e.g. test_web_app.e7c9df0d-... A prefix without '.' may be
+        # part of an app id, and app ids may contain '.' themselves.
+        if '.' in task_id_prefix:
+            app_id = task_id_prefix.split('.')[0].replace('_', '/')
+            for task in self.getAppTasks(roger_env['environments'][environment], environment, app_id):
+                if task['id'].startswith(task_id_prefix):
+                    return task
+        for task in self.iterTasks(roger_env, environment, fields=('id', 'appId', 'host', 'ports', 'startedAt')):
+            if task['id'].startswith(task_id_prefix):
+                return task
+        return None
 
     def getInstanceDetails(self, roger_env, environment):
-        tasks = self.getTasks(roger_env, environment)
         instance_details = {}
-        for task in tasks:
-            app_id = task['appId']
-            started_at = task['startedAt']
-            mesos_task_id = task['id']
-            hostname = task['host']
-            ports = task['ports']
-            instance_details[mesos_task_id] = (
-                app_id, hostname, ports, started_at)
+        for task in self.iterTasks(roger_env, environment, fields=('id', 'appId', 'host', 'ports', 'startedAt')):
+            instance_details[task['id']] = TaskRecord(
+                task['appId'], task['host'], task['ports'], task.get('startedAt'))
 
         return instance_details
 
     def getAppEnvDetails(self, roger_env, environment):
-        apps = self.getApps(roger_env, environment)
         app_envs = {}
-        for app in apps:
+        for app in self.iterApps(roger_env, environment, fields=('id', 'env')):
             app_id = app['id']
             if 'env' in app:
                 app_envs[app_id] = app['env']
 
         return app_envs
 
-    def getApps(self, roger_env, environment):
-        self.fetchUserPass(environment)
-        headers = {'Accept': 'application/json',
-                   'Accept-Encoding': 'gzip, deflate', 'Content-Type': 'application/json'}
-        url = roger_env['environments'][environment][
-            'marathon_endpoint'] + '/v2/apps'
-        resp = requests.get("{}".format(url), headers=headers,
-                            auth=(self.user, self.passw))
-        print (
-            "Server response for apps: [ {} - {} ]".format(resp.status_code, resp.reason))
-        resp_json = resp.json()
-        apps = resp.json()['apps'] if 'apps' in resp_json else {}
-        return apps
+    def getApps(self, roger_env, environment, id_filter=None, embed_tasks=False):
+        """
+        returns the apps running in Marathon
+
+        :params:
+        :id_filter [str]: only apps whose id contains this string (Marathon's id= filter)
+        :embed_tasks [bool]: include the tasks of each app under 'tasks'
+        """
+        params = {}
+        if id_filter:
+            params['id'] = id_filter
+        if embed_tasks:
+            params['embed'] = 'apps.tasks'
+        resp = self.fetchList(roger_env, environment, '/v2/apps', params, 'apps')
+        return resp.json().get('apps', [])
 
     def getTasks(self, roger_env, environment):
+        resp = self.fetchList(roger_env, environment, '/v2/tasks', {'status': 'running'}, 'tasks')
+        return resp.json().get('tasks', [])
+
+    def iterApps(self, roger_env, environment, fields=None):
+        """
+        yields the apps running in Marathon one at a time, parsing /v2/apps as it
+        is downloaded instead of building the whole response in memory
+
+        :params:
+        :fields [tuple]: keep only these keys of each app
+        """
+        resp = self.fetchList(roger_env, environment, '/v2/apps', {}, 'apps', stream=True)
+        try:
+            for app in iter_json_items(resp.iter_content(self.stream_chunk_size), 'apps', fields):
+                yield app
+        finally:
+            resp.close()
+
+    def iterTasks(self, roger_env, environment, fields=None):
+        """
+        yields the running tasks one at a time, parsing /v2/tasks as it is
+        downloaded instead of building the whole response in memory
+
+        :params:
+        :fields [tuple]: keep only these keys of each task
+        """
+        resp = self.fetchList(roger_env, environment, '/v2/tasks', {'status': 'running'}, 'tasks', stream=True)
+        try:
+            for task in iter_json_items(resp.iter_content(self.stream_chunk_size), 'tasks', fields):
+                yield task
+        finally:
+            resp.close()
+
+    def fetchList(self, roger_env, environment, path, params, name, stream=False):
         self.fetchUserPass(environment)
         headers = {'Accept': 'application/json',
                    'Accept-Encoding': 'gzip, deflate', 'Content-Type': 'application/json'}
         url = roger_env['environments'][environment][
-            'marathon_endpoint'] + '/v2/tasks?status=running'
-        resp = requests.get("{}".format(url), headers=headers,
-                            auth=(self.user, self.passw))
+            'marathon_endpoint'] + path
+        resp = response_cache.get(environment, "{}".format(url), headers=headers, params=params, stream=stream,
+                                  auth=(self.user, self.passw))
         print (
-            "Server response for tasks: [ {} - {} ]".format(resp.status_code, resp.reason))
-        respjson = resp.json()
-        tasks = resp.json()['tasks'] if 'tasks' in respjson else {}
-        return tasks
+            "Server response for {}: [ {} - {} ]".format(name, resp.status_code, resp.reason))
+        return resp
 
     def get_image_name(
         self,
@@ -287,6 +672,6 @@ class Marathon(Framework):
         location = config['environments'][env]['marathon_endpoint']
         url = '{location}/v2/apps/{app_id}'.format(
             location=location, app_id=app_id)
-        res = requests.get(url, auth=(username, password))
+        res = response_cache.get(env, url, auth=(username, password))
         image = res.json()['app']['container']['docker']['image']
         return image
@@ -0,0 +1,91 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+
+
+# Index of the lowest clear bit of every byte value, for bytes with a clear bit
+FIRST_FREE_BIT = [next((bit for bit in range(8) if not value & (1 << bit)), None) for value in range(256)]
+
+
+class PortAllocator(object):
+    '''Tracks which TCP ports in [first_port, last_port] are taken, one bit per
+    port, and hands out free ones.
+
+    Marking or checking a port is O(1). Looking for free ports skips fully used
+    bytes 8 ports at a time and resumes where the previous search stopped, so
+    handing out consecutive ports stays O(1) per port however many are taken.'''
+
+    def __init__(self, first_port, last_port):
+        if first_port > last_port:
+            raise ValueError("Invalid port range {}-{}.".format(first_port, last_port))
+        self.first_port = first_port
+        self.last_port = last_port
+        self.size = last_port - first_port + 1
+        self.bitmap = bytearray((self.size + 7) // 8)
+        # Bits past the end of the range count as taken
+        for offset in range(self.size, len(self.bitmap) * 8):
+            self.bitmap[offset >> 3] |= 1 << (offset & 7)
+        self.cursor = 0
+        self.used = 0
+
+    @classmethod
+    def parse_range(cls, port_range):
+        '''Returns (first, last) for a range like "10000-10999"'''
+        try:
+            first_port, last_port = [int(port) for port in str(port_range).split('-')]
+        except ValueError:
+            raise ValueError("Invalid port range '{}'. Expected a range like 10000-10999.".format(port_range))
+        return first_port, last_port
+
+    def contains(self, port):
+        return self.first_port <= port <= self.last_port
+
+    def is_free(self, port):
+        if not self.contains(port):
+            return False
+        offset = port - self.first_port
+        return not self.bitmap[offset >> 3] & (1 << (offset & 7))
+
+    def allocate(self, port):
+        '''Marks port as taken. Ports outside the range are ignored. Returns True
+        if the port was free.'''
+        try:
+            port = int(port)
+        except (TypeError, ValueError):
+            return False
+        if not self.is_free(port):
+            return False
+        offset = port - self.first_port
+        self.bitmap[offset >> 3] |= 1 << (offset & 7)
+        self.used += 1
+        return True
+
+    def find_free(self, start):
+        '''Returns the offset of the first free port at or after offset start, None
+        if there is none'''
+        index = start >> 3
+        # Ignore the ports before start in its byte
+        value = self.bitmap[index] | ((1 << (start & 7)) - 1) if index < len(self.bitmap) else 0xff
+        while True:
+            if value != 0xff:
+                return (index << 3) + FIRST_FREE_BIT[value]
+            index += 1
+            if index >= len(self.bitmap):
+                return None
+            value = self.bitmap[index]
+
+    def take(self, count):
+        '''Allocates and returns the next count free ports in ascending order.
+        Raises ValueError when the range has fewer free ports.'''
+        if count > self.size - self.used:
+            raise ValueError("Only {} of the {} ports in {}-{} are free, {} requested.".format(
+                self.size - self.used, self.size, self.first_port, self.last_port, count))
+        ports = []
+        while len(ports) < count:
+            # Every port before the cursor is taken, ports are never released
+            offset = self.find_free(self.cursor)
+            port = self.first_port + offset
+            self.allocate(port)
+            self.cursor = offset + 1
+            ports.append(port)
+        return ports
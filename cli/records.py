@@ -0,0 +1,67 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+from collections import namedtuple
+
+
+class ReadOnlyDict(dict):
+    '''A dict that refuses changes, so it can be shared between threads and
+    containers. Subclasses can set message to say what is read-only.'''
+
+    message = "This dict is read-only"
+
+    def read_only(self, *args, **kwargs):
+        raise TypeError(self.message)
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = read_only
+
+
+class TaskRecord(namedtuple('TaskRecord', ['app_id', 'hostname', 'ports', 'started_at'])):
+    '''A running task as used by cluster-wide views like roger ps. A tuple without
+    a per-instance __dict__, so it can still be indexed like the
+    (app_id, hostname, ports, started_at) tuples it replaces.'''
+    __slots__ = ()
+
+
+class JobRecord(namedtuple('JobRecord', ['name', 'state', 'last_status', 'last_run', 'success_count',
+                                           'error_count', 'image'])):
+    '''Status of a Chronos job, as shown by roger ps. last_status and state come
+    from the scheduler graph, the rest from the job definition.'''
+    __slots__ = ()
+
+
+class RouteRecord(namedtuple('RouteRecord', ['config_file', 'app_name', 'container', 'app_id', 'http_prefix',
+                                               'tcp_ports', 'affinity'])):
+    '''The HTTP_PREFIX, TCP_PORTS and affinity of one rendered app, and where it
+    was rendered from. Used by roger validate to find conflicts between configs.'''
+    __slots__ = ()
+
+    def describe(self):
+        return "{} ({}:{}/{})".format(self.app_id, self.config_file, self.app_name, self.container)
+
+
+class AppRecord(object):
+    '''An app and the ids of its running tasks'''
+    __slots__ = ('app_id', 'env', 'task_ids')
+
+    def __init__(self, app_id, env=None, task_ids=None):
+        self.app_id = app_id
+        self.env = env if env is not None else {}
+        self.task_ids = task_ids if task_ids is not None else []
+
+    def __repr__(self):
+        return "AppRecord(app_id={!r}, tasks={})".format(self.app_id, len(self.task_ids))
+
+
+def group_tasks_by_app(instance_details, app_envs=None):
+    '''Groups {task id: TaskRecord} by app in a single pass. Returns
+    {app id: AppRecord}, with the env of each app taken from app_envs.'''
+    app_envs = app_envs or {}
+    apps = {}
+    for task_id, task in instance_details.iteritems():
+        app_id = task[0]
+        app = apps.get(app_id)
+        if app is None:
+            app = apps[app_id] = AppRecord(app_id, app_envs.get(app_id))
+        app.task_ids.append(task_id)
+    return apps
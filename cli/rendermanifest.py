@@ -0,0 +1,135 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from jinja2 import meta, TemplateNotFound
+
+
+def fingerprint(value):
+    '''Returns a SHA-1 of value serialized as sorted JSON'''
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str)).hexdigest()
+
+
+def write_atomic(path, data):
+    '''Writes data to path through a temp file in the same dir and a rename, so
+    readers never see a partly written file. Keeps the mode of an existing file.'''
+    mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.chmod(tmp_path, mode)
+        os.rename(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class RenderManifest:
+    '''Records, for every component rendered into one components dir, what the
+    rendered file was made from: the SHA-1 of the template and of every template
+    it includes, imports or extends, a fingerprint of the merged variables and
+    secrets, and the SHA-1 of the output.
+
+    A component whose recorded inputs all still match, and whose rendered file
+    was not changed since, does not need to be rendered again. Components that
+    pick templates by a variable name are never recorded, as their templates
+    cannot be known without rendering.'''
+
+    filename = '.render-manifest.json'
+    format = 1
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, self.filename)
+        self.entries = {}
+        self.changed = False
+        self.lock = threading.Lock()
+        try:
+            with open(self.path) as fh:
+                data = json.load(fh)
+            if data.get('format') == self.format:
+                self.entries = data['entries']
+        except (IOError, ValueError, KeyError, AttributeError):
+            # Missing or unreadable, everything is rendered again
+            pass
+
+    def template_hashes(self, env, names):
+        '''Returns {template name: SHA-1 of its source}, None if one is missing'''
+        hashes = {}
+        for name in names:
+            try:
+                source = env.loader.get_source(env, name)[0]
+            except TemplateNotFound:
+                return None
+            hashes[name] = hashlib.sha1(source.encode('utf-8')).hexdigest()
+        return hashes
+
+    def referenced_templates(self, env, template_name):
+        '''Returns the names of template_name and of all templates it pulls in,
+        None if one of them is chosen at render time'''
+        names = set()
+        pending = [template_name]
+        while pending:
+            name = pending.pop()
+            if name in names:
+                continue
+            names.add(name)
+            source = env.loader.get_source(env, name)[0]
+            for referenced in meta.find_referenced_templates(env.parse(source)):
+                if referenced is None:
+                    return None
+                pending.append(referenced)
+        return sorted(names)
+
+    def get_output(self, component, env, inputs, output_path):
+        '''Returns the rendered content of component if its recorded template
+        hashes and inputs still match and its file is unchanged, None otherwise'''
+        entry = self.entries.get(component)
+        if entry is None or entry.get('inputs') != inputs:
+            return None
+        if self.template_hashes(env, sorted(entry['templates'])) != entry['templates']:
+            return None
+        try:
+            with open(output_path, 'rb') as fh:
+                output = fh.read()
+        except IOError:
+            return None
+        if hashlib.sha1(output).hexdigest() != entry['output']:
+            return None
+        return output
+
+    def write_output(self, output_path, output):
+        '''Writes output unless the file already has this content. Returns True if
+        the file was written.'''
+        try:
+            with open(output_path, 'rb') as fh:
+                if fh.read() == output:
+                    return False
+        except IOError:
+            pass
+        write_atomic(output_path, output)
+        return True
+
+    def record(self, component, env, template_name, inputs, output):
+        names = self.referenced_templates(env, template_name)
+        hashes = self.template_hashes(env, names) if names is not None else None
+        with self.lock:
+            if hashes is None:
+                self.entries.pop(component, None)
+            else:
+                self.entries[component] = {'templates': hashes, 'inputs': inputs,
+                                           'output': hashlib.sha1(output).hexdigest()}
+            self.changed = True
+
+    def save(self):
+        with self.lock:
+            if not self.changed:
+                return
+            data = {'format': self.format, 'entries': self.entries}
+            write_atomic(self.path, json.dumps(data, separators=(',', ':'), sort_keys=True))
+            self.changed = False
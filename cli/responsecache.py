@@ -0,0 +1,245 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib
+import requests
+from requests.structures import CaseInsensitiveDict
+from cli.settings import Settings
+from cli.appconfig import AppConfig
+from cli.httpclient import http_client
+
+
+class CachedBody(object):
+    '''Raw body of a cached response, read from disk in chunks like a socket'''
+
+    def __init__(self, path):
+        self.fh = open(path, 'rb')
+
+    def read(self, size=-1):
+        data = self.fh.read(size)
+        if not data:
+            self.fh.close()
+        return data
+
+    def close(self):
+        self.fh.close()
+
+    # Called by requests.Response.close()
+    release_conn = close
+
+
+class ResponseCache:
+    '''On-disk cache for GET responses from Marathon and Chronos, kept under
+    $ROGER_CACHE_DIR (~/.roger/cache by default) and keyed by environment, user
+    and URL.
+
+    Responses younger than max_age seconds are served from disk without a
+    request. Older ones are revalidated with If-None-Match/If-Modified-Since when
+    the server sent an ETag or Last-Modified, and refetched otherwise. The least
+    recently used entries are removed once the cache grows past max_size_mb.
+    Pushes to an environment drop its entries.
+
+    The cache is off until a command turns it on with configure(). Max age and
+    size can be set in roger-mesos-tools.config with the keys http_cache_max_age
+    and http_cache_max_mb.'''
+
+    default_max_age = 30
+    default_max_size_mb = 100
+    chunk_size = 65536
+
+    def __init__(self, client=None):
+        self.client = client if client is not None else http_client
+        self.enabled = False
+        self.cache_dir = None
+        self.max_age = None
+        self.max_size = None
+        self.lock = threading.Lock()
+
+    def configure(self, enabled=True, max_age=None, cache_dir=None, max_size_mb=None):
+        self.enabled = enabled
+        if max_age is not None:
+            self.max_age = float(max_age)
+        if cache_dir is not None:
+            self.cache_dir = cache_dir
+        if max_size_mb is not None:
+            self.max_size = int(float(max_size_mb) * 1024 * 1024)
+
+    def load_settings(self):
+        roger_env = {}
+        settingObj = Settings()
+        try:
+            appObj = AppConfig()
+            roger_env = appObj.getRogerEnv(settingObj.getConfigDir()) or {}
+        except (IOError, ValueError):
+            pass
+        if self.cache_dir is None:
+            self.cache_dir = settingObj.getCacheDir()
+        if self.max_age is None:
+            self.max_age = float(roger_env.get('http_cache_max_age', self.default_max_age))
+        if self.max_size is None:
+            self.max_size = int(float(roger_env.get('http_cache_max_mb', self.default_max_size_mb)) * 1024 * 1024)
+
+    def get_entry_paths(self, environment, url, params, auth):
+        user = auth[0] if auth else ''
+        query = urllib.urlencode(sorted((params or {}).items()))
+        key = hashlib.sha1("{} {} {}?{}".format(environment, user, url, query)).hexdigest()
+        env_dir = os.path.join(self.cache_dir, hashlib.sha1(str(environment)).hexdigest()[:16])
+        return env_dir, os.path.join(env_dir, key + '.json'), os.path.join(env_dir, key + '.body')
+
+    def read_entry(self, meta_path, body_path):
+        try:
+            with open(meta_path) as fh:
+                entry = json.load(fh)
+            if os.path.exists(body_path):
+                return entry
+        except (IOError, OSError, ValueError):
+            pass
+        return None
+
+    def write_entry(self, meta_path, entry):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(meta_path))
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(entry, fh)
+        os.rename(tmp_path, meta_path)
+
+    def get(self, environment, url, **kwargs):
+        '''Same as http_client.get, but may answer from or revalidate against the
+        cache. Returns a requests.Response either way.'''
+        if not self.enabled:
+            return self.client.get(url, **kwargs)
+        if self.cache_dir is None or self.max_age is None or self.max_size is None:
+            self.load_settings()
+
+        stream = kwargs.pop('stream', False)
+        env_dir, meta_path, body_path = self.get_entry_paths(
+            environment, url, kwargs.get('params'), kwargs.get('auth'))
+        entry = self.read_entry(meta_path, body_path)
+        request_headers = kwargs.pop('headers', None)
+        headers = dict(request_headers or {})
+        if entry is not None:
+            if time.time() - entry['fetched_at'] < self.max_age:
+                os.utime(meta_path, None)
+                return self.cached_response(entry, body_path, stream)
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        resp = self.client.get(url, headers=headers, stream=True, **kwargs)
+        if resp.status_code == 304 and entry is not None:
+            resp.close()
+            entry['fetched_at'] = time.time()
+            self.write_entry(meta_path, entry)
+            return self.cached_response(entry, body_path, stream)
+        if resp.status_code != 200:
+            if not stream:
+                resp.content
+            return resp
+        try:
+            entry = self.store(resp, env_dir, meta_path, body_path)
+        except (IOError, OSError) as e:
+            print("Could not use response cache at {}: {}".format(self.cache_dir, e), file=sys.stderr)
+            resp.close()
+            return self.client.get(url, headers=request_headers, stream=stream, **kwargs)
+        resp.close()
+        self.evict(keep=meta_path)
+        return self.cached_response(entry, body_path, stream, cached=False)
+
+    def store(self, resp, env_dir, meta_path, body_path):
+        if not os.path.isdir(env_dir):
+            try:
+                os.makedirs(env_dir)
+            except OSError:
+                if not os.path.isdir(env_dir):
+                    raise
+        fd, tmp_path = tempfile.mkstemp(dir=env_dir)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in resp.iter_content(self.chunk_size):
+                    fh.write(chunk)
+            os.rename(tmp_path, body_path)
+        except:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        entry = {
+            'url': resp.url,
+            'status_code': resp.status_code,
+            'reason': resp.reason,
+            'encoding': resp.encoding,
+            'headers': dict((key, value) for key, value in resp.headers.items()
+                            if key.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')),
+            'etag': resp.headers.get('ETag'),
+            'last_modified': resp.headers.get('Last-Modified'),
+            'fetched_at': time.time()
+        }
+        self.write_entry(meta_path, entry)
+        return entry
+
+    def cached_response(self, entry, body_path, stream, cached=True):
+        resp = requests.Response()
+        resp.status_code = entry['status_code']
+        resp.reason = "{} (cached)".format(entry['reason']) if cached else entry['reason']
+        resp.url = entry['url']
+        resp.encoding = entry.get('encoding')
+        resp.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        if stream:
+            resp.raw = CachedBody(body_path)
+        else:
+            with open(body_path, 'rb') as fh:
+                resp._content = fh.read()
+            resp._content_consumed = True
+        return resp
+
+    def evict(self, keep=None):
+        '''Removes the least recently used entries, except keep, until the cache
+        fits in max_size'''
+        with self.lock:
+            entries = []
+            total_size = 0
+            for dirpath, dirnames, filenames in os.walk(self.cache_dir):
+                for filename in filenames:
+                    if not filename.endswith('.json'):
+                        continue
+                    meta_path = os.path.join(dirpath, filename)
+                    body_path = meta_path[:-len('.json')] + '.body'
+                    try:
+                        size = os.path.getsize(body_path) + os.path.getsize(meta_path)
+                        entries.append((os.path.getmtime(meta_path), meta_path, body_path, size))
+                    except OSError:
+                        continue
+                    total_size += size
+            for mtime, meta_path, body_path, size in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                if meta_path == keep:
+                    continue
+                for path in (meta_path, body_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total_size -= size
+
+    def invalidate(self, environment):
+        '''Drops every cached response of an environment, e.g. after a push'''
+        if not self.enabled:
+            return
+        if self.cache_dir is None:
+            self.load_settings()
+        env_dir = self.get_entry_paths(environment, '', None, None)[0]
+        shutil.rmtree(env_dir, ignore_errors=True)
+
+    def clear(self):
+        if self.cache_dir is not None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+response_cache = ResponseCache()
@@ -23,6 +23,8 @@ from cli.hooks import Hooks
 from cli.marathon import Marathon
 from cli.chronos import Chronos
 from cli.frameworkUtils import FrameworkUtils
+from cli.httpclient import http_client
+from cli.responsecache import response_cache
 from cli.gitutils import GitUtils
 from cli.dockerutils import DockerUtils
 from cli.docker_build import Docker
@@ -193,6 +195,32 @@ class RogerDeploy(object):
                                  help="specifies an optional secrets file for deployment runtime variables.")
         self.parser.add_argument('-d', '--directory',
                                  help="working directory. Uses a temporary directory if not specified.")
+        self.parser.add_argument('-w', '--wait', action="store_true",
+                                 help="waits for the framework deployment to finish before exiting. Defaults to false.")
+        self.parser.add_argument('--wait-timeout', metavar='seconds', type=int, default=600,
+                                 help="seconds to wait for a deployment when --wait is set. Defaults to 600.")
+        self.parser.add_argument('--push-unchanged', action="store_true",
+                                 help="pushes containers even if they match the running definition. Defaults to false.")
+        self.parser.add_argument('-P', '--parallelism', metavar='N', type=int, default=1,
+                                 help="number of containers to render and push at the same time. Defaults to 1.")
+        self.parser.add_argument('--batch', action="store_true",
+                                 help="pushes the app definitions of all containers in as few requests as possible"
+                                 " (Marathon only, groups are still pushed one by one). Defaults to false.")
+        self.parser.add_argument('--batch-size', metavar='N', type=int, default=10,
+                                 help="maximum number of definitions per batch when --batch is set. Defaults to 10.")
+        self.parser.add_argument('--routes-snapshot', metavar='file',
+                                 help="validates HTTP prefixes and TCP ports against routes saved with"
+                                 " 'roger routes snapshot' instead of fetching the HAProxy config.")
+        self.parser.add_argument('--routes-max-age', metavar='seconds', type=float, default=3600,
+                                 help="fetches the HAProxy config when the --routes-snapshot file is older than"
+                                 " this. Defaults to 3600.")
+        self.parser.add_argument('--no-cache', action="store_true",
+                                 help="fetches the current image version from the framework instead of the local response cache.")
+        self.parser.add_argument('--max-age', metavar='seconds', type=float,
+                                 help="reuses cached framework responses younger than this. Defaults to"
+                                 " http_cache_max_age in roger-mesos-tools.config or 30.")
+        self.parser.add_argument('--http-stats', action="store_true",
+                                 help="prints how many HTTP requests went over how many connections, per endpoint, to stderr.")
         return self.parser
 
     def main(self, settingObject, appObject, frameworkUtilsObject, gitObj, hooksObj, args):
@@ -457,6 +485,7 @@ if __name__ == "__main__":
     roger_deploy = RogerDeploy()
     roger_deploy.parser = roger_deploy.parseArgs()
     args = roger_deploy.parser.parse_args()
+    response_cache.configure(not args.no_cache, args.max_age)
     roger_deploy.main(settingObj, appObj, frameworkUtils,
                       gitObj, hooksObj, args)
     result_list = []
@@ -480,3 +509,6 @@ if __name__ == "__main__":
     except (Exception) as e:
         print("The following error occurred: %s" %
               e, file=sys.stderr)
+
+    if args.http_stats:
+        http_client.report()
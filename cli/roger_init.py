@@ -6,6 +6,9 @@ import json
 import os
 import sys
 from cli.settings import Settings
+from cli.appconfig import AppConfig
+from cli.haproxyparser import HAProxyParser
+from cli.roger_ports import RogerPorts
 
 import contextlib
 
@@ -36,6 +39,11 @@ class RogerInit(object):
                                  help="project (or team) name. Examples: 'roger', 'content', 'kwe'")
         self.parser.add_argument('-f', '--framework',
                                  help="framework to deploy the application to. Defaults to marathon.'")
+        self.parser.add_argument('-t', '--tcp-ports', metavar='N', type=int, default=0,
+                                 help="fills TCP_PORTS in the template with N free ports, as suggested by"
+                                 " 'roger ports suggest'. Defaults to 0.")
+        self.parser.add_argument('-e', '--env', metavar='env',
+                                 help="environment to find free TCP ports in. Example: 'dev' or 'stage'")
         return self.parser
 
     def writeJson(self, json, path, filename):
@@ -97,22 +105,40 @@ class RogerInit(object):
         port_dict['protocol'] = "tcp"
         return port_dict
 
-    def createContainerTags(self):
+    def createTcpPortMappings(self, tcp_ports):
+        # One extra port per TCP port, exposed to the app as PORT1, PORT2, ...
+        port_mappings = []
+        for tcp_port in tcp_ports:
+            port_dict = self.createPortMappings()
+            port_dict['containerPort'] = 0
+            port_mappings.append(port_dict)
+        return port_mappings
+
+    def createTcpPortsEnv(self, tcp_ports):
+        tcp_ports_dict = {}
+        for index, tcp_port in enumerate(tcp_ports):
+            tcp_ports_dict[str(tcp_port)] = "PORT{}".format(index + 1)
+        return json.dumps(tcp_ports_dict, sort_keys=True)
+
+    def createContainerTags(self, tcp_ports=()):
         container_dict, docker_dict = {}, {}
         docker_dict['image'] = "{{ image }}"
         docker_dict['network'] = "BRIDGE"
         port_mappings = []
         port_mappings.append(self.createPortMappings())
+        port_mappings.extend(self.createTcpPortMappings(tcp_ports))
         docker_dict['portMappings'] = port_mappings
         container_dict['type'] = "DOCKER"
         container_dict['docker'] = docker_dict
         return container_dict
 
-    def createMarathonConfig(self, templ_dir, filename, app_id):
+    def createMarathonConfig(self, templ_dir, filename, app_id, tcp_ports=()):
         json_dict, env = {}, {}
-        json_dict['container'] = self.createContainerTags()
+        json_dict['container'] = self.createContainerTags(tcp_ports)
         env['ENV_VAR1'] = "value1"
         env['ENV_VAR2'] = "value2"
+        if tcp_ports:
+            env['TCP_PORTS'] = self.createTcpPortsEnv(tcp_ports)
         json_dict['id'] = app_id
         json_dict['instances'] = 1
         json_dict['cpus'] = 0.2
@@ -121,6 +147,14 @@ class RogerInit(object):
         json_output = json.dumps(json_dict, indent=2)
         self.writeJson(json_output, templ_dir, filename)
 
+    def suggestTcpPorts(self, config_dir, args):
+        appObj = AppConfig()
+        roger_env = appObj.getRogerEnv(config_dir)
+        roger_ports = RogerPorts()
+        environment = roger_ports.get_environment(roger_env, args.env)
+        ports_args = argparse.Namespace(count=args.tcp_ports)
+        return roger_ports.suggest(settingObj, HAProxyParser(), environment, roger_env, ports_args)
+
     def main(self):
         self.parser = self.parse_args()
         args = self.parser.parse_args()
@@ -148,7 +182,11 @@ class RogerInit(object):
                 framework_filename, templ_dir))
         else:
             app_id = "{0}-{1}".format(args.project_name, args.app_name)
-            self.createMarathonConfig(templ_dir, framework_filename, app_id)
+            tcp_ports = []
+            if args.tcp_ports > 0:
+                tcp_ports = self.suggestTcpPorts(config_dir, args)
+                print("Using free TCP ports {0}".format(", ".join(str(port) for port in tcp_ports)))
+            self.createMarathonConfig(templ_dir, framework_filename, app_id, tcp_ports)
             print("Sample Marathon file {0} created under {1}".format(
                 framework_filename, templ_dir))
 
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import argparse
+import multiprocessing
+import os
+import sys
+from cli.settings import Settings
+from cli.appconfig import AppConfig
+from cli.haproxyparser import HAProxyParser
+from cli.portallocator import PortAllocator
+from cli.roger_validate import RogerValidate
+
+
+def describe():
+    return "suggests free TCP ports, not routed by HAProxy nor used by any config, for TCP_PORTS."
+
+
+class RogerPorts(object):
+
+    default_port_range = "10000-20000"
+
+    def parse_args(self):
+        parser = argparse.ArgumentParser(
+            prog='roger ports', description=describe())
+        subparsers = parser.add_subparsers(dest='action', metavar='action')
+        suggest_parser = subparsers.add_parser(
+            'suggest', help="prints the next free TCP ports of an environment.")
+        suggest_parser.add_argument('-n', '--count', metavar='N', type=int, default=1,
+                                    help="number of ports to suggest. Defaults to 1.")
+        suggest_parser.add_argument('-e', '--env', metavar='env',
+                                    help="environment to check. Example: 'dev' or 'stage'")
+        suggest_parser.add_argument('-r', '--range', metavar='first-last', dest='port_range',
+                                    help="ports to pick from. Defaults to tcp_port_range of the environment or of"
+                                    " roger-mesos-tools.config, or {}.".format(self.default_port_range))
+        suggest_parser.add_argument('-d', '--directory', metavar='directory',
+                                    help="working directory with checkouts of the repos of apps that keep their"
+                                    " templates in their repo. The ports of those apps are not seen without it.")
+        suggest_parser.add_argument('-P', '--processes', metavar='N', type=int,
+                                    default=multiprocessing.cpu_count(),
+                                    help="number of configuration files to render at the same time. Defaults to"
+                                    " the number of CPUs.")
+        suggest_parser.add_argument('--routes-snapshot', metavar='file',
+                                    help="uses routes saved with 'roger routes snapshot' instead of fetching the"
+                                    " HAProxy config.")
+        suggest_parser.add_argument('-v', '--verbose', action="store_true",
+                                    help="shows the rendering output.")
+        return parser
+
+    def get_port_range(self, roger_env, environment, port_range=None):
+        if port_range is None:
+            port_range = roger_env['environments'][environment].get(
+                'tcp_port_range', roger_env.get('tcp_port_range', self.default_port_range))
+        return PortAllocator.parse_range(port_range)
+
+    def build_allocator(self, settings, haproxyparser, environment, roger_env, args):
+        '''Returns a PortAllocator with every port routed by HAProxy or listed in the
+        TCP_PORTS of a config marked as taken'''
+        first_port, last_port = self.get_port_range(roger_env, environment, getattr(args, "port_range", None))
+        allocator = PortAllocator(first_port, last_port)
+
+        if getattr(args, "routes_snapshot", None):
+            haproxyparser.use_snapshot_file(args.routes_snapshot, environment)
+        for tcp_port in haproxyparser.get_snapshot(environment).get_backend_tcp_ports():
+            allocator.allocate(tcp_port)
+
+        config_dir = settings.getConfigDir()
+        roger_validate = RogerValidate()
+        config_files = roger_validate.get_config_files(config_dir, argparse.Namespace(all=True))
+        routes, render_errors = roger_validate.collect_routes(
+            settings, config_dir, config_files, environment, roger_env, args)
+        for route in routes:
+            for tcp_port in route.tcp_ports:
+                allocator.allocate(tcp_port)
+        for message in render_errors:
+            print("SKIPPED: {}".format(message))
+        return allocator
+
+    def suggest(self, settings, haproxyparser, environment, roger_env, args):
+        allocator = self.build_allocator(settings, haproxyparser, environment, roger_env, args)
+        return allocator.take(getattr(args, "count", 1))
+
+    def get_environment(self, roger_env, env):
+        environment = roger_env.get('default_environment', '')
+        if env is None:
+            if "ROGER_ENV" in os.environ:
+                env_var = os.environ.get('ROGER_ENV')
+                if env_var.strip() == '':
+                    print(
+                        "Environment variable $ROGER_ENV is not set.Using the default set from roger-mesos-tools.config file")
+                else:
+                    print(
+                        "Using value {} from environment variable $ROGER_ENV".format(env_var))
+                    environment = env_var
+        else:
+            environment = env
+
+        if environment not in roger_env['environments']:
+            raise ValueError('Environment not found in roger-mesos-tools.config file.')
+        return environment
+
+    def main(self, settings, appconfig, haproxyparser, args):
+        config_dir = settings.getConfigDir()
+        roger_env = appconfig.getRogerEnv(config_dir)
+        environment = self.get_environment(roger_env, args.env)
+
+        if args.action == 'suggest':
+            ports = self.suggest(settings, haproxyparser, environment, roger_env, args)
+            print("Free TCP ports in environment {}: {}".format(environment, ", ".join(str(port) for port in ports)))
+            return ports
+
+
+if __name__ == '__main__':
+    settings = Settings()
+    appconfig = AppConfig()
+    haproxyparser = HAProxyParser()
+    roger_ports = RogerPorts()
+    roger_ports.parser = roger_ports.parse_args()
+    roger_ports.args = roger_ports.parser.parse_args()
+    try:
+        roger_ports.main(settings, appconfig, haproxyparser, roger_ports.args)
+    except (Exception) as e:
+        print("The following error occurred: %s" %
+              e, file=sys.stderr)
+        sys.exit(1)
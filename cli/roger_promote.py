@@ -36,6 +36,7 @@ from cli.appconfig import AppConfig
 from cli.frameworkUtils import FrameworkUtils
 from cli.marathon import Marathon
 from cli.chronos import Chronos
+from cli.responsecache import response_cache
 
 
 def describe():
@@ -89,6 +90,7 @@ class RogerPromote(object):
 
         # Get Namespace obj
         args = rp.arg_parse().parse_args()
+        response_cache.configure(not args.no_cache, args.max_age)
 
         # Set framework based on app config
         rp._set_framework(args.config, args.app_name)
@@ -180,6 +182,14 @@ class RogerPromote(object):
         )
         parser.add_argument('app_name', help='The name of the application')
         parser.add_argument('config', help='The name of the config file')
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Fetch image names from the framework instead of the local response cache'
+        )
+        parser.add_argument(
+            '--max-age', metavar='seconds', type=float,
+            help='Reuse cached framework responses younger than this'
+        )
 
         return parser
 
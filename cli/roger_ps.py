@@ -12,7 +12,11 @@ from tabulate import tabulate
 from cli.settings import Settings
 from cli.appconfig import AppConfig
 from cli.marathon import Marathon
+from cli.chronos import Chronos
 from cli.haproxyparser import HAProxyParser
+from cli.records import group_tasks_by_app
+from cli.httpclient import http_client
+from cli.responsecache import response_cache
 
 
 def describe():
@@ -28,46 +32,37 @@ class RogerPS(object):
                             help="environment to search. Example: 'dev' or 'stage'")
         parser.add_argument(
             '-v', '--verbose', help="show extended information for each task", action="store_true")
+        parser.add_argument('-F', '--framework', choices=['marathon', 'chronos'], default='marathon',
+                            help="framework to list. 'chronos' shows the status of scheduled jobs. Defaults to marathon")
+        parser.add_argument(
+            '--no-cache', help="fetches apps and tasks from the framework instead of the local response cache", action="store_true")
+        parser.add_argument('--max-age', metavar='seconds', type=float,
+                            help="reuses cached responses younger than this. Defaults to http_cache_max_age"
+                            " in roger-mesos-tools.config or 30.")
+        parser.add_argument('--http-stats', action="store_true",
+                            help="prints how many HTTP requests went over how many connections, per endpoint, to stderr.")
         return parser
 
     def get_app_details(self, framework, haproxyparser, environment, args, roger_env):
         app_details = {}
-        instances = {}
         instance_details = self.get_instance_details(
             framework, roger_env, environment)
         app_envs = self.get_app_envs(framework, roger_env, environment)
-        for task_id in instance_details:
-            app_id = instance_details[task_id][0]
-            if app_id in instances.keys():
-                tasks_list = instances[app_id]
-                tasks_list.append(task_id)
-                instances[app_id] = tasks_list
-            else:
-                tasks_list = []
-                tasks_list.append(task_id)
-                instances[app_id] = tasks_list
+        apps = group_tasks_by_app(instance_details, app_envs)
 
         haproxyparser.parseConfig(environment)
-        http_prefixes = haproxyparser.get_path_begin_values()
-        tcp_ports = haproxyparser.get_backend_tcp_ports()
+        http_prefixes = haproxyparser.get_path_begin_values_by_backend()
+        tcp_ports = haproxyparser.get_tcp_ports_by_backend()
 
         app_ids = {}
-        for app_id in instances.keys():
-            http_prefix = ""
+        for app_id, app in apps.iteritems():
             http_url = "-"
-            tcp_port_list = []
-            num_instances = len(instances[app_id])
-            for k, v in http_prefixes.iteritems():
-                if app_id == v:
-                    http_prefix = k
-                    if app_id in app_envs.keys():
-                        if 'HTTP_PORT' in app_envs[app_id]:
-                            http_url = "{}{}".format(roger_env['environments'][
-                                                     environment]['host'], http_prefix)
-                            break
-            for k, v in tcp_ports.iteritems():
-                if app_id == v:
-                    tcp_port_list.append(k)
+            num_instances = len(app.task_ids)
+            app_http_prefixes = http_prefixes.get(app_id, [])
+            if app_http_prefixes and 'HTTP_PORT' in app.env:
+                http_url = "{}{}".format(roger_env['environments'][
+                                         environment]['host'], app_http_prefixes[0])
+            tcp_port_list = tcp_ports.get(app_id, [])
             app_details = {}
             app_details["instances"] = num_instances
             app_details["http_url"] = http_url
@@ -77,11 +72,12 @@ class RogerPS(object):
                 app_details["tcp_port_list"] = "-"
             if args.verbose:
                 task_ids = {}
-                for task_id in instances[app_id]:
+                for task_id in app.task_ids:
+                    task = instance_details[task_id]
                     task_details = {}
-                    task_details["hostname"] = instance_details[task_id][1]
-                    task_details["ports"] = instance_details[task_id][2]
-                    task_details["started_at"] = instance_details[task_id][3]
+                    task_details["hostname"] = task[1]
+                    task_details["ports"] = task[2]
+                    task_details["started_at"] = task[3]
                     task_ids[task_id] = task_details
                 app_details["tasks"] = task_ids
             app_ids[app_id] = app_details
@@ -119,6 +115,18 @@ class RogerPS(object):
             headers = ["App Id", "Instances", "Http Url", "TCP Ports"]
         print("{}".format(tabulate(apps, headers=headers, tablefmt="simple")))
 
+    def get_job_details(self, framework, environment, roger_env):
+        jobs = []
+        for job in framework.iterJobStatus(roger_env, environment):
+            jobs.append([job.name, job.state or "-", job.last_status or "-", job.last_run or "-",
+                         job.success_count, job.error_count, job.image or "-"])
+        jobs.sort()
+        return jobs
+
+    def print_job_details(self, jobs):
+        headers = ["Job", "State", "Last Status", "Last Run", "Successes", "Errors", "Image"]
+        print("{}".format(tabulate(jobs, headers=headers, tablefmt="simple")))
+
     def get_app_envs(self, framework, roger_env, environment):
         app_envs = framework.getAppEnvDetails(roger_env, environment)
         return app_envs
@@ -148,6 +156,10 @@ class RogerPS(object):
         if environment not in roger_env['environments']:
             raise ValueError('Environment not found in roger-mesos-tools.config file.')
 
+        if framework.getName() == "Chronos":
+            self.print_job_details(self.get_job_details(framework, environment, roger_env))
+            return
+
         app_details = self.get_app_details(
             framework, haproxyparser, environment, args, roger_env)
         self.print_app_details(app_details, args)
@@ -156,9 +168,12 @@ class RogerPS(object):
 if __name__ == '__main__':
     settings = Settings()
     appconfig = AppConfig()
-    framework = Marathon()
     haproxyparser = HAProxyParser()
     roger_ps = RogerPS()
     roger_ps.parser = roger_ps.parse_args()
     roger_ps.args = roger_ps.parser.parse_args()
+    framework = Chronos() if roger_ps.args.framework == 'chronos' else Marathon()
+    response_cache.configure(not roger_ps.args.no_cache, roger_ps.args.max_age)
     roger_ps.main(settings, appconfig, framework, haproxyparser, roger_ps.args)
+    if roger_ps.args.http_stats:
+        http_client.report()
@@ -2,14 +2,16 @@
 
 from __future__ import print_function
 import argparse
-from jinja2 import Environment, FileSystemLoader, StrictUndefined, exceptions
+from jinja2 import StrictUndefined, exceptions
 from datetime import datetime
 import requests
 import json
 import os
 import sys
+import threading
 import traceback
 import logging
+import yaml
 from cli.settings import Settings
 from cli.appconfig import AppConfig
 from cli.utils import Utils
@@ -17,6 +19,14 @@ from cli.marathon import Marathon
 from cli.hooks import Hooks
 from cli.chronos import Chronos
 from cli.frameworkUtils import FrameworkUtils
+from cli.httpclient import http_client
+from cli.workerpool import WorkerPool
+from cli.deploymentdocument import DeploymentDocument
+from cli.haproxyparser import HAProxyParser
+from cli.templatecache import template_cache
+from cli.rendermanifest import RenderManifest, fingerprint
+from cli.secretsstore import SecretsStore, thaw
+from cli.variablescopes import VariableScopes
 from datetime import datetime
 
 import contextlib
@@ -49,6 +59,15 @@ class RogerPush(object):
         self.outcome = 1
         self.registry = ""
         self.image_name = ""
+        self.documents = {}
+        # Variable scopes of the config and app, by environment, image and app
+        self.app_scopes = {}
+        self.secrets_store = SecretsStore()
+        # Render manifests by components dir of an environment
+        self.render_manifests = {}
+        self.render_manifest_lock = threading.Lock()
+        # Container names by what the comparison with the running definition found
+        self.sync_summary = {'added': [], 'changed': [], 'unchanged': []}
 
     def parse_args(self):
         self.parser = argparse.ArgumentParser(
@@ -69,15 +88,42 @@ class RogerPush(object):
             '--force-push', '-f', help="force push. Not Recommended. Forces push even if validation checks failed. Defaults to false.", action="store_true")
         self.parser.add_argument('--secrets-file', '-S',
                                  help="specifies an optional secrets file for deploy runtime variables.")
+        self.parser.add_argument(
+            '--wait', '-w', help="waits for the framework deployment to finish before exiting. Defaults to false.", action="store_true")
+        self.parser.add_argument('--wait-timeout', metavar='seconds', type=int, default=600,
+                                 help="seconds to wait for a deployment when --wait is set. Defaults to 600.")
+        self.parser.add_argument(
+            '--push-unchanged', help="pushes containers even if they match the running definition. Defaults to false.", action="store_true")
+        self.parser.add_argument('--parallelism', '-P', metavar='N', type=int, default=1,
+                                 help="number of containers to render and push at the same time. Defaults to 1.")
+        self.parser.add_argument(
+            '--batch', help="pushes the app definitions of all containers in as few requests as possible"
+            " (Marathon only, groups are still pushed one by one). Defaults to false.", action="store_true")
+        self.parser.add_argument('--batch-size', metavar='N', type=int, default=10,
+                                 help="maximum number of definitions per batch when --batch is set. Defaults to 10.")
+        self.parser.add_argument(
+            '--all-envs', help="renders the containers for every environment in roger-mesos-tools.config, into"
+            " <components dir>/<env>, and reports the failures of all environments together. Implies --skip-push.",
+            action="store_true")
+        self.parser.add_argument('--explain-var', metavar='name', action='append',
+                                 help="prints the value of a template variable for each container and the layer of"
+                                 " vars it comes from (config, app or container, global or environment, extra"
+                                 " variables or secrets). Can be repeated.")
+        self.parser.add_argument('--routes-snapshot', metavar='file',
+                                 help="validates HTTP prefixes and TCP ports against routes saved with"
+                                 " 'roger routes snapshot' instead of fetching the HAProxy config.")
+        self.parser.add_argument('--routes-max-age', metavar='seconds', type=float, default=3600,
+                                 help="fetches the HAProxy config when the --routes-snapshot file is older than"
+                                 " this. Defaults to 3600.")
+        self.parser.add_argument('--http-stats', action="store_true",
+                                 help="prints how many HTTP requests went over how many connections, per endpoint, to stderr.")
         return self.parser
 
     def loadSecrets(self, secrets_dir, file_name, args, environment):
         if args.secrets_file is not None:
             print("Using specified secrets file: {}".format(args.secrets_file))
             file_name = args.secrets_file
-        exists = os.path.exists(secrets_dir)
-        if exists is False:
-            os.makedirs(secrets_dir)
+        self.secrets_store.ensure_dir(secrets_dir)
 
         # Two possible paths -- first without environment, second with
         path1 = "{}/{}".format(secrets_dir, file_name)
@@ -85,9 +131,7 @@ class RogerPush(object):
         print(" Loading secrets from {} or {}".format(path1, path2))
 
         try:
-            with open(path1) as f:
-                return_file = yaml.load(f) if path1.lower().endswith('.yml') else json.load(f)
-            return return_file
+            return self.secrets_store.load(path1)
         except IOError:
             pass
         except ValueError as e:
@@ -95,9 +139,7 @@ class RogerPush(object):
                 " Error while loading json from {} - {}".format(path1, e))
 
         try:
-            with open(path2) as f:
-                return_file = yaml.load(f) if path2.lower().endswith('.yml') else json.load(f)
-            return return_file
+            return self.secrets_store.load(path2)
         except IOError:
             print(" Couldn't load secrets file environment in %s or %s\n" %
                   (path1, path2), file=sys.stderr)
@@ -106,58 +148,115 @@ class RogerPush(object):
             raise ValueError(
                 " Error while loading json from {} - {}".format(path2, e))
 
-    def replaceSecrets(self, output_dict, secrets_dict):
-        if type(output_dict) is not dict:
-            return output_dict
-
-        for key in output_dict:
-            if output_dict[key] == "SECRET":
-                if key in secrets_dict.keys():
-                    output_dict[key] = secrets_dict[key]
-
-            if type(output_dict[key]) is list:
-                temp_list = []
-                for list_elem in output_dict[key]:
-                    temp_list.append(self.replaceSecrets(
-                        list_elem, secrets_dict))
-                    output_dict[key] = temp_list
-
-            if type(output_dict[key]) is dict:
-                temp_dict = self.replaceSecrets(output_dict[key], secrets_dict)
-                output_dict[key] = temp_dict
-
-        return output_dict
+    def substituteSecrets(self, output_dict, secrets_dict):
+        '''Replaces, in place and in one pass over the parsed output, every "SECRET"
+        value with the secret of the same name as its key. Returns the paths of the
+        "SECRET" values that could not be replaced, like 'env.DB_PASSWORD' or
+        'apps[2].env.API_KEY'.'''
+        unresolved = []
+        pending = [(output_dict, '')] if type(output_dict) in (dict, list) else []
+        while pending:
+            node, path = pending.pop()
+            is_dict = type(node) is dict
+            for key, value in (node.items() if is_dict else enumerate(node)):
+                if value != "SECRET" and type(value) is not dict and type(value) is not list:
+                    continue
+                if is_dict:
+                    value_path = "%s.%s" % (path, key) if path else key
+                else:
+                    value_path = "%s[%d]" % (path, key)
+                if value != "SECRET":
+                    pending.append((value, value_path))
+                elif is_dict and key in secrets_dict:
+                    node[key] = thaw(secrets_dict[key])
+                else:
+                    unresolved.append(value_path)
+        return sorted(unresolved)
 
     def mergeSecrets(self, json_str, secrets):
         '''Given a JSON string and an object of secret environment variables, replaces
         parses the JSON keys with the secret variables. Returns back
-        a JSON string. Raises an error if there are any SECRET variables still exists.'''
+        a JSON string. Returns "StandardError" if there are any SECRET variables still exists.'''
+        return self.mergeParsedSecrets(json.loads(json_str), secrets)
+
+    def mergeParsedSecrets(self, output_dict, secrets):
+        '''Same as mergeSecrets for output that is already parsed. output_dict is
+        updated in place.'''
         print("WARNING - The use of \"SECRET\" is deprecated. Please switch to using Jinja variables. To do so,"
               " use '{{ <actual variable name> }}' instead of \"SECRET\" in the target file.")
-        output_dict = json.loads(json_str)
-        json_str = json.dumps(self.replaceSecrets(
-            output_dict, secrets), indent=4)
-
-        if '\"SECRET\"' in json_str:
-            print('There are still "SECRET" values -- does your secrets file have all secret environment variables?')
+        unresolved = self.substituteSecrets(output_dict, secrets)
+        if unresolved:
+            print('There are still "SECRET" values -- does your secrets file have all secret environment variables?'
+                  ' Missing: {}'.format(", ".join(unresolved)))
             return "StandardError"
-        return json_str
-
-    def renderTemplate(self, template, environment, image, app_data, config, container, container_name, additional_vars):
-
-        variables = {'environment': environment, 'image': image}
+        return json.dumps(output_dict, indent=4)
 
+    def templateVariables(self, environment, image, app_data, config, container, additional_vars):
         # Copy variables from config-wide, app-wide, then container-wide variable
         # configs, each one from "global" and then environment-specific.
-        for obj in [config, app_data, container]:
-            if type(obj) == dict and 'vars' in obj:
-                variables.update(obj['vars'].get('global', {}))
-                variables.update(obj['vars'].get('environment', {}).get(environment, {}))
-
-        variables.update(additional_vars)
+        return self.get_container_scopes(environment, image, config, app_data, container,
+                                         [('additional variables', additional_vars)]).flatten()
+
+    def get_app_scopes(self, environment, image, config, app_data):
+        '''Returns the variable scopes shared by all containers of app_data in
+        environment, merged once per run'''
+        key = (environment, image, config.get('name'), app_data.get('name'))
+        scopes = self.app_scopes.get(key)
+        if scopes is None:
+            scopes = self.app_scopes.setdefault(key, VariableScopes.for_app(environment, image, config, app_data))
+        return scopes
+
+    def get_container_scopes(self, environment, image, config, app_data, container, additional_layers):
+        '''Returns the variable scopes of one container: those of its app, then the
+        container vars and the additional layers'''
+        return self.get_app_scopes(environment, image, config, app_data).for_container(
+            container, environment, additional_layers)
+
+    def explain_variables(self, names, scopes, container_name, environment):
+        '''Prints where the value of each variable in names comes from, for --explain-var'''
+        for name in names:
+            label = scopes.where(name)
+            if label is None:
+                print("  {} [{}]: {} is not set".format(container_name, environment, name))
+            else:
+                value = "****" if label == 'secrets' else repr(scopes[name])
+                print("  {} [{}]: {} = {} from {}".format(container_name, environment, name, value, label))
 
+    def renderTemplate(self, template, environment, image, app_data, config, container, container_name, additional_vars):
+        variables = self.templateVariables(environment, image, app_data, config, container, additional_vars)
         return template.render(variables)
 
+    def print_render_report(self, environments, render_results, comp_dir):
+        '''Prints, for --all-envs, the containers that failed to render in each
+        environment'''
+        failures = {}
+        for environment, (container_name, error_str) in render_results:
+            if error_str is not None:
+                failures.setdefault(environment, []).append((container_name, error_str.strip()))
+        print("Rendered {} container(s) for {} environment(s) under {}:".format(
+            len(render_results) // max(1, len(environments)), len(environments), comp_dir))
+        for environment in environments:
+            if environment not in failures:
+                print("  {}: ok".format(environment))
+                continue
+            print("  {}: {} failed".format(environment, len(failures[environment])))
+            for container_name, error_str in failures[environment]:
+                print("    {}: {}".format(container_name, error_str))
+
+    def get_render_manifest(self, comp_dir, environment):
+        comp_env_dir = "{0}/{1}".format(comp_dir, environment)
+        with self.render_manifest_lock:
+            if comp_env_dir not in self.render_manifests:
+                self.render_manifests[comp_env_dir] = RenderManifest(comp_env_dir)
+            return self.render_manifests[comp_env_dir]
+
+    def save_render_manifests(self):
+        for render_manifest in self.render_manifests.values():
+            try:
+                render_manifest.save()
+            except (IOError, OSError) as e:
+                print("WARNING: could not save {} - {}".format(render_manifest.path, e), file=sys.stderr)
+
     def statsd_counter_logging(self, metric):
         sc = self.utils.getStatsClient()
         sc.incr(metric, 1)
@@ -172,6 +271,296 @@ class RogerPush(object):
             return "{0}/{1}/{2}/{3}".format(os.environ.get('PWD', ''),
                                             args.directory, repo_name, path)
 
+    def render_container(self, container, app_path, config, data, roger_env, environment, args, secrets_dir, comp_dir, extra_vars):
+        '''Renders one container template into the components dir. Returns
+        (container_name, error) where error is set when Jinja variables did not resolve.'''
+        if type(container) == dict:
+            container_name = str(container.keys()[0])
+            container = container[container_name]
+            containerConfig = "{0}-{1}.json".format(
+                config['name'], container_name)
+        else:
+            container_name = container
+            containerConfig = "{0}-{1}.json".format(
+                config['name'], container)
+
+        env = template_cache.get_environment(app_path, template_cache.get_cache_dir(comp_dir), StrictUndefined)
+        template_with_path = "[{}{}]".format(app_path, containerConfig)
+        try:
+            template = env.get_template(containerConfig)
+        except exceptions.TemplateNotFound as e:
+            raise ValueError(
+                "The template file {} does not exist".format(template_with_path))
+        except Exception as e:
+            raise ValueError(
+                "Error while reading template from {} - {}".format(template_with_path, e))
+
+        secret_vars = self.loadSecrets(secrets_dir, containerConfig, args, environment)
+
+        image_path = "{0}/{1}".format(
+            roger_env['registry'], args.image_name)
+        config_file_path = "{0}/{1}/{2}".format(comp_dir, environment, containerConfig)
+        scopes = self.get_container_scopes(environment, image_path, config, data, container,
+                                           [('extra variables', extra_vars), ('secrets', secret_vars)])
+        if getattr(args, "explain_var", None):
+            self.explain_variables(args.explain_var, scopes, container_name, environment)
+        # The variables include the secrets, SECRET values are filled from the same file
+        variables = scopes.flatten()
+        inputs = fingerprint([variables, secret_vars])
+        render_manifest = self.get_render_manifest(comp_dir, environment)
+        output = render_manifest.get_output(containerConfig, env, inputs, config_file_path)
+        if output is not None:
+            print("Template {} and its variables are unchanged for environment [{}], keeping {}".format(
+                template_with_path, environment, config_file_path))
+            self.documents[container_name] = DeploymentDocument.parse(output, config_file_path)
+            return container_name, None
+
+        print("Rendering content from template {} for environment [{}]".format(
+            template_with_path, environment))
+        try:
+            output = template.render(variables)
+        except exceptions.UndefinedError as e:
+            error_str = "The following error occurred. %s.\n" % e
+            print(error_str, file=sys.stderr)
+            return container_name, error_str
+
+        # Adding check so that not all apps try to mergeSecrets
+        try:
+            outputObj = json.loads(output)
+        except Exception as e:
+            raise ValueError(
+                "Error while loading json from {} - {}".format(template_with_path, e))
+
+        if 'SECRET' in output:
+            output = self.mergeParsedSecrets(outputObj, secret_vars)
+        if output != "StandardError":
+            render_manifest.write_output(config_file_path, output)
+            render_manifest.record(containerConfig, env, containerConfig, inputs, output)
+            # Validation, the push and task ids all use this parsed copy
+            self.documents[container_name] = DeploymentDocument(outputObj, output, config_file_path)
+        return container_name, None
+
+    def container_definition(self, container, config, comp_dir, environment):
+        '''Returns (container_name, definition) where definition is the DeploymentDocument
+        rendered for the container in this run, or else the path of its rendered file'''
+        if type(container) == dict:
+            container_name = str(container.keys()[0])
+        else:
+            container_name = container
+        containerConfig = "{0}-{1}.json".format(config['name'], container_name)
+        config_file_path = "{0}/{1}/{2}".format(comp_dir, environment, containerConfig)
+        return container_name, self.documents.get(container_name, config_file_path)
+
+    def check_container(self, container, frameworkObj, framework, failed_container_dict, config, comp_dir,
+                        environment, environmentObj, act_as_user, args):
+        '''Decides what to do with one rendered container. Returns "failed" (unresolved
+        template variables), "invalid" (validation checks failed), "unchanged" (matches
+        the running definition) or "push".'''
+        container_name, definition = self.container_definition(container, config, comp_dir, environment)
+        if container_name in failed_container_dict:
+            print("Failed push to {} framework for container {} as unresolved Jinja variables present in template.".format(
+                framework, container_name))
+            return "failed"
+
+        result = frameworkObj.runDeploymentChecks(
+            definition, environment)
+
+        if not (args.force_push or result is True):
+            print("Skipping push to {} framework for container {} as Validation Checks failed.".format(
+                framework, container))
+            return "invalid"
+        if not getattr(args, "push_unchanged", False):
+            matches = frameworkObj.matchesRunningDefinition(definition, environmentObj, environment, act_as_user)
+            if matches is True:
+                self.sync_summary['unchanged'].append(container_name)
+                print("Skipping push to {} framework for container {} as it matches the running definition.".format(
+                    framework, container_name))
+                return "unchanged"
+            self.sync_summary['added' if matches is None else 'changed'].append(container_name)
+        return "push"
+
+    def print_sync_summary(self, framework):
+        if not any(self.sync_summary.values()):
+            return
+        print("{} sync summary: {} added, {} changed, {} unchanged".format(
+            framework, len(self.sync_summary['added']), len(self.sync_summary['changed']),
+            len(self.sync_summary['unchanged'])))
+        for status in ['added', 'changed']:
+            if self.sync_summary[status]:
+                print("  {}: {}".format(status, ", ".join(sorted(self.sync_summary[status]))))
+
+    def push_batches(self, worker_pool, data_containers, frameworkObj, framework, failed_container_dict, config,
+                     comp_dir, environment, environmentObj, act_as_user, args):
+        '''Checks all containers, then pushes the ones the framework can batch in
+        groups of at most --batch-size definitions. Returns one (action, batch_result)
+        per container for push_container, batch_result being (response, task ids,
+        deployment succeeded), the error a failed batch raised, or None when the
+        container is not part of a batch.'''
+        actions = worker_pool.map(
+            lambda container: self.check_container(container, frameworkObj, framework, failed_container_dict, config,
+                                                   comp_dir, environment, environmentObj, act_as_user, args),
+            data_containers)
+        prepared = [(action, None) for action in actions]
+
+        batch = []
+        for index, container in enumerate(data_containers):
+            container_name, definition = self.container_definition(container, config, comp_dir, environment)
+            if actions[index] == "push" and frameworkObj.isBatchable(definition):
+                batch.append((index, container_name, definition))
+
+        batch_size = max(1, getattr(args, "batch_size", 10) or 1)
+        for start in range(0, len(batch), batch_size):
+            chunk = batch[start:start + batch_size]
+            try:
+                resp, task_id_lists = frameworkObj.putBatch(
+                    [item[2] for item in chunk], environmentObj, [item[1] for item in chunk], environment,
+                    act_as_user)
+                deployed = None
+                if getattr(args, "wait", False) and str(getattr(resp, "status_code", "")).startswith("20"):
+                    deployed = frameworkObj.waitForDeployment(resp, environmentObj, environment,
+                                                              getattr(args, "wait_timeout", 600))
+            except (Exception) as e:
+                # Each container of the batch fails in push_container, with its metrics
+                print("Batch push of {} failed.".format(", ".join(item[1] for item in chunk)), file=sys.stderr)
+                for item in chunk:
+                    prepared[item[0]] = ("push", e)
+                continue
+            for item, task_id in zip(chunk, task_id_lists):
+                prepared[item[0]] = ("push", (resp, task_id, deployed))
+        return prepared
+
+    def push_levels(self, data_containers, frameworkObj, framework, failed_container_dict, config, comp_dir,
+                    environment, environmentObj):
+        '''Groups container indexes into levels that are pushed one after another,
+        e.g. Chronos parent jobs before their children. Containers in one level are
+        pushed in parallel. Containers without a rendered definition go in the first
+        level. Raises ValueError (e.g. for dependency cycles) before anything is pushed.'''
+        indexes = []
+        definitions = []
+        for index, container in enumerate(data_containers):
+            container_name, definition = self.container_definition(container, config, comp_dir, environment)
+            if container_name not in failed_container_dict and container_name in self.documents:
+                indexes.append(index)
+                definitions.append(definition)
+        levels = frameworkObj.getPushLevels(definitions, environmentObj, environment) if definitions else None
+        if levels is None:
+            return [range(len(data_containers))]
+
+        ordered = set(indexes)
+        first_level = [index for index in range(len(data_containers)) if index not in ordered]
+        levels = [[indexes[position] for position in level] for level in levels]
+        if levels:
+            levels[0] = sorted(first_level + levels[0])
+        else:
+            levels = [first_level]
+        if len(levels) > 1:
+            print("Pushing to {} framework in {} levels:".format(framework, len(levels)))
+            for number, level in enumerate(levels):
+                print("  {}: {}".format(number + 1, ", ".join(
+                    self.container_definition(data_containers[index], config, comp_dir, environment)[0]
+                    for index in level)))
+        return levels
+
+    def push_container(self, index, container, push_results, frameworkObj, framework, failed_container_dict, config,
+                       config_name, comp_dir, environment, environmentObj, act_as_user, settingObj, args,
+                       tools_version_value, image_tag_value, prepared=None):
+        '''Validates and pushes one rendered container. Task ids, statsd tuples and the
+        outcome are stored in push_results[index] (also when the push raises).
+
+        prepared is an (action, batch_result) tuple from push_batches, when the
+        container was already checked and possibly pushed as part of a batch.'''
+        try:
+            function_execution_start_time = datetime.now()
+            execution_result = 'SUCCESS'  # Assume the execution_result to be SUCCESS unless exception occurs
+            sc = self.utils.getStatsClient()
+        except (Exception) as e:
+            print("The following error occurred: %s" %
+                  e, file=sys.stderr)
+        try:
+            container_name, definition = self.container_definition(container, config, comp_dir, environment)
+            batch_result = None
+            if prepared is None:
+                action = self.check_container(container, frameworkObj, framework, failed_container_dict, config,
+                                              comp_dir, environment, environmentObj, act_as_user, args)
+            else:
+                action, batch_result = prepared
+
+            if action == "unchanged":
+                # Nothing to push is not a failure
+                status_code = 200
+            elif action == "push":
+                if batch_result is None:
+                    resp, task_id = frameworkObj.put(
+                        definition, environmentObj, container_name, environment, act_as_user)
+                    deployed = None
+                elif isinstance(batch_result, Exception):
+                    raise batch_result
+                else:
+                    resp, task_id, deployed = batch_result
+
+                container_task_id = self.utils.modify_task_id(task_id)
+
+                if hasattr(resp, "status_code"):
+                    status_code = resp.status_code
+
+                if batch_result is None and getattr(args, "wait", False) and \
+                        str(getattr(resp, "status_code", "")).startswith("20"):
+                    wait_timeout = getattr(args, "wait_timeout", 600)
+                    deployed = frameworkObj.waitForDeployment(resp, environmentObj, environment, wait_timeout)
+                if deployed is False:
+                    raise ValueError("Deployment for container {} did not succeed.".format(container_name))
+        except (Exception) as e:
+            print("The following error occurred: %s" %
+                  e, file=sys.stderr)
+            execution_result = 'FAILURE'
+            raise
+        finally:
+            try:
+                outcome = 1
+                statsd_push_list = []
+
+                if 'function_execution_start_time' not in globals() and 'function_execution_start_time' not in locals():
+                    function_execution_start_time = datetime.now()
+
+                if 'execution_result' not in globals() and 'execution_result' not in locals():
+                    execution_result = 'FAILURE'
+
+                if 'container_name' not in globals() and 'container_name' not in locals():
+                    container_name = ""
+
+                if 'status_code' not in globals() and 'status_code' not in locals():
+                    status_code = "500"
+
+                if not hasattr(args, "app_name"):
+                    args.app_name = ""
+
+                if 'container_task_id' not in globals() and 'container_task_id' not in locals():
+                    container_task_id = []
+
+                if not hasattr(self, "identifier"):
+                    self.identifier = self.utils.get_identifier(config_name, settingObj.getUser(), args.app_name)
+
+                if not str(status_code).startswith("20"):
+                    execution_result = 'FAILURE'
+                    outcome = 0
+
+                time_take_milliseonds = ((datetime.now() - function_execution_start_time).total_seconds() * 1000)
+                for task_id in container_task_id:
+                    input_metric = "roger-tools.rogeros_tools_exec_time," + "app_name=" + str(args.app_name) + ",event=push" + ",container_name=" + str(container_name) + ",identifier=" + str(self.identifier) + ",outcome=" + str(execution_result) + ",response_code=" + str(status_code) + ",config_name=" + str(config_name) + ",env=" + str(environment) + ",user=" + str(settingObj.getUser()) + ",task_id=" + str(task_id) + ",tools_version=" + str(tools_version_value) + ",image_tag=" + str(image_tag_value)
+                    tup = (input_metric, time_take_milliseonds)
+                    statsd_push_list.append(tup)
+
+                    if str(status_code).startswith("20"):
+                        metric = input_metric.replace("rogeros_tools_exec_time", "rogeros_events")
+                        metric = metric + ",source=tools" + ",task_id=" + task_id
+                        self.statsd_counter_logging(metric)
+
+                push_results[index] = (container_task_id, statsd_push_list, outcome)
+            except (Exception) as e:
+                print("The following error occurred: %s" %
+                      e, file=sys.stderr)
+                raise
+
     def main(self, settings, appConfig, frameworkObject, hooksObj, args):
         try:
             settingObj = settings
@@ -220,6 +609,10 @@ class RogerPush(object):
                     'Environment not found in roger-mesos-tools.config file.')
 
             environmentObj = roger_env['environments'][environment]
+            all_envs = getattr(args, "all_envs", False)
+            if getattr(args, "routes_snapshot", None):
+                HAProxyParser().use_snapshot_file(args.routes_snapshot, environment,
+                                                  getattr(args, "routes_max_age", 3600))
             common_repo = config.get('repo', '')
             app_name = args.app_name
             container_list = []
@@ -302,75 +695,40 @@ class RogerPush(object):
             if exit_code != 0:
                 raise ValueError('{} hook failed.'.format(hookname))
 
-            for container in data_containers:
-                if type(container) == dict:
-                    container_name = str(container.keys()[0])
-                    container = container[container_name]
-                    containerConfig = "{0}-{1}.json".format(
-                        config['name'], container_name)
-                else:
-                    container_name = container
-                    containerConfig = "{0}-{1}.json".format(
-                        config['name'], container)
+            render_environments = [environment]
+            if all_envs:
+                render_environments = sorted(roger_env['environments'].keys())
 
-                env = Environment(loader=FileSystemLoader(
-                    "{}".format(app_path)), undefined=StrictUndefined)
-                template_with_path = "[{}{}]".format(app_path, containerConfig)
+            # Create the environment components dirs once, before containers render in parallel
+            for render_environment in render_environments:
                 try:
-                    template = env.get_template(containerConfig)
-                except exceptions.TemplateNotFound as e:
-                    raise ValueError(
-                        "The template file {} does not exist".format(template_with_path))
+                    comp_env_dir = "{0}/{1}".format(comp_dir, render_environment)
+                    if os.path.exists(comp_env_dir) is False:
+                        os.makedirs(comp_env_dir)
                 except Exception as e:
-                    raise ValueError(
-                        "Error while reading template from {} - {}".format(template_with_path, e))
-
-                additional_vars = {}
-                additional_vars.update(extra_vars)
-                secret_vars = self.loadSecrets(secrets_dir, containerConfig, args, environment)
-                additional_vars.update(secret_vars)
-
-                image_path = "{0}/{1}".format(
-                    roger_env['registry'], args.image_name)
-                print("Rendering content from template {} for environment [{}]".format(
-                    template_with_path, environment))
-                try:
-                    output = self.renderTemplate(template, environment, image_path, data, config, container, container_name, additional_vars)
-                except exceptions.UndefinedError as e:
-                    error_str = "The following error occurred. %s.\n" % e
-                    print(error_str, file=sys.stderr)
+                    logging.error(traceback.format_exc())
+
+            # The config, templates, extra variables and secrets are loaded once
+            # and shared by every environment
+            worker_pool = WorkerPool(getattr(args, "parallelism", 1))
+            render_results = worker_pool.map(
+                lambda task: (task[0], self.render_container(task[1], app_path, config, data, roger_env, task[0],
+                                                             args, secrets_dir, comp_dir, extra_vars)),
+                [(render_environment, container) for render_environment in render_environments
+                 for container in data_containers])
+            self.save_render_manifests()
+            for render_environment, (container_name, error_str) in render_results:
+                if error_str is not None:
                     failed_container_dict[container_name] = error_str
-                    pass
-
-                # Adding check to see if all jinja variables git resolved fot the
-                # container
-                if container_name not in failed_container_dict:
-                    # Adding check so that not all apps try to mergeSecrets
-                    try:
-                        outputObj = json.loads(output)
-                    except Exception as e:
-                        raise ValueError(
-                            "Error while loading json from {} - {}".format(template_with_path, e))
-
-                    if 'SECRET' in output:
-                        output = self.mergeSecrets(output, self.loadSecrets(
-                            secrets_dir, containerConfig, args, environment))
-                    if output != "StandardError":
-                        try:
-                            comp_exists = os.path.exists("{0}".format(comp_dir))
-                            if comp_exists is False:
-                                os.makedirs("{0}".format(comp_dir))
-                            comp_env_exists = os.path.exists(
-                                "{0}/{1}".format(comp_dir, environment))
-                            if comp_env_exists is False:
-                                os.makedirs(
-                                    "{0}/{1}".format(comp_dir, environment))
-                        except Exception as e:
-                            logging.error(traceback.format_exc())
-                        with open("{0}/{1}/{2}".format(comp_dir, environment, containerConfig), 'wb') as fh:
-                            fh.write(output)
-
-            if args.skip_push:
+
+            if all_envs:
+                self.print_render_report(render_environments, render_results, comp_dir)
+                failed_environments = [render_environment for render_environment, (container_name, error_str)
+                                       in render_results if error_str is not None]
+                if failed_environments:
+                    raise ValueError('Rendering failed for environment(s): {}.'.format(
+                        ", ".join(sorted(set(failed_environments)))))
+            elif args.skip_push:
                 print("Skipping push to {} framework. The rendered config file(s) are under {}/{}".format(
                     framework, comp_dir, environment))
             else:
@@ -382,103 +740,40 @@ class RogerPush(object):
                 image_name = self.registry + "/" + args.image_name
                 image_tag_value = urllib.quote("'" + image_name + "'")
 
-                for container in data_containers:
-                    try:
-                        function_execution_start_time = datetime.now()
-                        execution_result = 'SUCCESS'  # Assume the execution_result to be SUCCESS unless exception occurs
-                        sc = self.utils.getStatsClient()
-                    except (Exception) as e:
-                        print("The following error occurred: %s" %
-                              e, file=sys.stderr)
-                    try:
-                        if type(container) == dict:
-                            container_name = str(container.keys()[0])
-                            containerConfig = "{0}-{1}.json".format(
-                                config['name'], container_name)
-                        else:
-                            container_name = container
-                            containerConfig = "{0}-{1}.json".format(
-                                config['name'], container)
-
-                        if container_name in failed_container_dict:
-                            print("Failed push to {} framework for container {} as unresolved Jinja variables present in template.".format(
-                                framework, container_name))
-                        else:
-                            config_file_path = "{0}/{1}/{2}".format(
-                                comp_dir, environment, containerConfig)
-
-                            result = frameworkObj.runDeploymentChecks(
-                                config_file_path, environment)
-
-                            if args.force_push or result is True:
-                                resp, task_id = frameworkObj.put(
-                                    config_file_path, environmentObj, container_name, environment, act_as_user)
-
-                                container_task_id = self.utils.modify_task_id(task_id)
-                                self.task_id.extend(container_task_id)
-
-                                if hasattr(resp, "status_code"):
-                                    status_code = resp.status_code
-                            else:
-                                print("Skipping push to {} framework for container {} as Validation Checks failed.".format(
-                                    framework, container))
-                    except (Exception) as e:
-                        print("The following error occurred: %s" %
-                              e, file=sys.stderr)
-                        execution_result = 'FAILURE'
-                        raise
-                    finally:
-                        try:
-
-                            if 'function_execution_start_time' not in globals() and 'function_execution_start_time' not in locals():
-                                function_execution_start_time = datetime.now()
-
-                            if 'execution_result' not in globals() and 'execution_result' not in locals():
-                                execution_result = 'FAILURE'
-
-                            if 'config_name' not in globals() and 'config_name' not in locals():
-                                config_name = ""
-
-                            if 'environment' not in globals() and 'environment' not in locals():
-                                environment = "dev"
-
-                            if 'container_name' not in globals() and 'container_name' not in locals():
-                                container_name = ""
-
-                            if 'status_code' not in globals() and 'status_code' not in locals():
-                                status_code = "500"
-
-                            if not hasattr(args, "app_name"):
-                                args.app_name = ""
-
-                            if 'settingObj' not in globals() and 'settingObj' not in locals():
-                                settingObj = Settings()
-
-                            if 'container_task_id' not in globals() and 'container_task_id' not in locals():
-                                container_task_id = []
-
-                            if not hasattr(self, "identifier"):
-                                self.identifier = self.utils.get_identifier(config_name, settingObj.getUser(), args.app_name)
-
-                            if not str(status_code).startswith("20"):
-                                execution_result = 'FAILURE'
+                # Each push fills its own slot, so results are merged in container
+                # order even when containers are pushed in parallel or one fails
+                push_results = [None] * len(data_containers)
+                prepared = [None] * len(data_containers)
+                levels = self.push_levels(data_containers, frameworkObj, framework, failed_container_dict,
+                                          config, comp_dir, environment, environmentObj)
+                if getattr(args, "batch", False):
+                    prepared = self.push_batches(worker_pool, data_containers, frameworkObj, framework,
+                                                 failed_container_dict, config, comp_dir, environment,
+                                                 environmentObj, act_as_user, args)
+                try:
+                    for number, level in enumerate(levels):
+                        worker_pool.map(
+                            lambda index: self.push_container(index, data_containers[index], push_results, frameworkObj,
+                                                              framework, failed_container_dict, config, config_name,
+                                                              comp_dir, environment, environmentObj, act_as_user,
+                                                              settingObj, args, tools_version_value, image_tag_value,
+                                                              prepared[index]),
+                            level)
+                        # Children must not be pushed when one of their parents failed
+                        if number + 1 < len(levels) and \
+                                any(push_results[index] is not None and push_results[index][2] == 0 for index in level):
+                            print("Skipping the remaining {} level(s) as a push in level {} failed.".format(
+                                len(levels) - number - 1, number + 1), file=sys.stderr)
+                            break
+                finally:
+                    for push_result in push_results:
+                        if push_result is not None:
+                            container_task_id, statsd_push_list, outcome = push_result
+                            self.task_id.extend(container_task_id)
+                            self.statsd_push_list.extend(statsd_push_list)
+                            if outcome == 0:
                                 self.outcome = 0
-
-                            time_take_milliseonds = ((datetime.now() - function_execution_start_time).total_seconds() * 1000)
-                            for task_id in container_task_id:
-                                input_metric = "roger-tools.rogeros_tools_exec_time," + "app_name=" + str(args.app_name) + ",event=push" + ",container_name=" + str(container_name) + ",identifier=" + str(self.identifier) + ",outcome=" + str(execution_result) + ",response_code=" + str(status_code) + ",config_name=" + str(config_name) + ",env=" + str(environment) + ",user=" + str(settingObj.getUser()) + ",task_id=" + str(task_id) + ",tools_version=" + str(tools_version_value) + ",image_tag=" + str(image_tag_value)
-                                tup = (input_metric, time_take_milliseonds)
-                                self.statsd_push_list.append(tup)
-
-                                if str(status_code).startswith("20"):
-                                    metric = input_metric.replace("rogeros_tools_exec_time", "rogeros_events")
-                                    metric = metric + ",source=tools" + ",task_id=" + task_id
-                                    self.statsd_counter_logging(metric)
-
-                        except (Exception) as e:
-                            print("The following error occurred: %s" %
-                                  e, file=sys.stderr)
-                            raise
+                    self.print_sync_summary(framework)
 
             hooksObj.statsd_message_list = self.statsd_message_list
             hookname = "post_push"
@@ -524,3 +819,6 @@ if __name__ == "__main__":
     except (Exception) as e:
         print("The following error occurred: %s" %
               e, file=sys.stderr)
+
+    if roger_push.args.http_stats:
+        http_client.report()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import argparse
+import os
+import sys
+from cli.settings import Settings
+from cli.appconfig import AppConfig
+from cli.haproxyparser import HAProxyParser
+
+
+def describe():
+    return "saves the HTTP prefixes and TCP ports routed by HAProxy for validation without network access."
+
+
+class RogerRoutes(object):
+
+    def parse_args(self):
+        parser = argparse.ArgumentParser(
+            prog='roger routes', description=describe())
+        subparsers = parser.add_subparsers(dest='action', metavar='action')
+        snapshot_parser = subparsers.add_parser(
+            'snapshot', help="fetches the HAProxy config of an environment and saves its routes to a file.")
+        snapshot_parser.add_argument('-e', '--env', metavar='env',
+                                     help="environment to save. Example: 'dev' or 'stage'")
+        snapshot_parser.add_argument('-o', '--output', metavar='file',
+                                     help="file to write. Defaults to routes-<env>.json in $ROGER_CACHE_DIR"
+                                     " (~/.roger/cache). Use it with 'roger push --routes-snapshot'.")
+        snapshot_parser.add_argument('-f', '--force', action='store_true',
+                                     help="save the snapshot even if the HAProxy config has no routes.")
+        return parser
+
+    def get_snapshot_path(self, settings, environment):
+        return os.path.join(settings.getCacheDir(), "routes-{}.json".format(environment))
+
+    def snapshot(self, settings, haproxyparser, environment, args):
+        # Always save the current config, not a cached or saved copy
+        haproxyparser.clear_cache(environment)
+        snapshot = haproxyparser.get_snapshot(environment)
+        if not (snapshot.get_path_begin_values() or snapshot.get_backend_tcp_ports()) and \
+                not getattr(args, 'force', False):
+            # Validating against it would accept every prefix and port
+            raise ValueError("The HAProxy config of environment {} has no routes. Not saving it, use --force to "
+                             "save it anyway.".format(environment))
+        path = args.output or self.get_snapshot_path(settings, environment)
+        snapshot_dir = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(snapshot_dir):
+            os.makedirs(snapshot_dir)
+        snapshot.save(path)
+        print("Saved {} HTTP prefixes and {} TCP ports of environment {} to {}".format(
+            len(snapshot.get_path_begin_values()), len(snapshot.get_backend_tcp_ports()), environment, path))
+        return path
+
+    def main(self, settings, appconfig, haproxyparser, args):
+        config_dir = settings.getConfigDir()
+        roger_env = appconfig.getRogerEnv(config_dir)
+        environment = roger_env.get('default_environment', '')
+
+        if args.env is None:
+            if "ROGER_ENV" in os.environ:
+                env_var = os.environ.get('ROGER_ENV')
+                if env_var.strip() == '':
+                    print(
+                        "Environment variable $ROGER_ENV is not set.Using the default set from roger-mesos-tools.config file")
+                else:
+                    print(
+                        "Using value {} from environment variable $ROGER_ENV".format(env_var))
+                    environment = env_var
+        else:
+            environment = args.env
+
+        if environment not in roger_env['environments']:
+            raise ValueError('Environment not found in roger-mesos-tools.config file.')
+
+        if args.action == 'snapshot':
+            return self.snapshot(settings, haproxyparser, environment, args)
+
+
+if __name__ == '__main__':
+    settings = Settings()
+    appconfig = AppConfig()
+    haproxyparser = HAProxyParser()
+    roger_routes = RogerRoutes()
+    roger_routes.parser = roger_routes.parse_args()
+    roger_routes.args = roger_routes.parser.parse_args()
+    try:
+        roger_routes.main(settings, appconfig, haproxyparser, roger_routes.args)
+    except (Exception) as e:
+        print("The following error occurred: %s" %
+              e, file=sys.stderr)
+        sys.exit(1)
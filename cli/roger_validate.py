@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import yaml
+from cli.settings import Settings
+from cli.appconfig import AppConfig
+from cli.haproxyparser import HAProxyParser
+from cli.records import RouteRecord
+from cli.roger_push import RogerPush
+
+
+def describe():
+    return "checks the HTTP prefixes and TCP ports of all apps in the config files for conflicts."
+
+
+def render_config(task):
+    '''Renders every Marathon container of one config for an environment. Runs in
+    a worker process. Returns (config file, [RouteRecord], [error messages]).'''
+    config_dir, config_file, environment, roger_env, templ_dir, secrets_dir, directory, verbose = task
+    # Rendering reports every template and secrets file, keep that out of the report
+    stdout, stderr = sys.stdout, sys.stderr
+    if not verbose:
+        sys.stdout = sys.stderr = open(os.devnull, 'w')
+    comp_dir = tempfile.mkdtemp()
+    routes = []
+    errors = []
+    try:
+        appObj = AppConfig()
+        try:
+            config = appObj.getConfig(config_dir, config_file)
+        except (IOError, ValueError, yaml.YAMLError) as e:
+            return config_file, routes, ["{}: could not be read - {}".format(config_file, e)]
+        if not isinstance(config, dict) or not isinstance(config.get('apps'), dict) or 'name' not in config:
+            return config_file, routes, errors
+        os.makedirs(os.path.join(comp_dir, environment))
+        args = argparse.Namespace(image_name='roger-validate', secrets_file=None, directory=directory)
+        common_repo = config.get('repo', '')
+
+        for app_name, data in sorted(config['apps'].items()):
+            if data.get('framework', 'marathon').lower() == 'chronos':
+                continue
+            repo = data.get('repo', common_repo or app_name)
+            extra_vars = {}
+            app_path = templ_dir
+            try:
+                roger_push = RogerPush()
+                if 'template_path' in data or 'extra_variables_path' in data:
+                    if directory is None:
+                        errors.append("{}:{}: skipped, its templates are in the {} repo. Use --directory.".format(
+                            config_file, app_name, repo))
+                        continue
+                if 'template_path' in data:
+                    app_path = roger_push.repo_relative_path(appObj, args, repo, data['template_path'])
+                if 'extra_variables_path' in data:
+                    ev_path = roger_push.repo_relative_path(appObj, args, repo, data['extra_variables_path'])
+                    with open(ev_path) as f:
+                        extra_vars = yaml.load(f) if ev_path.lower().endswith('.yml') else json.load(f)
+                if not app_path.endswith('/'):
+                    app_path = app_path + '/'
+
+                for container in data.get('containers', []):
+                    container_name, error_str = roger_push.render_container(
+                        container, app_path, config, data, roger_env, environment, args, secrets_dir, comp_dir,
+                        extra_vars)
+                    if error_str is not None:
+                        errors.append("{}:{}/{}: {}".format(config_file, app_name, container_name, error_str.strip()))
+                        continue
+                    document = roger_push.documents.get(container_name)
+                    if document is None:
+                        errors.append("{}:{}/{}: its SECRET values could not be resolved".format(
+                            config_file, app_name, container_name))
+                        continue
+                    for app_id, details in document.app_details.items():
+                        http_prefix, tcp_ports, affinity = details
+                        routes.append(RouteRecord(config_file, app_name, container_name, app_id, http_prefix,
+                                                  sorted(tcp_ports), affinity))
+            except (Exception) as e:
+                errors.append("{}:{}: {}".format(config_file, app_name, e))
+        return config_file, routes, errors
+    finally:
+        shutil.rmtree(comp_dir, ignore_errors=True)
+        if not verbose:
+            sys.stdout.close()
+            sys.stdout, sys.stderr = stdout, stderr
+
+
+def find_conflicts(routes, routing=None):
+    '''Indexes all routes by HTTP_PREFIX and TCP port in one pass, then reports
+    every prefix or port claimed by more than one app, or routed by HAProxy
+    (routing is a RoutingSnapshot) to another app. Prefix conflicts between apps
+    that all enable affinity are warnings, as in MarathonValidator. Returns
+    (errors, warnings).'''
+    prefixes = {}
+    ports = {}
+    for route in routes:
+        if route.http_prefix != '':
+            prefixes.setdefault(route.http_prefix, []).append(route)
+        for tcp_port in route.tcp_ports:
+            if tcp_port != '':
+                ports.setdefault(tcp_port, []).append(route)
+
+    errors = []
+    warnings = []
+    routed_prefixes = routing.get_path_begin_values() if routing is not None else {}
+    routed_ports = routing.get_backend_tcp_ports() if routing is not None else {}
+
+    for http_prefix in sorted(prefixes):
+        claims = prefixes[http_prefix]
+        app_ids = set(route.app_id for route in claims)
+        messages = warnings if all(route.affinity for route in claims) else errors
+        if len(app_ids) > 1:
+            messages.append("HTTP_PREFIX '{}' is used by: {}".format(
+                http_prefix, ", ".join(route.describe() for route in claims)))
+        routed_app_id = routed_prefixes.get(http_prefix)
+        if routed_app_id is not None and routed_app_id not in app_ids:
+            messages.append("HTTP_PREFIX '{}' of {} is already in use by app id: '{}'".format(
+                http_prefix, ", ".join(route.describe() for route in claims), routed_app_id))
+
+    for tcp_port in sorted(ports):
+        claims = ports[tcp_port]
+        app_ids = set(route.app_id for route in claims)
+        if len(app_ids) > 1:
+            errors.append("TCP PORT '{}' is used by: {}".format(
+                tcp_port, ", ".join(route.describe() for route in claims)))
+        routed_app_id = routed_ports.get(tcp_port)
+        if routed_app_id is not None and routed_app_id not in app_ids:
+            errors.append("TCP PORT '{}' of {} is already in use by app id: '{}'".format(
+                tcp_port, ", ".join(route.describe() for route in claims), routed_app_id))
+
+    return errors, warnings
+
+
+class RogerValidate(object):
+
+    def parse_args(self):
+        parser = argparse.ArgumentParser(
+            prog='roger validate', description=describe())
+        parser.add_argument('config_files', metavar='config_file', nargs='*',
+                            help="configuration files to check. Example: 'content.json' or 'kwe.json'")
+        parser.add_argument('-a', '--all', action="store_true",
+                            help="checks every configuration file in $ROGER_CONFIG_DIR.")
+        parser.add_argument('-e', '--env', metavar='env',
+                            help="environment to check. Example: 'dev' or 'stage'")
+        parser.add_argument('-d', '--directory', metavar='directory',
+                            help="working directory with checkouts of the repos of apps that keep their templates"
+                            " in their repo. Those apps are skipped without it.")
+        parser.add_argument('-P', '--processes', metavar='N', type=int, default=multiprocessing.cpu_count(),
+                            help="number of configuration files to render at the same time. Defaults to the"
+                            " number of CPUs.")
+        parser.add_argument('--routes-snapshot', metavar='file',
+                            help="checks against routes saved with 'roger routes snapshot' instead of fetching the"
+                            " HAProxy config.")
+        parser.add_argument('--skip-haproxy', action="store_true",
+                            help="only checks the configuration files against each other.")
+        parser.add_argument('-v', '--verbose', action="store_true",
+                            help="shows the rendering output.")
+        return parser
+
+    def get_config_files(self, config_dir, args):
+        if not args.all:
+            if not args.config_files:
+                raise ValueError("Pass configuration files to check or use --all.")
+            return args.config_files
+        config_files = []
+        for filename in sorted(os.listdir(config_dir)):
+            if filename.lower().endswith(('.json', '.yml')) and os.path.isfile(os.path.join(config_dir, filename)):
+                config_files.append(filename)
+        return config_files
+
+    def render_configs(self, tasks, processes):
+        if processes <= 1 or len(tasks) <= 1:
+            return [render_config(task) for task in tasks]
+        pool = multiprocessing.Pool(min(processes, len(tasks)))
+        try:
+            return pool.map(render_config, tasks, 1)
+        finally:
+            pool.close()
+            pool.join()
+
+    def collect_routes(self, settings, config_dir, config_files, environment, roger_env, args):
+        '''Renders the configs in a process pool. Returns ([RouteRecord], [messages
+        about apps that could not be rendered]).'''
+        directory = os.path.abspath(args.directory) if getattr(args, "directory", None) else None
+        tasks = [(config_dir, config_file, environment, roger_env, settings.getTemplatesDir(),
+                  settings.getSecretsDir(), directory, getattr(args, "verbose", False))
+                 for config_file in config_files]
+        routes = []
+        render_errors = []
+        for config_file, config_routes, config_errors in self.render_configs(
+                tasks, getattr(args, "processes", multiprocessing.cpu_count())):
+            routes.extend(config_routes)
+            render_errors.extend(config_errors)
+        return routes, render_errors
+
+    def main(self, settings, appconfig, haproxyparser, args):
+        config_dir = settings.getConfigDir()
+        roger_env = appconfig.getRogerEnv(config_dir)
+        environment = roger_env.get('default_environment', '')
+
+        if args.env is None:
+            if "ROGER_ENV" in os.environ:
+                env_var = os.environ.get('ROGER_ENV')
+                if env_var.strip() == '':
+                    print(
+                        "Environment variable $ROGER_ENV is not set.Using the default set from roger-mesos-tools.config file")
+                else:
+                    print(
+                        "Using value {} from environment variable $ROGER_ENV".format(env_var))
+                    environment = env_var
+        else:
+            environment = args.env
+
+        if environment not in roger_env['environments']:
+            raise ValueError('Environment not found in roger-mesos-tools.config file.')
+
+        routing = None
+        if not args.skip_haproxy:
+            if args.routes_snapshot:
+                haproxyparser.use_snapshot_file(args.routes_snapshot, environment)
+            routing = haproxyparser.get_snapshot(environment)
+
+        config_files = self.get_config_files(config_dir, args)
+        routes, render_errors = self.collect_routes(settings, config_dir, config_files, environment, roger_env, args)
+        errors, warnings = find_conflicts(routes, routing)
+
+        for message in render_errors:
+            print("SKIPPED: {}".format(message))
+        for message in warnings:
+            print("WARNING: {}".format(message))
+        for message in errors:
+            print("ERROR: {}".format(message))
+        print("Checked {} apps in {} configuration files for environment {}: {} conflicts, {} warnings.".format(
+            len(routes), len(config_files), environment, len(errors), len(warnings)))
+        return errors, warnings
+
+
+if __name__ == '__main__':
+    settings = Settings()
+    appconfig = AppConfig()
+    haproxyparser = HAProxyParser()
+    roger_validate = RogerValidate()
+    roger_validate.parser = roger_validate.parse_args()
+    roger_validate.args = roger_validate.parser.parse_args()
+    try:
+        errors, warnings = roger_validate.main(settings, appconfig, haproxyparser, roger_validate.args)
+    except (Exception) as e:
+        print("The following error occurred: %s" %
+              e, file=sys.stderr)
+        sys.exit(1)
+    if errors:
+        sys.exit(1)
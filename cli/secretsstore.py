@@ -0,0 +1,78 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import json
+import os
+import threading
+import yaml
+from cli.records import ReadOnlyDict
+
+
+class SecretsView(ReadOnlyDict):
+    '''Parsed secrets file shared by every container of a run'''
+
+    message = "Secrets are read-only"
+
+
+def freeze(value):
+    '''Returns value with dicts as SecretsViews and lists as tuples, all the way down'''
+    if isinstance(value, dict):
+        return SecretsView((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    '''Returns a plain, changeable copy of a value from a SecretsView'''
+    if isinstance(value, dict):
+        return dict((key, thaw(item)) for key, item in value.items())
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+class SecretsStore:
+    '''Secrets files read during one run of a command. Each file is opened and
+    parsed once, and parsed again only if its mtime changes. Containers and
+    environments that use the same file share one read-only view of it.'''
+
+    def __init__(self):
+        self.secrets = {}
+        self.secrets_dirs = set()
+        self.lock = threading.Lock()
+
+    def ensure_dir(self, secrets_dir):
+        if secrets_dir not in self.secrets_dirs:
+            try:
+                os.makedirs(secrets_dir)
+            except OSError:
+                if not os.path.isdir(secrets_dir):
+                    raise
+            self.secrets_dirs.add(secrets_dir)
+
+    def load(self, path):
+        '''Returns the secrets in the JSON or YAML file at path as a SecretsView.
+        Raises IOError if there is no such file and ValueError if it does not
+        parse.'''
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError as e:
+            raise IOError(e.errno, e.strerror, path)
+        key = (path, mtime)
+        secrets = self.secrets.get(key)
+        if secrets is None:
+            with self.lock:
+                secrets = self.secrets.get(key)
+                if secrets is None:
+                    with open(path) as f:
+                        try:
+                            secrets = yaml.load(f) if path.lower().endswith('.yml') else json.load(f)
+                        except yaml.YAMLError as e:
+                            raise ValueError(e)
+                    secrets = freeze(secrets if secrets is not None else {})
+                    # Drop the copies of this file with another mtime
+                    for old_key in [old_key for old_key in self.secrets if old_key[0] == path]:
+                        del self.secrets[old_key]
+                    self.secrets[key] = secrets
+        return secrets
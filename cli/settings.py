@@ -47,6 +47,13 @@ class Settings:
         secrets_dir = os.path.abspath(secrets_dir)
         return secrets_dir
 
+    def getCacheDir(self):
+        # ROGER_CACHE_DIR env var > ~/.roger/cache
+        cache_dir = os.environ.get('ROGER_CACHE_DIR', '')
+        if cache_dir.strip() == '':
+            cache_dir = os.path.join(os.path.expanduser('~'), '.roger', 'cache')
+        return os.path.abspath(cache_dir)
+
     def getCliDir(self):
         cli_dir = ''
         own_dir = os.path.dirname(os.path.realpath(__file__))
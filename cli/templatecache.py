@@ -0,0 +1,80 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import os
+import tempfile
+import threading
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, Undefined
+
+
+class AtomicBytecodeCache(FileSystemBytecodeCache):
+    '''FileSystemBytecodeCache that writes through a temp file, so pushes that
+    run at the same time never read a partly written cache file. Failing to
+    write the cache does not fail the render.'''
+
+    def dump_bytecode(self, bucket):
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as fh:
+                bucket.write_bytecode(fh)
+            os.rename(tmp_path, self._get_cache_filename(bucket))
+        except (IOError, OSError):
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+class TemplateCache:
+    '''Shares one Jinja environment per template dir, so each template is only
+    compiled once per run however many containers and environments use it.
+
+    Compiled templates are also kept on disk in a bytecode cache, by default in
+    .jinja2-cache under $ROGER_COMPONENTS_DIR, for later runs. Jinja reloads a
+    template whose file changed (by mtime) and ignores cached bytecode whose
+    source checksum does not match, so edited templates are always recompiled.'''
+
+    cache_dir_name = '.jinja2-cache'
+
+    def __init__(self):
+        self.environments = {}
+        self.bytecode_caches = {}
+        self.lock = threading.Lock()
+
+    def get_cache_dir(self, comp_dir):
+        return os.path.join(comp_dir, self.cache_dir_name)
+
+    def get_bytecode_cache(self, cache_dir):
+        if cache_dir is None:
+            return None
+        cache_dir = os.path.abspath(cache_dir)
+        if cache_dir not in self.bytecode_caches:
+            try:
+                if not os.path.isdir(cache_dir):
+                    os.makedirs(cache_dir)
+            except OSError:
+                # Another process created it first, or it cannot be created
+                if not os.path.isdir(cache_dir):
+                    return None
+            self.bytecode_caches[cache_dir] = AtomicBytecodeCache(cache_dir)
+        return self.bytecode_caches[cache_dir]
+
+    def get_environment(self, template_dir, cache_dir=None, undefined=Undefined):
+        '''Returns the shared environment for templates in template_dir. Pass
+        cache_dir to keep compiled templates on disk.'''
+        key = (os.path.abspath(template_dir), cache_dir and os.path.abspath(cache_dir), undefined)
+        env = self.environments.get(key)
+        if env is None:
+            with self.lock:
+                env = self.environments.get(key)
+                if env is None:
+                    env = Environment(loader=FileSystemLoader(key[0]), undefined=undefined,
+                                      bytecode_cache=self.get_bytecode_cache(cache_dir))
+                    self.environments[key] = env
+        return env
+
+    def clear(self):
+        with self.lock:
+            self.environments.clear()
+            self.bytecode_caches.clear()
+
+template_cache = TemplateCache()
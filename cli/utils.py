@@ -104,9 +104,10 @@ class Utils:
         return modified_task_id_list
 
     def generate_task_id_list(self, data):
+        # data is a rendered definition, either as a JSON string or already parsed
         task_id_list = []
         try:
-            data_json = json.loads(data)
+            data_json = json.loads(data) if isinstance(data, basestring) else data
             top_level = ""
             if 'id' in data_json:
                 top_level = data_json['id']
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+
+
+class VariableScopes(object):
+    '''Template variables as a stack of named layers, lowest precedence first,
+    like a ChainMap: a variable takes its value from the last layer that sets it.
+
+    Layers are kept as given and merged once into a flat dict, which is what
+    Jinja renders with. child() adds layers on top of a copy of that dict, so the
+    layers shared by all containers of an app are merged only once. where() looks
+    the layers up only when asked, rendering never pays for it.'''
+
+    def __init__(self, layers=(), parent=None):
+        self.parent = parent
+        self.layers = list(layers)
+        self.variables = dict(parent.variables) if parent is not None else {}
+        for label, values in self.layers:
+            self.variables.update(values)
+
+    @classmethod
+    def for_app(cls, environment, image, config, app_data):
+        '''Returns the scopes every container of app_data starts from: the
+        environment and image, then the variables of the config and of the app,
+        each "global" and then for environment'''
+        layers = [('environment and image', {'environment': environment, 'image': image})]
+        for label, obj in [('config', config), ('app', app_data)]:
+            layers.extend(cls.vars_layers(label, obj, environment))
+        return cls(layers)
+
+    @classmethod
+    def vars_layers(cls, label, obj, environment):
+        if type(obj) != dict or 'vars' not in obj:
+            return []
+        return [("{} vars.global".format(label), obj['vars'].get('global', {})),
+                ("{} vars.environment.{}".format(label, environment),
+                 obj['vars'].get('environment', {}).get(environment, {}))]
+
+    def child(self, layers):
+        return VariableScopes(layers, self)
+
+    def for_container(self, container, environment, additional_layers=()):
+        '''Returns these scopes with the variables of container and then the
+        additional layers, like extra variables and secrets, on top'''
+        return self.child(self.vars_layers('container', container, environment) + list(additional_layers))
+
+    def flatten(self):
+        '''Returns the merged variables. Shared, do not change it.'''
+        return self.variables
+
+    def all_layers(self):
+        parent_layers = self.parent.all_layers() if self.parent is not None else []
+        return parent_layers + self.layers
+
+    def where(self, name):
+        '''Returns the label of the layer the value of name comes from, None if
+        no layer sets it'''
+        for label, values in reversed(self.all_layers()):
+            if name in values:
+                return label
+        return None
+
+    def __getitem__(self, name):
+        return self.variables[name]
+
+    def __contains__(self, name):
+        return name in self.variables
+
+    def get(self, name, default=None):
+        return self.variables.get(name, default)
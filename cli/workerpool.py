@@ -0,0 +1,84 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+
+
+class OutputCapture(object):
+    '''File-like wrapper that keeps the output of worker threads in a per-task
+    buffer so it can be replayed in order once the task is done.'''
+
+    def __init__(self, stream, local):
+        self.stream = stream
+        self.local = local
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            self.stream.write(text)
+        else:
+            buffer.append((self.stream, text))
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class WorkerPool:
+    '''Runs a function over a list of items on a bounded pool of threads.
+
+    Results come back in the order of the items, and anything the function
+    prints is written out in that same order, so the output of a parallel run
+    reads like a sequential one. If a task raises, tasks that have not started
+    yet are skipped and the first error (in item order) is raised once all
+    output has been written.'''
+
+    def __init__(self, parallelism=1):
+        self.parallelism = max(1, int(parallelism or 1))
+
+    def map(self, func, items):
+        items = list(items)
+        if self.parallelism == 1 or len(items) <= 1:
+            return [func(item) for item in items]
+
+        local = threading.local()
+        failed = threading.Event()
+
+        def run(item):
+            local.buffer = []
+            try:
+                if failed.is_set():
+                    return (False, None, local.buffer)
+                return (True, func(item), local.buffer)
+            except Exception as e:
+                failed.set()
+                return (False, e, local.buffer)
+            finally:
+                local.buffer = None
+
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = OutputCapture(stdout, local)
+        sys.stderr = OutputCapture(stderr, local)
+        pool = ThreadPool(min(self.parallelism, len(items)))
+        results = []
+        error = None
+        try:
+            for ok, value, buffer in pool.imap(run, items):
+                for stream, text in buffer:
+                    stream.write(text)
+                if ok:
+                    results.append(value)
+                elif error is None and value is not None:
+                    error = value
+        finally:
+            pool.close()
+            pool.join()
+            sys.stdout, sys.stderr = stdout, stderr
+        if error is not None:
+            raise error
+        return results
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+
+# Measures parsing a synthetic HAProxy config and building the roger ps routing
+# columns from it: the former path (whole text, two multiline regexes, then a scan
+# of every prefix and port for each app) against the line parser with its
+# backend -> prefixes/ports maps.
+#
+# Usage: python tests/benchmarks/bench_haproxy_parser.py [--lines 20000] [--repeat 5]
+
+from __future__ import print_function
+import argparse
+import os
+import re
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir)))
+from cli.haproxyparser import HAProxyParser
+
+
+def generate_config(num_lines):
+    '''Returns the lines of a config with HTTP and TCP backends, about num_lines long'''
+    lines = ["global", "    maxconn 4096", "", "frontend http-in", "    bind *:80"]
+    # An HTTP app takes 2 lines (acl + use_backend), a TCP service 2 (listen + mode)
+    num_apps = max(1, (num_lines - len(lines)) // 4)
+    for i in range(num_apps):
+        lines.append("    acl ::team{}::service{}-aclrule path_beg -i /team{}/service{}".format(i % 50, i, i % 50, i))
+    for i in range(num_apps):
+        lines.append("    use_backend ::team{}::service{}-cluster if ::team{}::service{}-aclrule".format(
+            i % 50, i, i % 50, i))
+    for i in range(num_apps):
+        lines.append("listen ::team{}::service{}-cluster-tcp-{} :{}".format(i % 50, i, 10000 + i, 10000 + i))
+        lines.append("    mode tcp")
+    return lines, ["/team{}/service{}".format(i % 50, i) for i in range(num_apps)]
+
+
+def legacy(lines, app_ids):
+    config = "\n".join(lines)
+    path_begin_values = {}
+    backend_tcp_ports = {}
+    backend_rules = re.compile(
+        "^( ).*use_backend (.*)-cluster.* if (.*)-aclrule$", re.MULTILINE).findall(config)
+    backends_service_names = re.compile(
+        "^listen (.*)-cluster-tcp-(.*) :(.*)", flags=re.MULTILINE).findall(config)
+    for rule in backend_rules:
+        path_begin_values[rule[2].replace("::", "/")] = rule[1].replace("::", "/")
+    for service in backends_service_names:
+        backend_tcp_ports[service[2]] = service[0].replace("::", "/")
+
+    rows = {}
+    for app_id in app_ids:
+        http_prefix = ""
+        tcp_port_list = []
+        for k, v in path_begin_values.iteritems():
+            if app_id == v:
+                http_prefix = k
+                break
+        for k, v in backend_tcp_ports.iteritems():
+            if app_id == v:
+                tcp_port_list.append(k)
+        rows[app_id] = (http_prefix, tcp_port_list)
+    return rows
+
+
+def indexed(lines, app_ids):
+    path_begin_values, backend_tcp_ports, backend_path_begins, backend_ports = \
+        HAProxyParser().parse_config_lines(iter(lines))
+    rows = {}
+    for app_id in app_ids:
+        prefixes = backend_path_begins.get(app_id, [])
+        rows[app_id] = (prefixes[0] if prefixes else "", backend_ports.get(app_id, []))
+    return rows
+
+
+def best_of(function, repeat, *args):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = function(*args)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks HAProxy config parsing for roger ps")
+    parser.add_argument('--lines', type=int, default=20000, help="config size in lines. Defaults to 20000.")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per path, the best is reported. Defaults to 5.")
+    args = parser.parse_args()
+
+    lines, app_ids = generate_config(args.lines)
+    legacy_seconds, legacy_rows = best_of(legacy, args.repeat, lines, app_ids)
+    indexed_seconds, indexed_rows = best_of(indexed, args.repeat, lines, app_ids)
+    assert legacy_rows == indexed_rows
+
+    print("{} lines, {} apps".format(len(lines), len(app_ids)))
+    print("{:>10} {:>12}".format("path", "seconds"))
+    print("{:>10} {:>12.4f}".format("legacy", legacy_seconds))
+    print("{:>10} {:>12.4f}".format("indexed", indexed_seconds))
+    print("speedup: {:.1f}x".format(legacy_seconds / indexed_seconds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+# Compares peak memory (RSS) and parse time of loading a Marathon /v2/tasks
+# response in one piece (resp.json()) with streaming it through JsonStream.
+# Each mode runs in its own process so peak RSS is not shared between them.
+#
+# Usage: python tests/benchmarks/bench_marathon_stream.py [--tasks 50000]
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir)))
+from cli.jsonstream import iter_json_items
+
+chunk_size = 65536
+fields = ('id', 'appId', 'host', 'ports', 'startedAt')
+
+
+def write_payload(path, num_tasks):
+    '''Writes a synthetic /v2/tasks response, shaped like the one Marathon returns'''
+    with open(path, 'w') as fh:
+        fh.write('{"tasks": [')
+        for i in range(num_tasks):
+            app_id = "/team{}/service{}".format(i % 50, i % 1000)
+            task = {
+                "id": "{}.{:08x}-1fb3-11e6-8d6e-0242ac110002".format(app_id[1:].replace('/', '_'), i),
+                "appId": app_id,
+                "host": "mesos-agent-{}.example.com".format(i % 400),
+                "ports": [31000 + i % 1000, 32000 + i % 1000],
+                "servicePorts": [10000 + i % 1000],
+                "ipAddresses": [{"ipAddress": "10.0.{}.{}".format(i % 256, i % 200), "protocol": "IPv4"}],
+                "slaveId": "5bb4c6e5-11a2-4e50-a9e1-2b53c6e5d9a4-S{}".format(i % 400),
+                "stagedAt": "2016-05-20T10:00:00.000Z",
+                "startedAt": "2016-05-20T10:00:05.000Z",
+                "version": "2016-05-20T09:59:00.000Z",
+                "healthCheckResults": [{"alive": True, "consecutiveFailures": 0,
+                                        "firstSuccess": "2016-05-20T10:00:10.000Z",
+                                        "lastSuccess": "2016-05-20T12:00:10.000Z",
+                                        "taskId": "task-{}".format(i)}]
+            }
+            if i:
+                fh.write(',')
+            fh.write(json.dumps(task))
+        fh.write(']}')
+
+
+def read_chunks(path):
+    with open(path, 'rb') as fh:
+        while True:
+            chunk = fh.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def instance_details(tasks):
+    details = {}
+    for task in tasks:
+        details[task['id']] = (task['appId'], task['host'], task['ports'], task.get('startedAt'))
+    return details
+
+
+def run_mode(mode, path):
+    start = time.time()
+    if mode == 'full':
+        body = b''.join(read_chunks(path))
+        details = instance_details(json.loads(body)['tasks'])
+    else:
+        details = instance_details(iter_json_items(read_chunks(path), 'tasks', fields))
+    elapsed = time.time() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'mode': mode, 'seconds': elapsed, 'peak_rss_kb': peak_rss, 'tasks': len(details)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks streaming of Marathon task lists")
+    parser.add_argument('--tasks', type=int, default=50000, help="number of tasks in the payload. Defaults to 50000.")
+    parser.add_argument('--mode', choices=['full', 'stream'], help=argparse.SUPPRESS)
+    parser.add_argument('--payload', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.payload)
+        return
+
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        write_payload(path, args.tasks)
+        print("Payload: {} tasks, {:.1f} MB".format(args.tasks, os.path.getsize(path) / 1024.0 / 1024.0))
+        for mode in ['full', 'stream']:
+            output = subprocess.check_output([sys.executable, os.path.realpath(__file__),
+                                              '--mode', mode, '--payload', path])
+            result = json.loads(output.strip().splitlines()[-1])
+            print("{:<8} {:>8.2f} s {:>10.1f} MB peak RSS".format(
+                mode, result['seconds'], result['peak_rss_kb'] / 1024.0))
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
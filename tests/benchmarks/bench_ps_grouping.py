@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+# Measures how building the roger ps view scales with the number of tasks:
+# the former path (full task dicts, then grouping with `in dict.keys()`) against
+# projected TaskRecords grouped in a single pass. Each size runs in its own
+# process so peak RSS is not shared between runs.
+#
+# Usage: python tests/benchmarks/bench_ps_grouping.py [--sizes 1000,10000,100000]
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir)))
+from cli.records import TaskRecord, group_tasks_by_app
+
+tasks_per_app = 4
+
+
+def generate_tasks(num_tasks):
+    '''Yields tasks shaped like the ones in a Marathon /v2/tasks response'''
+    for i in range(num_tasks):
+        app_id = "/team{}/service{}".format(i % 50, i // tasks_per_app)
+        yield {
+            "id": "{}.{:08x}-1fb3-11e6-8d6e-0242ac110002".format(app_id[1:].replace('/', '_'), i),
+            "appId": app_id,
+            "host": "mesos-agent-{}.example.com".format(i % 400),
+            "ports": [31000 + i % 1000, 32000 + i % 1000],
+            "servicePorts": [10000 + i % 1000],
+            "slaveId": "5bb4c6e5-11a2-4e50-a9e1-2b53c6e5d9a4-S{}".format(i % 400),
+            "stagedAt": "2016-05-20T10:00:00.000Z",
+            "startedAt": "2016-05-20T10:00:05.000Z",
+            "version": "2016-05-20T09:59:00.000Z",
+            "healthCheckResults": [{"alive": True, "consecutiveFailures": 0,
+                                    "lastSuccess": "2016-05-20T12:00:10.000Z"}]
+        }
+
+
+def legacy(num_tasks):
+    tasks = list(generate_tasks(num_tasks))
+    instance_details = {}
+    for task in tasks:
+        instance_details[task['id']] = (task['appId'], task['host'], task['ports'], task['startedAt'])
+    instances = {}
+    for task_id in instance_details:
+        app_id = instance_details[task_id][0]
+        if app_id in instances.keys():
+            instances[app_id].append(task_id)
+        else:
+            instances[app_id] = [task_id]
+    return tasks, instance_details, instances
+
+
+def records(num_tasks):
+    instance_details = {}
+    for task in generate_tasks(num_tasks):
+        instance_details[task['id']] = TaskRecord(task['appId'], task['host'], task['ports'], task['startedAt'])
+    return instance_details, group_tasks_by_app(instance_details)
+
+
+def run_mode(mode, num_tasks):
+    start = time.time()
+    result = legacy(num_tasks) if mode == 'legacy' else records(num_tasks)
+    elapsed = time.time() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'seconds': elapsed, 'peak_rss_kb': peak_rss, 'size': len(result)}))
+
+
+def measure(mode, num_tasks):
+    output = subprocess.check_output([sys.executable, os.path.realpath(__file__),
+                                      '--mode', mode, '--tasks', str(num_tasks)])
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks grouping of tasks by app for roger ps")
+    parser.add_argument('--sizes', default="1000,5000,10000,50000,100000",
+                        help="comma separated task counts. Defaults to 1000,5000,10000,50000,100000.")
+    parser.add_argument('--legacy-max', type=int, default=20000,
+                        help="largest task count to run the quadratic legacy path for. Defaults to 20000.")
+    parser.add_argument('--mode', choices=['legacy', 'records'], help=argparse.SUPPRESS)
+    parser.add_argument('--tasks', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.tasks)
+        return
+
+    print("{:>8} | {:>10} {:>12} {:>10} | {:>10} {:>12} {:>10}".format(
+        "tasks", "legacy s", "us/task", "RSS MB", "records s", "us/task", "RSS MB"))
+    for num_tasks in [int(size) for size in args.sizes.split(',')]:
+        columns = []
+        for mode in ['legacy', 'records']:
+            if mode == 'legacy' and num_tasks > args.legacy_max:
+                columns.append("{:>10} {:>12} {:>10}".format("-", "-", "-"))
+                continue
+            result = measure(mode, num_tasks)
+            columns.append("{:>10.3f} {:>12.2f} {:>10.1f}".format(
+                result['seconds'], result['seconds'] * 1e6 / num_tasks, result['peak_rss_kb'] / 1024.0))
+        print("{:>8} | {} | {}".format(num_tasks, columns[0], columns[1]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+
+# Measures filling "SECRET" values in a rendered Marathon group with thousands of
+# env entries: the former path (recursive replaceSecrets on a parsed copy of the
+# output, re-serialization, then a scan of the text for leftover "SECRET") against
+# substituteSecrets on the already parsed output.
+#
+# Usage: python tests/benchmarks/bench_secrets.py [--apps 50] [--env 200] [--repeat 5]
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir)))
+from cli.roger_push import RogerPush
+
+
+def generate_group(num_apps, num_env):
+    '''Returns a group with num_apps apps of num_env env entries each, one in ten
+    a "SECRET", and the secrets that fill them'''
+    apps = []
+    secrets = {}
+    for i in range(num_apps):
+        env = {}
+        for j in range(num_env):
+            if j % 10 == 0:
+                env["SECRET_{}_{}".format(i, j)] = "SECRET"
+                secrets["SECRET_{}_{}".format(i, j)] = "secret-{}-{}".format(i, j)
+            else:
+                env["VAR_{}_{}".format(i, j)] = "value-{}".format(j)
+        apps.append({"id": "app{}".format(i), "instances": 1, "env": env,
+                     "container": {"docker": {"image": "registry/app:1",
+                                              "portMappings": [{"containerPort": 8080 + k} for k in range(20)]}},
+                     "healthChecks": [{"path": "/health", "protocol": "HTTP"}]})
+    return {"id": "/group", "groups": [{"id": "/group/apps", "apps": apps}]}, secrets
+
+
+def replace_secrets(output_dict, secrets_dict):
+    if type(output_dict) is not dict:
+        return output_dict
+
+    for key in output_dict:
+        if output_dict[key] == "SECRET":
+            if key in secrets_dict.keys():
+                output_dict[key] = secrets_dict[key]
+
+        if type(output_dict[key]) is list:
+            temp_list = []
+            for list_elem in output_dict[key]:
+                temp_list.append(replace_secrets(
+                    list_elem, secrets_dict))
+                output_dict[key] = temp_list
+
+        if type(output_dict[key]) is dict:
+            temp_dict = replace_secrets(output_dict[key], secrets_dict)
+            output_dict[key] = temp_dict
+
+    return output_dict
+
+
+def legacy(output, secrets):
+    # render_container parsed the output, then mergeSecrets parsed it again
+    json.loads(output)
+    json_str = json.dumps(replace_secrets(json.loads(output), secrets), indent=4)
+    if '"SECRET"' in json_str:
+        return None
+    return json.loads(json_str)
+
+
+def single_pass(output, secrets):
+    output_dict = json.loads(output)
+    if RogerPush().substituteSecrets(output_dict, secrets):
+        return None
+    json.dumps(output_dict, indent=4)
+    return output_dict
+
+
+def best_of(function, repeat, *args):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = function(*args)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks SECRET substitution for roger push")
+    parser.add_argument('--apps', type=int, default=50, help="apps in the group. Defaults to 50.")
+    parser.add_argument('--env', type=int, default=200, help="env entries per app. Defaults to 200.")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per path, the best is reported. Defaults to 5.")
+    args = parser.parse_args()
+
+    group, secrets = generate_group(args.apps, args.env)
+    output = json.dumps(group)
+    legacy_seconds, legacy_result = best_of(legacy, args.repeat, output, secrets)
+    single_pass_seconds, single_pass_result = best_of(single_pass, args.repeat, output, secrets)
+    assert legacy_result == single_pass_result
+
+    print("{} apps, {} env entries, {} secrets".format(args.apps, args.apps * args.env, len(secrets)))
+    print("{:>12} {:>12}".format("path", "seconds"))
+    print("{:>12} {:>12.4f}".format("legacy", legacy_seconds))
+    print("{:>12} {:>12.4f}".format("single pass", single_pass_seconds))
+    print("speedup: {:.1f}x".format(legacy_seconds / single_pass_seconds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/python
+
+# Measures rendering every container of a 30-container app: the former path (a
+# new Jinja environment, so a fresh compile, for each container) against the
+# shared environments of TemplateCache, cold (empty bytecode cache), warm from
+# disk (a new run with the bytecode cache filled) and warm in memory (the same
+# run, another environment).
+#
+# Usage: python tests/benchmarks/bench_template_cache.py [--containers 30] [--repeat 5]
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, os.pardir)))
+from cli.templatecache import TemplateCache
+
+
+def write_templates(templ_dir, num_containers):
+    '''Writes one Marathon template per container, with the loops and conditionals
+    of a typical app. Returns the template names.'''
+    names = []
+    for i in range(num_containers):
+        env_vars = ",\n".join(
+            '    "VAR_{0}": "{{{{ var_{0} | default(\'value{0}\') }}}}"'.format(j) for j in range(40))
+        template = "\n".join([
+            '{',
+            '  "id": "/app/container%d-{{ environment }}",' % i,
+            '  "instances": {% if environment == "production" %}{{ instances * 2 }}{% else %}{{ instances }}'
+            '{% endif %},',
+            '  "container": {"docker": {"image": "{{ image }}", "portMappings": [',
+            '    {% for port in ports %}{"containerPort": {{ port }}, "hostPort": 0}'
+            '{% if not loop.last %},{% endif %}{% endfor %}',
+            '  ]}},',
+            '  "env": {',
+            env_vars,
+            '  }',
+            '}'])
+        name = "app-container{}.json".format(i)
+        with open(os.path.join(templ_dir, name), "w") as fh:
+            fh.write(template)
+        names.append(name)
+    return names
+
+
+def render_all(get_environment, templ_dir, names):
+    variables = {'environment': 'dev', 'image': 'registry/app:1', 'instances': 2, 'ports': [8080, 8081]}
+    for name in names:
+        output = get_environment(templ_dir).get_template(name).render(variables)
+        json.loads(output)
+
+
+def legacy(templ_dir, names, cache_dir):
+    render_all(lambda path: Environment(loader=FileSystemLoader(path), undefined=StrictUndefined),
+               templ_dir, names)
+
+
+def cold(templ_dir, names, cache_dir):
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    template_cache = TemplateCache()
+    render_all(lambda path: template_cache.get_environment(path, cache_dir, StrictUndefined), templ_dir, names)
+
+
+def warm_disk(templ_dir, names, cache_dir):
+    template_cache = TemplateCache()
+    render_all(lambda path: template_cache.get_environment(path, cache_dir, StrictUndefined), templ_dir, names)
+
+
+shared = TemplateCache()
+
+
+def warm_memory(templ_dir, names, cache_dir):
+    render_all(lambda path: shared.get_environment(path, cache_dir, StrictUndefined), templ_dir, names)
+
+
+def best_of(function, repeat, *args):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        function(*args)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks template rendering for roger push")
+    parser.add_argument('--containers', type=int, default=30, help="containers in the app. Defaults to 30.")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per path, the best is reported. Defaults to 5.")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        templ_dir = os.path.join(tmp_dir, "templates")
+        cache_dir = os.path.join(tmp_dir, "components", ".jinja2-cache")
+        os.makedirs(templ_dir)
+        names = write_templates(templ_dir, args.containers)
+
+        print("{} containers".format(len(names)))
+        print("{:>12} {:>12}".format("path", "seconds"))
+        legacy_seconds = best_of(legacy, args.repeat, templ_dir, names, cache_dir)
+        print("{:>12} {:>12.4f}".format("legacy", legacy_seconds))
+        for label, function in [("cold", cold), ("warm disk", warm_disk), ("warm memory", warm_memory)]:
+            seconds = best_of(function, args.repeat, templ_dir, names, cache_dir)
+            print("{:>12} {:>12.4f} {:>8.1f}x".format(label, seconds, legacy_seconds / seconds))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,15 @@ import os
 import sys
 import requests
 import json
+import io
 from cli.chronos import Chronos
 from cli.marathon import Marathon
 from cli.framework import Framework
 from cli.appconfig import AppConfig
 from cli.utils import Utils
-from mockito import mock, when
+from cli.httpclient import http_client
+from cli.deploymentdocument import DeploymentDocument
+from mockito import mock, when, verify, unstub
 utils = Utils()
 
 
@@ -33,7 +36,7 @@ class TestChronos(unittest.TestCase):
 
         app_config_object = mock(AppConfig)
         when(app_config_object).getRogerEnv(config_dir).thenReturn(data)
-        when(requests).get(url, auth=(username, password)).thenReturn(res)
+        when(http_client).get(url, auth=(username, password)).thenReturn(res)
         when(res).json().thenReturn(image_data)
 
         c = Chronos()
@@ -47,3 +50,168 @@ class TestChronos(unittest.TestCase):
             app_config_object
         )
         assert img == image_data[0]['container']['image']
+
+    def job(self, name, parents=None):
+        tree = {'name': name}
+        if parents is not None:
+            tree['parents'] = parents
+        return DeploymentDocument(tree)
+
+    def test_get_push_levels_orders_parents_first(self):
+        c = Chronos()
+        jobs = [self.job('report', ['load', 'clean']), self.job('load', ['extract']), self.job('extract'),
+                self.job('clean', ['extract']), self.job('cleanup')]
+        levels = c.getPushLevels(jobs, {}, 'dev')
+        assert levels == [[2, 4], [1, 3], [0]]
+
+    def test_get_push_levels_rejects_cycles(self):
+        c = Chronos()
+        jobs = [self.job('a', ['c']), self.job('b', ['a']), self.job('c', ['b']), self.job('d')]
+        with self.assertRaises(ValueError) as context:
+            c.getPushLevels(jobs, {}, 'dev')
+        assert 'cycle' in str(context.exception)
+        assert 'd' not in str(context.exception).split(': ')[1].split(', ')
+        # Cycles are reported before parents outside the push are looked up
+        jobs.append(self.job('e', ['elsewhere']))
+        with self.assertRaises(ValueError) as context:
+            c.getPushLevels(jobs, {}, 'dev')
+        assert 'cycle' in str(context.exception)
+
+    def test_get_push_levels_missing_parent(self):
+        c = Chronos()
+        environmentObj = {'chronos_endpoint': 'https://example.com'}
+        live = [{'name': 'running', 'command': 'run'}]
+        when(c).fetch('https://example.com', 'dev', '/scheduler/jobs', 'jobs', True, False).thenReturn(
+            self.response(json.dumps(live).encode('utf-8')))
+        # A parent already running in Chronos does not need to be pushed again
+        jobs = [self.job('child', ['running']), self.job('other')]
+        assert c.getPushLevels(jobs, environmentObj, 'dev') == [[0, 1]]
+
+        jobs = [self.job('child', ['elsewhere']), self.job('other', ['running'])]
+        with self.assertRaises(ValueError) as context:
+            c.getPushLevels(jobs, environmentObj, 'dev')
+        assert 'elsewhere (parent of child)' in str(context.exception)
+        assert 'running' not in str(context.exception)
+        verify(c, times=1).fetch('https://example.com', 'dev', '/scheduler/jobs', 'jobs', True, False)
+
+    def test_get_push_levels_does_not_fetch_without_missing_parents(self):
+        c = Chronos()
+        jobs = [self.job('child', ['parent']), self.job('parent')]
+        assert c.getPushLevels(jobs, {}, 'dev') == [[1], [0]]
+
+    def response(self, body):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.raw = io.BytesIO(body)
+        return resp
+
+    def test_job_status_joins_graph_and_jobs(self):
+        roger_env = {'environments': {'dev': {'chronos_endpoint': 'https://example.com'}}}
+        graph = b"node,etl,success,idle\nnode,report,failure,running\nlink,etl,report\nnode,old,fresh\n"
+        jobs = [{'name': 'etl', 'successCount': 12, 'errorCount': 1, 'lastSuccess': '2016-05-02T10:00:00.000Z',
+                 'lastError': '2016-05-01T10:00:00.000Z', 'container': {'image': 'registry/etl:v1'},
+                 'schedule': 'R/2016-05-01T00:00:00Z/PT1H', 'command': 'run'},
+                {'name': 'report', 'successCount': 0, 'errorCount': 3, 'lastSuccess': '',
+                 'lastError': '2016-05-02T11:00:00.000Z', 'parents': ['etl']},
+                {'name': 'new', 'successCount': 0, 'errorCount': 0}]
+        c = Chronos()
+        when(c).fetch('https://example.com', 'dev', '/scheduler/graph/csv', 'graph', True).thenReturn(
+            self.response(graph))
+        when(c).fetch('https://example.com', 'dev', '/scheduler/jobs', 'jobs', True, True).thenReturn(
+            self.response(json.dumps(jobs).encode('utf-8')))
+        c.stream_chunk_size = 16
+
+        tasks = c.getTasks(roger_env, 'dev')
+        assert [job.name for job in tasks] == ['etl', 'report', 'new']
+        assert tasks[0] == ('etl', 'idle', 'success', '2016-05-02T10:00:00.000Z', 12, 1, 'registry/etl:v1')
+        assert tasks[1].state == 'running'
+        assert tasks[1].last_status == 'failure'
+        assert tasks[1].last_run == '2016-05-02T11:00:00.000Z'
+        assert tasks[1].image == ''
+        assert tasks[2] == ('new', '', '', '', 0, 0, '')
+
+    def test_matches_running_definition_uses_one_job_index(self):
+        live = [{'name': 'etl', 'command': 'run', 'schedule': 'R/2016-05-03T10:00:00.000Z/PT1H',
+                 'uris': ['b', 'a'], 'successCount': 12, 'lastSuccess': '2016-05-02T10:00:00.000Z',
+                 'retries': 2, 'owner': 'team@example.com'},
+                {'name': 'report', 'command': 'report', 'parents': ['etl']}]
+        c = Chronos()
+        when(c).fetch('https://example.com', 'dev', '/scheduler/jobs', 'jobs', True, False).thenReturn(
+            self.response(json.dumps(live).encode('utf-8')))
+        environmentObj = {'chronos_endpoint': 'https://example.com'}
+
+        unchanged = DeploymentDocument({'name': 'etl', 'command': 'run', 'uris': ['a', 'b'],
+                                        'schedule': 'R/2016-05-01T00:00:00Z/PT1H', 'owner': 'team@example.com'})
+        changed = DeploymentDocument({'name': 'report', 'command': 'report --all', 'parents': ['etl']})
+        added = DeploymentDocument({'name': 'cleanup', 'command': 'clean'})
+        assert c.matchesRunningDefinition(unchanged, environmentObj, 'dev', None) is True
+        assert c.matchesRunningDefinition(changed, environmentObj, 'dev', None) is False
+        assert c.matchesRunningDefinition(added, environmentObj, 'dev', None) is None
+        verify(c, times=1).fetch('https://example.com', 'dev', '/scheduler/jobs', 'jobs', True, False)
+
+        # A field the job no longer sets is reset by a push
+        no_owner = DeploymentDocument({'name': 'etl', 'command': 'run', 'uris': ['a', 'b'],
+                                       'schedule': 'R/2016-05-01T00:00:00Z/PT1H'})
+        assert c.matchesRunningDefinition(no_owner, environmentObj, 'dev', None) is False
+
+        # A pushed job replaces its entry in the index
+        c.updateJobIndex('dev', changed.tree)
+        assert c.matchesRunningDefinition(changed, environmentObj, 'dev', None) is True
+
+    def test_put_batch_pushes_jobs_one_by_one(self):
+        c = Chronos()
+        ok = requests.Response()
+        ok.status_code = 204
+        failed = requests.Response()
+        failed.status_code = 400
+        when(c).put('a.json', {}, 'a', 'dev', None).thenReturn((ok, ['a']))
+        when(c).put('b.json', {}, 'b', 'dev', None).thenReturn((failed, ['b']))
+        when(c).put('c.json', {}, 'c', 'dev', None).thenReturn((ok, ['c']))
+        resp, task_id_lists = c.putBatch(['a.json', 'b.json', 'c.json'], {}, ['a', 'b', 'c'], 'dev', None)
+        assert resp is failed
+        assert task_id_lists == [['a'], ['b'], ['c']]
+
+    def test_normalize_schedule_ignores_only_the_advanced_start(self):
+        c = Chronos()
+        daily = c.normalizeSchedule('R/2016-05-01T02:00:00Z/P1D')
+        assert daily == 'R/1970-01-01T02:00:00Z/P1D'
+        assert c.normalizeSchedule('R/2016-05-03T02:00:00.000Z/P1D') == daily
+        assert c.normalizeSchedule('R/2016-05-03T04:00:00.000+02:00/P1D') == daily
+        assert c.normalizeSchedule('R/2016-05-03T10:00:00.000Z/P1D') != daily
+        assert c.normalizeSchedule('R1/2016-05-01T02:00:00Z/P1D') != daily
+        assert c.normalizeSchedule('R/2016-05-01T02:00:00Z/P2D') != daily
+
+        hourly = c.normalizeSchedule('R/2016-05-01T00:15:00Z/PT1H')
+        assert c.normalizeSchedule('R/2016-05-03T10:15:00.000Z/PT1H') == hourly
+        assert c.normalizeSchedule('R/2016-05-03T10:45:00.000Z/PT1H') != hourly
+
+        weekly = c.normalizeSchedule('R/2016-05-02T02:00:00Z/P1W')
+        assert c.normalizeSchedule('R/2016-05-16T02:00:00Z/P1W') == weekly
+        assert c.normalizeSchedule('R/2016-05-17T02:00:00Z/P1W') != weekly
+
+        monthly = c.normalizeSchedule('R/2016-05-03T02:00:00Z/P1M')
+        assert monthly == 'R/T02:00:00Z/P1M'
+        assert c.normalizeSchedule('R/2016-06-03T02:00:00.000Z/P1M') == monthly
+        assert c.normalizeSchedule('R/2016-06-03T03:00:00.000Z/P1M') != monthly
+
+        assert c.normalizeSchedule('R//P1D') == 'R//P1D'
+
+    def test_changed_schedules_and_dropped_fields_are_changes(self):
+        c = Chronos()
+        live = {'name': 'etl', 'command': 'run', 'schedule': 'R/2016-05-03T02:00:00.000Z/P1D',
+                'disabled': True, 'successCount': 3}
+        template = {'name': 'etl', 'command': 'run', 'schedule': 'R/2016-05-01T02:00:00Z/P1D',
+                    'disabled': True}
+
+        def diff(template):
+            return c.definitiondiff.diff(c.normalizeJob(template), c.normalizeJob(live))
+
+        assert diff(template) == []
+        assert diff(dict(template, schedule='R/2016-05-01T10:00:00Z/P1D')) != []
+        assert diff(dict(template, schedule='R1/2016-05-01T02:00:00Z/P1D')) != []
+        enabled = dict(template)
+        del enabled['disabled']
+        assert diff(enabled) != []
+
+    def tearDown(self):
+        unstub()
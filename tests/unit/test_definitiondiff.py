@@ -0,0 +1,96 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.definitiondiff import DefinitionDiff
+from cli.marathon import Marathon
+
+# Test basic functionalities of DefinitionDiff class
+
+
+class TestDefinitionDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.diff = DefinitionDiff(Marathon.server_managed_fields, Marathon.unordered_fields, ['apps', 'groups'],
+                                   Marathon.default_fields, partial_update=True)
+        self.app = {
+            "id": "test-app",
+            "instances": 1,
+            "cpus": 0.5,
+            "env": {"HTTP_PREFIX": "/test"},
+            "constraints": [["hostname", "UNIQUE"], ["rack", "GROUP_BY"]],
+            "container": {"docker": {"image": "registry/test-app/v0.1", "network": "BRIDGE"}}
+        }
+        self.live_app = {
+            "id": "/test-app",
+            "instances": 1,
+            "cpus": 0.5,
+            "mem": 128,
+            "version": "2016-01-01T00:00:00.000Z",
+            "tasks": [{"id": "test-app.1"}],
+            "deployments": [],
+            "env": {"HTTP_PREFIX": "/test"},
+            "constraints": [["rack", "GROUP_BY"], ["hostname", "UNIQUE"]],
+            "container": {"type": "DOCKER", "volumes": [],
+                          "docker": {"image": "registry/test-app/v0.1", "network": "BRIDGE", "privileged": False}}
+        }
+
+    def test_unchanged_app(self):
+        assert self.diff.diff(self.app, self.live_app) == []
+
+    def test_changed_app(self):
+        self.app['container']['docker']['image'] = "registry/test-app/v0.2"
+        self.app['env']['NEW_VAR'] = "1"
+        changes = self.diff.diff(self.app, self.live_app)
+        assert changes == ['container.docker.image: "registry/test-app/v0.1" -> "registry/test-app/v0.2"',
+                           'env.NEW_VAR: (missing) -> "1"']
+
+    def test_removed_keys_are_changes(self):
+        assert self.diff.diff({'id': 'a', 'env': {'A': '1'}}, {'id': '/a', 'env': {'A': '1', 'OLD': 'x'}}) == \
+            ['env.OLD: "x" -> (removed)']
+        self.live_app['labels'] = {'team': 'web', 'HAPROXY_0_VHOST': 'old.example.com'}
+        self.app['labels'] = {'team': 'web'}
+        self.live_app['container']['docker']['parameters'] = [{'key': 'log-driver', 'value': 'gelf'}]
+        self.live_app['container']['docker']['portMappings'] = [{'containerPort': 80, 'hostPort': 0,
+                                                                 'servicePort': 10001, 'protocol': 'tcp'},
+                                                                {'containerPort': 81, 'hostPort': 0}]
+        self.app['container']['docker']['portMappings'] = [{'containerPort': 80}]
+        assert self.diff.diff(self.app, self.live_app) == [
+            'container.docker.parameters: [{"key": "log-driver", "value": "gelf"}] -> (removed)',
+            'container.docker.portMappings: [{"containerPort": 80}, {"containerPort": 81, "hostPort": 0}] -> '
+            '[{"containerPort": 80}]',
+            'labels.HAPROXY_0_VHOST: "old.example.com" -> (removed)']
+
+    def test_defaults_filled_in_by_marathon(self):
+        self.app['healthChecks'] = [{'protocol': 'HTTP', 'path': '/health'}]
+        self.live_app['healthChecks'] = [{'protocol': 'HTTP', 'path': '/health', 'gracePeriodSeconds': 300,
+                                          'intervalSeconds': 60, 'portIndex': 0}]
+        assert self.diff.diff(self.app, self.live_app) == []
+        self.live_app['healthChecks'][0]['intervalSeconds'] = 10
+        assert self.diff.diff(self.app, self.live_app) == ['healthChecks[0].intervalSeconds: 10 -> (removed)']
+
+    def test_group_apps_are_replaced_whole(self):
+        group = {"id": "test", "apps": [{"id": "app1", "instances": 1}]}
+        live_group = {"id": "/test", "version": "v1", "apps": [
+            {"id": "/test/app1", "instances": 1, "cpus": 1, "env": {"OLD": "x"}}]}
+        assert self.diff.diff(group, live_group) == ['apps.app1.env: {"OLD": "x"} -> (removed)']
+
+    def test_group_apps_matched_by_id(self):
+        group = {"id": "test", "groups": [{"id": "web", "apps": [
+            {"id": "app2", "instances": 2}, {"id": "app1", "instances": 1}]}]}
+        live_group = {"id": "/test", "version": "v1", "apps": [], "groups": [{"id": "/test/web", "version": "v1", "apps": [
+            {"id": "/test/web/app1", "instances": 1, "tasksRunning": 1},
+            {"id": "/test/web/app2", "instances": 2, "tasksRunning": 2}]}]}
+        assert self.diff.diff(group, live_group) == []
+        live_group['groups'][0]['apps'].append({"id": "/test/web/app3", "instances": 1})
+        assert self.diff.diff(group, live_group) == ['groups.web.apps.app3: "<running>" -> (removed)']
+
+    def tearDown(self):
+        pass
+
+if __name__ == '__main__':
+    unittest.main()
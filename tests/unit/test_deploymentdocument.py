@@ -0,0 +1,57 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import json
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.deploymentdocument import DeploymentDocument
+
+# Test basic functionalities of DeploymentDocument class
+
+
+class TestDeploymentDocument(unittest.TestCase):
+
+    def setUp(self):
+        self.group = {
+            "id": "test",
+            "groups": [{"id": "web", "apps": [
+                {"id": "app1", "env": {"HTTP_PREFIX": "/test/app1", "TCP_PORTS": "{\"9000\": \"PORT0\"}"}},
+                [{"id": "app2", "env": {"HTTP_PREFIX": "/test/app2", "ENABLE_AFFINITY": "true"}}]]}]}
+
+    def test_group_details(self):
+        document = DeploymentDocument(self.group)
+        assert document.is_group is True
+        assert document.app_ids == ["/test/web/app1", "/test/web/app2"]
+        assert document.app_details["/test/web/app1"] == ("/test/app1", ["9000"], False)
+        assert document.app_details["/test/web/app2"] == ("/test/app2", [], True)
+        assert document.task_ids == ["test/web/app1", "test/web/app2"]
+
+    def test_app_details(self):
+        # "groups" in a value does not make an app a group
+        app = {"id": "app1", "cmd": "echo groups", "env": {"HTTP_PREFIX": "/app1", "ENABLE_AFFINITY": "yes"}}
+        document = DeploymentDocument.parse(json.dumps(app))
+        assert document.is_group is False
+        assert document.app_details == {"/app1": ("/app1", [], True)}
+        assert document.task_ids == ["app1"]
+
+    def test_load_from_path_or_document(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(self.group, fh)
+        try:
+            document = DeploymentDocument.load(path)
+            assert document.tree == self.group
+            assert document.location == path
+            assert DeploymentDocument.load(document) is document
+        finally:
+            os.remove(path)
+
+    def tearDown(self):
+        pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+import threading
+import shutil
+import tempfile
+import time
+from requests.exceptions import HTTPError
+from cli.haproxyparser import HAProxyParser, RoutingSnapshot
+
+# Test basic functionalities of HAProxyParser class
+
+HAPROXY_CONFIG = """frontend http-in
+    bind *:80
+    acl ::test::app-aclrule path_beg -i /test/app
+    acl ::test::links-aclrule path_beg -i /test/links
+    use_backend ::test::app-cluster if ::test::app-aclrule
+    use_backend ::test::links-cluster if ::test::links-aclrule
+
+listen ::test::app-cluster-tcp-3000 :3000
+    mode tcp
+listen ::test::db-cluster-tcp-5432 :5432
+    mode tcp
+"""
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def iter_lines(self):
+        return iter(self.text.splitlines())
+
+    def close(self):
+        pass
+
+
+class FakeHAProxyParser(HAProxyParser):
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def get_roger_env(self):
+        return {'environments': {'test': {'host': 'http://testhost', 'haproxy_config_path': ':8000/config'}},
+                'haproxy_cache_ttl': 0}
+
+    def fetch_haproxy_config(self, url, etag=None, last_modified=None):
+        self.requests.append((url, etag, last_modified))
+        return self.responses.pop(0)
+
+
+class TestHAProxyParser(unittest.TestCase):
+
+    def setUp(self):
+        HAProxyParser().clear_cache()
+
+    def test_parse_config_text(self):
+        path_begin_values, backend_tcp_ports = HAProxyParser().parse_config_text(HAPROXY_CONFIG)
+        assert path_begin_values == {'/test/app': '/test/app', '/test/links': '/test/links'}
+        assert backend_tcp_ports == {'3000': '/test/app', '5432': '/test/db'}
+
+    def test_parse_config_lines_builds_inverse_maps(self):
+        lines = HAPROXY_CONFIG.splitlines() + [
+            "listen ::test::app-cluster-tcp-3001 :3001",
+            "    use_backend ::test::other-cluster if ::test::links-aclrule"]
+        path_begin_values, backend_tcp_ports, backend_path_begins, backend_ports = \
+            HAProxyParser().parse_config_lines(lines)
+        assert backend_ports == {'/test/app': ['3000', '3001'], '/test/db': ['5432']}
+        # A later rule for the same prefix takes it over
+        assert path_begin_values['/test/links'] == '/test/other'
+        assert backend_path_begins == {'/test/app': ['/test/app'], '/test/other': ['/test/links']}
+
+    def test_parse_config_is_cached_per_environment(self):
+        parser = FakeHAProxyParser([FakeResponse(200, HAPROXY_CONFIG)])
+        parser.default_cache_ttl = 60
+        config_reads = []
+
+        def get_roger_env():
+            config_reads.append(1)
+            return {'environments': {'test': {'host': 'http://testhost', 'haproxy_config_path': ':8000/config'}}}
+        parser.get_roger_env = get_roger_env
+        for i in range(10):
+            parser.parseConfig('test')
+        assert len(parser.requests) == 1
+        # The config is only read to fetch the snapshot, not to reuse it
+        assert len(config_reads) == 1
+        assert parser.get_backend_tcp_ports()['5432'] == '/test/db'
+        assert parser.get_tcp_ports_by_backend()['/test/db'] == ('5432',)
+        other_parser = FakeHAProxyParser([])
+        other_parser.get_roger_env = parser.get_roger_env
+        other_parser.parseConfig('test')
+        assert other_parser.get_path_begin_values()['/test/links'] == '/test/links'
+
+    def test_stale_entry_is_revalidated(self):
+        parser = FakeHAProxyParser([FakeResponse(200, HAPROXY_CONFIG, {'ETag': '"v1"'}),
+                                    FakeResponse(304, '')])
+        parser.parseConfig('test')
+        parser.parseConfig('test')
+        assert parser.requests[0] == ('http://testhost:8000/config', None, None)
+        assert parser.requests[1] == ('http://testhost:8000/config', '"v1"', None)
+        assert parser.get_backend_tcp_ports()['3000'] == '/test/app'
+
+    def test_error_responses_are_not_cached(self):
+        parser = FakeHAProxyParser([FakeResponse(500, '<html>Internal Server Error</html>'),
+                                    FakeResponse(200, HAPROXY_CONFIG, {'ETag': '"v1"'}),
+                                    FakeResponse(401, 'Unauthorized')])
+        with self.assertRaises(HTTPError):
+            parser.get_snapshot('test')
+        assert parser.get_snapshot('test').get_backend_tcp_ports()['3000'] == '/test/app'
+        # A failed revalidation does not replace the snapshot with an empty one
+        with self.assertRaises(HTTPError):
+            parser.get_snapshot('test')
+        assert parser.snapshots['test'].get_backend_tcp_ports()['3000'] == '/test/app'
+
+    def test_snapshot_is_read_only(self):
+        snapshot = RoutingSnapshot('test', {'/test/app': '/test/app'}, {'3000': '/test/app'})
+        assert snapshot.get_tcp_ports_by_backend() == {'/test/app': ('3000',)}
+        with self.assertRaises(TypeError):
+            snapshot.get_path_begin_values()['/test/other'] = '/test/other'
+        with self.assertRaises(AttributeError):
+            snapshot.backend_tcp_ports = {}
+
+    def test_refresh_swaps_snapshot(self):
+        other_config = HAPROXY_CONFIG.replace("tcp-5432 :5432", "tcp-5433 :5433")
+        parser = FakeHAProxyParser([FakeResponse(200, HAPROXY_CONFIG), FakeResponse(200, other_config)])
+        first = parser.get_snapshot('test')
+        second = parser.get_snapshot('test')
+        assert first is not second
+        # Readers of the previous snapshot are not affected by the refresh
+        assert first.get_backend_tcp_ports()['5432'] == '/test/db'
+        assert second.get_backend_tcp_ports()['5433'] == '/test/db'
+        assert '5432' not in second.get_backend_tcp_ports()
+
+    def test_environments_do_not_clobber_each_other(self):
+        envs = {'environments': {
+            'test': {'host': 'http://testhost', 'haproxy_config_path': ':8000/config'},
+            'stage': {'host': 'http://stagehost', 'haproxy_config_path': ':8000/config'}}}
+        stage_config = HAPROXY_CONFIG.replace("::test::", "::stage::")
+        parser = FakeHAProxyParser([FakeResponse(200, HAPROXY_CONFIG), FakeResponse(200, stage_config)])
+        parser.get_roger_env = lambda: envs
+        test_snapshot = parser.parseConfig('test')
+        stage_snapshot = parser.parseConfig('stage')
+        assert test_snapshot.get_backend_tcp_ports()['3000'] == '/test/app'
+        assert stage_snapshot.get_backend_tcp_ports()['3000'] == '/stage/app'
+        assert parser.get_backend_tcp_ports()['3000'] == '/stage/app'
+
+    def test_concurrent_readers_fetch_once(self):
+        parser = FakeHAProxyParser([FakeResponse(200, HAPROXY_CONFIG)])
+        parser.get_roger_env = lambda: {'environments': {
+            'test': {'host': 'http://testhost', 'haproxy_config_path': ':8000/config'}}}
+        snapshots = []
+        threads = [threading.Thread(target=lambda: snapshots.append(parser.get_snapshot('test')))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(parser.requests) == 1
+        assert len(set(id(snapshot) for snapshot in snapshots)) == 1
+
+    def test_saved_snapshot_is_used_until_stale(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'routes-test.json')
+            parser = FakeHAProxyParser([FakeResponse(200, HAPROXY_CONFIG)])
+            parser.get_snapshot('test').save(path)
+            HAProxyParser().clear_cache()
+
+            offline_parser = FakeHAProxyParser([])
+            loaded = offline_parser.use_snapshot_file(path, 'test', 60)
+            assert offline_parser.get_snapshot('test') is loaded
+            assert loaded.get_backend_tcp_ports() == {'3000': '/test/app', '5432': '/test/db'}
+            assert loaded.get_tcp_ports_by_backend()['/test/app'] == ('3000',)
+            assert offline_parser.requests == []
+
+            stale_parser = FakeHAProxyParser([FakeResponse(200, HAPROXY_CONFIG)])
+            stale_parser.use_snapshot_file(path, 'test', 0)
+            assert stale_parser.get_snapshot('test') is not loaded
+            assert len(stale_parser.requests) == 1
+
+            with self.assertRaises(ValueError):
+                offline_parser.use_snapshot_file(path, 'prod', 60)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def tearDown(self):
+        HAProxyParser().clear_cache()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import os
+import sys
+import threading
+from StringIO import StringIO
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.httpclient import HttpClient
+
+# Test basic functionalities of HttpClient class
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = '{"path": "%s"}' % self.path
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHttpClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = "http://127.0.0.1:{}".format(self.server.server_port)
+        self.client = HttpClient()
+        self.client.configure(pool_size=2, connect_timeout=5, read_timeout=5)
+
+    def test_get_endpoint(self):
+        assert self.client.get_endpoint(
+            "http://dev.example.com:8080/v2/apps?embed=apps.tasks") == "http://dev.example.com:8080"
+        assert self.client.get_endpoint("https://example.com/scheduler/jobs") == "https://example.com"
+
+    def test_one_session_per_endpoint_with_auth_set_once(self):
+        session1 = self.client.get_session("http://dev.example.com:8080/v2/apps", ("user", "pass"))
+        session2 = self.client.get_session("http://dev.example.com:8080/v2/tasks")
+        session3 = self.client.get_session("http://dev.example.com:4400/scheduler/jobs")
+        assert session1 is session2
+        assert session1 is not session3
+        assert session2.auth == ("user", "pass")
+        assert session3.auth is None
+
+    def test_connections_are_reused(self):
+        for i in range(5):
+            resp = self.client.get("{}/v2/apps/{}".format(self.url, i))
+            assert resp.json()['path'] == "/v2/apps/{}".format(i)
+        stats = self.client.get_stats()
+        assert stats[self.url] == (5, 1, 4)
+        stream = StringIO()
+        self.client.report(stream)
+        assert stream.getvalue() == "HTTP connections for {}: 5 requests over 1 connection(s), 4 reused\n".format(
+            self.url)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import json
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.jsonstream import JsonStream, iter_json_items
+
+# Test basic functionalities of JsonStream class
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestJsonStream(unittest.TestCase):
+
+    def setUp(self):
+        self.tasks = [{"id": "app.{}".format(i), "appId": "/app", "host": "host{}".format(i),
+                       "ports": [31000 + i], "healthCheckResults": [{"alive": True}],
+                       "startedAt": "2016-01-01T00:00:00.000Z"} for i in range(20)]
+        self.body = json.dumps({"meta": {"tasks": ["not", "these"]}, "count": 12345,
+                                "tasks": self.tasks, "version": u"caf\u00e9"}, ensure_ascii=False).encode('utf-8')
+
+    def test_items_are_the_same_for_any_chunk_size(self):
+        for size in [1, 2, 7, 64, len(self.body)]:
+            assert list(JsonStream(chunked(self.body, size)).iter_items('tasks')) == self.tasks
+
+    def test_fields_are_projected(self):
+        items = list(iter_json_items(chunked(self.body, 10), 'tasks', ('id', 'host', 'missing')))
+        assert items[3] == {"id": "app.3", "host": "host3"}
+
+    def test_top_level_array(self):
+        body = json.dumps(self.tasks).encode('utf-8')
+        for size in [1, 5, len(body)]:
+            assert list(JsonStream(chunked(body, size)).iter_items()) == self.tasks
+        assert list(iter_json_items([b' [ ] '], None)) == []
+
+    def test_missing_key_and_empty_array(self):
+        assert list(JsonStream([b'{"apps": []}']).iter_items('apps')) == []
+        assert list(JsonStream([b'{"message": "not found"}']).iter_items('apps')) == []
+        assert list(JsonStream([b'{}']).iter_items('apps')) == []
+
+    def test_truncated_body_raises(self):
+        with self.assertRaises(ValueError):
+            list(JsonStream(chunked(self.body[:-40], 16)).iter_items('tasks'))
+
+    def tearDown(self):
+        pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,11 +6,15 @@ import json
 import os
 import sys
 import requests
+import time
 sys.path.insert(0, os.path.abspath(os.path.join(
     os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
 from cli.marathon import Marathon
 from cli.appconfig import AppConfig
-from mockito import mock, when
+from cli.httpclient import http_client
+from cli.deploymentdocument import DeploymentDocument
+from mockito import mock, when, unstub
+from mockito.matchers import any
 
 # Test basic functionalities of MarathonValidator class
 
@@ -82,7 +86,7 @@ class TestMarathon(unittest.TestCase):
 
         app_config_object = mock(AppConfig)
         when(app_config_object).getRogerEnv(config_dir).thenReturn(data)
-        when(requests).get(url, auth=(username, password)).thenReturn(res)
+        when(http_client).get(url, auth=(username, password)).thenReturn(res)
         when(res).json().thenReturn(image_data)
 
         m = Marathon()
@@ -97,8 +101,174 @@ class TestMarathon(unittest.TestCase):
         )
         assert img == image_data['app']['container']['docker']['image']
 
+    def deployment_response(self, url, body=None):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp._content = json.dumps({'version': '2016-01-01', 'deploymentId': 'd1'}).encode('utf-8')
+        resp.request = requests.Request('PUT', url, data=body).prepare()
+        return resp
+
+    def test_wait_for_deployment_polls_until_deployment_is_gone(self):
+        m = Marathon()
+        m.user = 'user'
+        m.passw = 'pass'
+        m.min_poll_interval = 0
+        deployments = [{'id': 'd1', 'currentStep': 1, 'totalSteps': 2,
+                        'currentActions': [{'action': 'RestartApplication', 'app': '/test/app'}]}, None]
+        m.getDeployment = lambda environmentObj, deployment_id: deployments.pop(0)
+        m.watchDeploymentEvents = lambda environmentObj, deployment_id, deadline, finished: None
+        m.getApp = lambda environmentObj, environment, app_id: {'id': '/' + app_id, 'version': '2016-01-01'}
+        resp = self.deployment_response('http://marathon/v2/apps/test/app')
+        assert m.waitForDeployment(resp, {'marathon_endpoint': 'http://marathon'}, 'dev', 10) is True
+        assert deployments == []
+
+    def test_wait_for_deployment_checks_versions_of_gone_deployment(self):
+        m = Marathon()
+        m.user = 'user'
+        m.passw = 'pass'
+        m.getDeployment = lambda environmentObj, deployment_id: None
+        m.watchDeploymentEvents = lambda environmentObj, deployment_id, deadline, finished: None
+        versions = {'test/app': '2016-01-01', 'test/rolled-back': '2016-01-02', 'test/group': '2016-01-01'}
+        m.getApp = lambda environmentObj, environment, app_id: {'version': versions[app_id]}
+        m.getGroup = lambda environmentObj, environment, group_id: {'version': versions[group_id]}
+        environmentObj = {'marathon_endpoint': 'http://marathon'}
+
+        def wait(url, body=None):
+            return m.waitForDeployment(self.deployment_response(url, body), environmentObj, 'dev', 10)
+        assert wait('http://marathon/v2/apps/test/app') is True
+        assert wait('http://marathon/v2/groups/test/group') is True
+        # Rolled back or replaced by a newer deployment
+        assert wait('http://marathon/v2/apps/test/rolled-back') is False
+        assert wait('http://marathon/v2/apps', '[{"id": "/test/app"}]') is True
+        assert wait('http://marathon/v2/apps', '[{"id": "/test/app"}, {"id": "/test/rolled-back"}]') is False
+        # Nothing to check the outcome against
+        assert wait('http://marathon/v2/other') is False
+
+    def test_wait_for_deployment_times_out(self):
+        m = Marathon()
+        m.user = 'user'
+        m.passw = 'pass'
+        m.min_poll_interval = 0
+        m.getDeployment = lambda environmentObj, deployment_id: {'id': deployment_id}
+        m.watchDeploymentEvents = lambda environmentObj, deployment_id, deadline, finished: None
+        resp = self.deployment_response('http://marathon/v2/apps/test/app')
+        assert m.waitForDeployment(resp, {'marathon_endpoint': 'http://marathon'}, 'dev', 0) is False
+
+    def test_read_deployment_events(self):
+        stream = mock(requests.Response)
+        lines = ['event: status_update_event',
+                 'data: {"eventType": "status_update_event", "appId": "/test/app", "taskId": "t1", "taskStatus": "TASK_RUNNING", "host": "h1"}',
+                 '',
+                 'event: deployment_success',
+                 'data: {"eventType": "deployment_success", "id": "other"}',
+                 '',
+                 'event: deployment_failed',
+                 'data: {"eventType": "deployment_failed", "id": "d1"}',
+                 '']
+        when(stream).iter_lines().thenReturn(iter(lines))
+        assert Marathon().readDeploymentEvents(stream, 'd1', set(['/test/app']), time.time() + 10) is False
+
+    def test_current_image_version_uses_id_filter_first(self):
+        m = Marathon()
+        apps = [{'id': '/other', 'container': None},
+                {'id': '/content/kairos', 'container': {'docker': {'image': 'registry/moz-content-kairos-abc/v0.46'}}}]
+        calls = []
+
+        def getApps(roger_env, environment, id_filter=None, embed_tasks=False):
+            calls.append((id_filter, embed_tasks))
+            return [app for app in apps if id_filter in app['id']]
+
+        def iterApps(roger_env, environment, fields=None):
+            calls.append(('all', fields))
+            return iter(apps)
+        m.getApps = getApps
+        m.iterApps = iterApps
+        when(Marathon).extractImageVersion('registry/moz-content-kairos-abc/v0.46').thenReturn('abc/v0.46')
+        assert m.getCurrentImageVersion({}, 'dev', 'kairos') == 'abc/v0.46'
+        assert calls == [('kairos', False)]
+
+        # Falls back to an index of the images of every app, fetched only once
+        apps[1]['id'] = '/content/tsdb'
+        assert m.getCurrentImageVersion({}, 'dev', 'kairos') == 'abc/v0.46'
+        assert m.getCurrentImageVersion({}, 'dev', 'grafana') is None
+        assert calls[1:] == [('kairos', False), ('all', ('id', 'container')), ('grafana', False)]
+
+    def test_find_task(self):
+        m = Marathon()
+        calls = []
+        tasks = [{'id': 'test_web_app.1234', 'host': 'host1'}, {'id': 'test_web_app.5678', 'host': 'host2'},
+                 {'id': 'my.app.7788', 'host': 'host3'}]
+
+        def getAppTasks(environmentObj, environment, app_id):
+            calls.append(app_id)
+            # Only /test/web/app runs, there is no app /my
+            return tasks[:2] if app_id == 'test/web/app' else []
+
+        def iterTasks(roger_env, environment, fields=None):
+            calls.append('all')
+            return iter(tasks)
+        m.getAppTasks = getAppTasks
+        m.iterTasks = iterTasks
+        roger_env = {'environments': {'dev': {'marathon_endpoint': 'http://marathon'}}}
+        assert m.findTask(roger_env, 'dev', 'test_web_app.5678')['host'] == 'host2'
+        assert calls == ['test/web/app']
+        # Partial prefixes and app ids with '.' are found by scanning all tasks
+        assert m.findTask(roger_env, 'dev', 'test_we')['host'] == 'host1'
+        assert m.findTask(roger_env, 'dev', 'my.app.77')['host'] == 'host3'
+        assert calls[1:] == ['all', 'my', 'all']
+        assert m.findTask(roger_env, 'dev', 'test_web_app.9') is None
+
+    def response(self, status_code, body):
+        resp = requests.Response()
+        resp.status_code = status_code
+        resp._content = json.dumps(body).encode('utf-8')
+        return resp
+
+    def test_matches_running_definition_fetches_only_its_app(self):
+        m = Marathon()
+        m.user = 'user'
+        m.passw = 'pass'
+        environmentObj = {'marathon_endpoint': 'http://marathon'}
+        live = {'id': '/test/app', 'cmd': 'run', 'instances': 2, 'version': '2016-05-01T00:00:00.000Z'}
+        when(http_client).get('http://marathon/v2/apps/test/app', headers={'Accept': 'application/json'},
+                              auth=('user', 'pass')).thenReturn(self.response(200, {'app': live}))
+        when(http_client).get('http://marathon/v2/apps/test/new', headers={'Accept': 'application/json'},
+                              auth=('user', 'pass')).thenReturn(self.response(404, {'message': 'not found'}))
+        when(http_client).get('http://marathon/v2/apps/test/down', headers={'Accept': 'application/json'},
+                              auth=('user', 'pass')).thenReturn(self.response(503, {}))
+
+        def matches(tree):
+            return m.matchesRunningDefinition(DeploymentDocument(tree), environmentObj, 'dev', None)
+        assert matches({'id': 'test/app', 'cmd': 'run'}) is True
+        assert matches({'id': 'test/app', 'cmd': 'serve'}) is False
+        assert matches({'id': 'test/new', 'cmd': 'run'}) is None
+        assert matches({'id': 'test/down', 'cmd': 'run'}) is False
+
+    def test_get_instance_details_streams_tasks(self):
+        m = Marathon()
+        m.user = 'user'
+        m.passw = 'pass'
+        roger_env = {'environments': {'dev': {'marathon_endpoint': 'http://marathon'}}}
+        body = json.dumps({'tasks': [
+            {'id': 'app.1', 'appId': '/app', 'host': 'host1', 'ports': [31000],
+             'startedAt': '2016-01-01T00:00:00.000Z', 'healthCheckResults': []},
+            {'id': 'app.2', 'appId': '/app', 'host': 'host2', 'ports': [31001],
+             'startedAt': '2016-01-02T00:00:00.000Z', 'healthCheckResults': []}]})
+        resp = mock(requests.Response)
+        resp.status_code = 200
+        resp.reason = 'OK'
+        when(resp).iter_content(Marathon.stream_chunk_size).thenReturn(
+            iter([body[i:i + 16] for i in range(0, len(body), 16)]))
+        when(resp).close().thenReturn(None)
+        when(http_client).get('http://marathon/v2/tasks', headers=any(), params={'status': 'running'},
+                              stream=True, auth=('user', 'pass')).thenReturn(resp)
+        details = m.getInstanceDetails(roger_env, 'dev')
+        assert details == {'app.1': ('/app', 'host1', [31000], '2016-01-01T00:00:00.000Z'),
+                           'app.2': ('/app', 'host2', [31001], '2016-01-02T00:00:00.000Z')}
+
     def tearDown(self):
-        pass
+        unstub()
 
 if __name__ == '__main__':
     unittest.main()
@@ -7,7 +7,7 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(
     os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
 from cli.marathonvalidator import MarathonValidator
-from cli.haproxyparser import HAProxyParser
+from cli.haproxyparser import HAProxyParser, RoutingSnapshot
 from mockito import mock, when
 
 # Test basic functionalities of MarathonValidator class
@@ -83,6 +83,17 @@ class TestMarathonValidator(unittest.TestCase):
         self.assertFalse(self.marathonvalidator.check_tcp_port(
             haproxyparser, ["9090", "9000"], "/test/app1/service", message_list))
 
+    def test_validate_reads_one_snapshot(self):
+        haproxyparser = mock(HAProxyParser)
+        snapshot = RoutingSnapshot("test", {'/test/app': "/test/app"}, {'3000': "/test/app"})
+        when(haproxyparser).get_snapshot("test").thenReturn(snapshot)
+        message_list = []
+        self.assertTrue(self.marathonvalidator.validate(
+            haproxyparser, "test", "/test/app", ["3000"], False, "/test/app", message_list))
+        self.assertFalse(self.marathonvalidator.validate(
+            haproxyparser, "test", "/other", ["3000"], False, "/other/app", message_list))
+        assert "TCP PORT validation check failed" in message_list[0]
+
     def tearDown(self):
         pass
 
@@ -0,0 +1,54 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.portallocator import PortAllocator
+
+# Test basic functionalities of PortAllocator class
+
+
+class TestPortAllocator(unittest.TestCase):
+
+    def test_parse_range(self):
+        assert PortAllocator.parse_range("10000-10999") == (10000, 10999)
+        with self.assertRaises(ValueError):
+            PortAllocator.parse_range("10000")
+        with self.assertRaises(ValueError):
+            PortAllocator(10010, 10000)
+
+    def test_allocate(self):
+        allocator = PortAllocator(10000, 10009)
+        assert allocator.is_free(10003)
+        assert allocator.allocate("10003") is True
+        assert allocator.allocate(10003) is False
+        assert not allocator.is_free(10003)
+        # Out of the range or not a port
+        assert allocator.allocate(9999) is False
+        assert allocator.allocate(10010) is False
+        assert allocator.allocate("") is False
+        assert allocator.used == 1
+
+    def test_take(self):
+        allocator = PortAllocator(10000, 10019)
+        for port in range(10000, 10010) + [10011, 10013]:
+            allocator.allocate(port)
+        assert allocator.take(3) == [10010, 10012, 10014]
+        assert allocator.take(1) == [10015]
+        assert allocator.used == 16
+        assert allocator.take(4) == [10016, 10017, 10018, 10019]
+        with self.assertRaises(ValueError):
+            allocator.take(1)
+
+    def test_take_more_than_free(self):
+        allocator = PortAllocator(10000, 10002)
+        allocator.allocate(10001)
+        with self.assertRaises(ValueError):
+            allocator.take(3)
+        assert allocator.take(2) == [10000, 10002]
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.records import TaskRecord, AppRecord, ReadOnlyDict, group_tasks_by_app
+
+# Test basic functionalities of the task and app records
+
+
+class TestRecords(unittest.TestCase):
+
+    def test_task_record_is_a_slotted_tuple(self):
+        task = TaskRecord("/app1", "host1", [31000], "2016-01-01T00:00:00.000Z")
+        assert task == ("/app1", "host1", [31000], "2016-01-01T00:00:00.000Z")
+        assert task[1] == task.hostname == "host1"
+        # No per-instance dict: the same size as the plain tuple
+        assert sys.getsizeof(task) == sys.getsizeof(tuple(task))
+        assert not hasattr(AppRecord("/app1"), '__dict__')
+
+    def test_group_tasks_by_app(self):
+        instance_details = {
+            "app1.1": TaskRecord("/app1", "host1", [31000], None),
+            "app2.1": TaskRecord("/app2", "host1", [31001], None),
+            "app1.2": TaskRecord("/app1", "host2", [31000], None)}
+        apps = group_tasks_by_app(instance_details, {"/app1": {"HTTP_PORT": "PORT0"}})
+        assert sorted(apps.keys()) == ["/app1", "/app2"]
+        assert sorted(apps["/app1"].task_ids) == ["app1.1", "app1.2"]
+        assert apps["/app1"].env == {"HTTP_PORT": "PORT0"}
+        assert apps["/app2"].task_ids == ["app2.1"]
+        assert apps["/app2"].env == {}
+
+    def test_read_only_dict(self):
+        class Settings(ReadOnlyDict):
+            message = "Settings are read-only"
+        settings = Settings({'a': 1})
+        with self.assertRaises(TypeError) as context:
+            settings['b'] = 2
+        assert str(context.exception) == "Settings are read-only"
+        with self.assertRaises(TypeError):
+            ReadOnlyDict(settings).update({'b': 2})
+        assert settings == {'a': 1}
+
+    def tearDown(self):
+        pass
+
+if __name__ == '__main__':
+    unittest.main()
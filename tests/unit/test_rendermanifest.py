@@ -0,0 +1,118 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import argparse
+import json
+import os
+import sys
+import shutil
+import tempfile
+from jinja2 import Environment, FileSystemLoader
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.rendermanifest import RenderManifest, fingerprint
+from cli.roger_push import RogerPush
+
+# Test basic functionalities of RenderManifest class
+
+
+class TestRenderManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.templ_dir = os.path.join(self.tmp_dir, "templates")
+        self.comp_dir = os.path.join(self.tmp_dir, "components")
+        self.secrets_dir = os.path.join(self.tmp_dir, "secrets")
+        for path in [self.templ_dir, os.path.join(self.comp_dir, "dev"), self.secrets_dir]:
+            os.makedirs(path)
+        self.write_template("macros.j2", '{% macro port(p) %}{"containerPort": {{ p }}}{% endmacro %}')
+        self.write_template("app-web.json",
+                            '{% import "macros.j2" as m %}{"id": "{{ name }}", "ports": [{{ m.port(80) }}]}')
+        self.write_template("app-api.json", '{"id": "/api", "instances": {{ instances }}}')
+        self.env = Environment(loader=FileSystemLoader(self.templ_dir))
+        self.output_path = os.path.join(self.comp_dir, "dev", "app-web.json")
+
+    def write_template(self, filename, content):
+        with open(os.path.join(self.templ_dir, filename), "w") as fh:
+            fh.write(content)
+
+    def render(self, manifest, name="web"):
+        inputs = fingerprint({"name": name})
+        output = manifest.get_output("app-web.json", self.env, inputs, self.output_path)
+        if output is None:
+            output = self.env.get_template("app-web.json").render(name=name)
+            manifest.write_output(self.output_path, output)
+            manifest.record("app-web.json", self.env, "app-web.json", inputs, output)
+            return output, True
+        return output, False
+
+    def test_referenced_templates(self):
+        manifest = RenderManifest(os.path.join(self.comp_dir, "dev"))
+        assert manifest.referenced_templates(self.env, "app-web.json") == ["app-web.json", "macros.j2"]
+        self.write_template("app-dynamic.json", '{% include name %}')
+        assert manifest.referenced_templates(self.env, "app-dynamic.json") is None
+
+    def test_get_output(self):
+        manifest = RenderManifest(os.path.join(self.comp_dir, "dev"))
+        output, rendered = self.render(manifest)
+        assert rendered
+        assert json.loads(output) == {"id": "web", "ports": [{"containerPort": 80}]}
+        assert self.render(manifest) == (output, False)
+        # Another variable set, an edited import or an edited output file render again
+        assert self.render(manifest, "web2")[1]
+        assert not self.render(manifest, "web2")[1]
+        self.write_template("macros.j2", '{% macro port(p) %}{"hostPort": {{ p }}}{% endmacro %}')
+        output, rendered = self.render(manifest, "web2")
+        assert rendered and "hostPort" in output
+        with open(self.output_path, "w") as fh:
+            fh.write("{}")
+        assert self.render(manifest, "web2") == (output, True)
+
+    def test_write_output(self):
+        manifest = RenderManifest(os.path.join(self.comp_dir, "dev"))
+        assert manifest.write_output(self.output_path, '{"id": "web"}')
+        os.utime(self.output_path, (0, 0))
+        assert not manifest.write_output(self.output_path, '{"id": "web"}')
+        assert os.stat(self.output_path).st_mtime == 0
+        assert manifest.write_output(self.output_path, '{"id": "web2"}')
+        assert [name for name in os.listdir(os.path.dirname(self.output_path))] == ["app-web.json"]
+
+    def test_save(self):
+        manifest = RenderManifest(os.path.join(self.comp_dir, "dev"))
+        output, rendered = self.render(manifest)
+        manifest.save()
+        manifest = RenderManifest(os.path.join(self.comp_dir, "dev"))
+        assert self.render(manifest) == (output, False)
+        with open(manifest.path, "w") as fh:
+            fh.write("not json")
+        assert RenderManifest(os.path.join(self.comp_dir, "dev")).entries == {}
+
+    def test_render_container_skips_unchanged(self):
+        config = {"name": "app", "vars": {"global": {"instances": 1}}}
+        args = argparse.Namespace(image_name="app:1", secrets_file=None)
+        templ_dir = self.templ_dir + "/"
+        output_path = os.path.join(self.comp_dir, "dev", "app-api.json")
+        roger_push = RogerPush()
+        roger_push.render_container("api", templ_dir, config, {}, {"registry": "r"}, "dev", args,
+                                    self.secrets_dir, self.comp_dir, {})
+        roger_push.save_render_manifests()
+        os.utime(output_path, (0, 0))
+        roger_push = RogerPush()
+        roger_push.render_container("api", templ_dir, config, {}, {"registry": "r"}, "dev", args,
+                                    self.secrets_dir, self.comp_dir, {})
+        assert os.stat(output_path).st_mtime == 0
+        assert roger_push.documents["api"].tree == {"id": "/api", "instances": 1}
+        config["vars"]["global"]["instances"] = 2
+        # A changed config is read by the next run
+        roger_push = RogerPush()
+        roger_push.render_container("api", templ_dir, config, {}, {"registry": "r"}, "dev", args,
+                                    self.secrets_dir, self.comp_dir, {})
+        assert os.stat(output_path).st_mtime != 0
+        assert roger_push.documents["api"].tree == {"id": "/api", "instances": 2}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.responsecache import ResponseCache
+from cli.httpclient import HttpClient
+
+# Test basic functionalities of ResponseCache class
+
+
+class ETagHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get('If-None-Match')))
+        etag = '"v1"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = '{"apps": [{"id": "%s"}]}' % self.path
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        ETagHandler.requests_seen = []
+        self.server = HTTPServer(('127.0.0.1', 0), ETagHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = "http://127.0.0.1:{}".format(self.server.server_port)
+        self.cache_dir = tempfile.mkdtemp()
+        self.client = HttpClient()
+        self.client.configure(pool_size=2, connect_timeout=5, read_timeout=5)
+        self.cache = ResponseCache(self.client)
+        self.cache.configure(True, max_age=60, cache_dir=self.cache_dir, max_size_mb=1)
+
+    def test_fresh_response_is_served_from_disk(self):
+        resp = self.cache.get('dev', self.url + '/v2/apps', auth=('user', 'pass'))
+        assert resp.json() == {"apps": [{"id": "/v2/apps"}]}
+        assert resp.reason == "OK"
+        resp = self.cache.get('dev', self.url + '/v2/apps', auth=('user', 'pass'))
+        assert resp.json() == {"apps": [{"id": "/v2/apps"}]}
+        assert resp.reason == "OK (cached)"
+        assert len(ETagHandler.requests_seen) == 1
+        # Other users and environments have their own entries
+        self.cache.get('dev', self.url + '/v2/apps', auth=('other', 'pass'))
+        self.cache.get('stage', self.url + '/v2/apps', auth=('user', 'pass'))
+        assert len(ETagHandler.requests_seen) == 3
+
+    def test_stale_response_is_revalidated(self):
+        self.cache.configure(True, max_age=0)
+        self.cache.get('dev', self.url + '/v2/tasks', params={'status': 'running'})
+        resp = self.cache.get('dev', self.url + '/v2/tasks', params={'status': 'running'}, stream=True)
+        assert "".join(resp.iter_content(4)) == '{"apps": [{"id": "/v2/tasks?status=running"}]}'
+        assert resp.reason == "OK (cached)"
+        assert ETagHandler.requests_seen == [('/v2/tasks?status=running', None),
+                                             ('/v2/tasks?status=running', '"v1"')]
+
+    def test_invalidate_and_disable(self):
+        self.cache.get('dev', self.url + '/v2/apps')
+        self.cache.invalidate('dev')
+        self.cache.get('dev', self.url + '/v2/apps')
+        self.cache.configure(False)
+        self.cache.get('dev', self.url + '/v2/apps')
+        assert ETagHandler.requests_seen == [('/v2/apps', None)] * 3
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.max_size = 1
+        self.cache.get('dev', self.url + '/v2/apps/1')
+        self.cache.get('dev', self.url + '/v2/apps/2')
+        self.cache.get('dev', self.url + '/v2/apps/1')
+        assert len(ETagHandler.requests_seen) == 3
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import json
+import os
+import sys
+import shutil
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.roger_ports import RogerPorts
+from cli.haproxyparser import HAProxyParser, RoutingSnapshot
+from cli.appconfig import AppConfig
+from cli.settings import Settings
+from mockito import mock, when
+
+# Test basic functionalities of roger-ports script
+
+
+class TestRogerPorts(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_dir = os.path.join(self.tmp_dir, "config")
+        self.templ_dir = os.path.join(self.tmp_dir, "templates")
+        self.secrets_dir = os.path.join(self.tmp_dir, "secrets")
+        for path in [self.config_dir, self.templ_dir, self.secrets_dir]:
+            os.makedirs(path)
+        self.write_config("search.json", "search", {"api": ("/search/api", {"10000": "PORT1", "10002": "PORT2"})})
+        self.write_config("links.json", "links", {"api": ("/links/api", {"10004": "PORT1"})})
+
+        self.roger_env = {'registry': 'registry.example.com:5000', 'default_environment': 'dev',
+                          'tcp_port_range': '9000-9999',
+                          'environments': {'dev': {'host': 'http://dev', 'tcp_port_range': '10000-10999'},
+                                           'stage': {'host': 'http://stage'}}}
+        self.settings = mock(Settings)
+        when(self.settings).getConfigDir().thenReturn(self.config_dir)
+        when(self.settings).getTemplatesDir().thenReturn(self.templ_dir)
+        when(self.settings).getSecretsDir().thenReturn(self.secrets_dir)
+        self.appconfig = mock(AppConfig)
+        when(self.appconfig).getRogerEnv(self.config_dir).thenReturn(self.roger_env)
+        self.haproxyparser = mock(HAProxyParser)
+        when(self.haproxyparser).get_snapshot('dev').thenReturn(
+            RoutingSnapshot('dev', {}, {'10001': '/legacy/app', '10003': '/legacy/app', '20000': '/other/app'}))
+        self.roger_ports = RogerPorts()
+        self.parser = self.roger_ports.parse_args()
+
+    def write_config(self, config_file, name, containers):
+        config = {"name": name, "apps": {"app": {"name": "app", "containers": sorted(containers.keys())}}}
+        for container, (app_id, tcp_ports) in containers.items():
+            template = {"id": app_id, "env": {"TCP_PORTS": json.dumps(tcp_ports)}}
+            with open(os.path.join(self.templ_dir, "{}-{}.json".format(name, container)), "w") as fh:
+                json.dump(template, fh)
+        with open(os.path.join(self.config_dir, config_file), "w") as fh:
+            json.dump(config, fh)
+
+    def test_get_port_range(self):
+        assert self.roger_ports.get_port_range(self.roger_env, 'dev') == (10000, 10999)
+        assert self.roger_ports.get_port_range(self.roger_env, 'stage') == (9000, 9999)
+        assert self.roger_ports.get_port_range(self.roger_env, 'dev', '300-400') == (300, 400)
+        del self.roger_env['tcp_port_range']
+        assert self.roger_ports.get_port_range(self.roger_env, 'stage') == (10000, 20000)
+
+    def test_suggest(self):
+        args = self.parser.parse_args(['suggest', '-e', 'dev', '-n', '3', '-P', '1'])
+        ports = self.roger_ports.main(self.settings, self.appconfig, self.haproxyparser, args)
+        assert ports == [10005, 10006, 10007]
+
+    def test_suggest_full_range(self):
+        args = self.parser.parse_args(['suggest', '-e', 'dev', '-n', '2', '-r', '10000-10005', '-P', '1'])
+        with self.assertRaises(ValueError):
+            self.roger_ports.main(self.settings, self.appconfig, self.haproxyparser, args)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(
 from cli.roger_ps import RogerPS
 from cli.haproxyparser import HAProxyParser
 from cli.marathon import Marathon
+from cli.chronos import Chronos
+from cli.records import JobRecord
 from mockito import mock, when
 
 
@@ -47,14 +49,14 @@ class TestRogerPS(unittest.TestCase):
         self.framework = framework
         haproxyparser = mock(HAProxyParser)
         path_beg_values = {}
-        path_beg_values['/test/app1'] = "app1"
+        path_beg_values['app1'] = ['/test/app1']
         backend_services_tcp_ports = {}
-        backend_services_tcp_ports['9001'] = "app2"
-        when(haproxyparser).get_backend_tcp_ports(
+        backend_services_tcp_ports['app2'] = ['9001']
+        when(haproxyparser).get_tcp_ports_by_backend(
         ).thenReturn(backend_services_tcp_ports)
         when(haproxyparser).parseConfig("test").thenReturn(
             "acl ::test::app-aclrule path_beg -i /test/app\nacl ::test::links-aclrule path_beg -i /test/links")
-        when(haproxyparser).get_path_begin_values().thenReturn(path_beg_values)
+        when(haproxyparser).get_path_begin_values_by_backend().thenReturn(path_beg_values)
         self.haproxyparser = haproxyparser
 
     def test_get_marathon_details_correctly_parses_tasks_and_haproxy_details_with_no_verbose(self):
@@ -92,6 +94,15 @@ class TestRogerPS(unittest.TestCase):
         assert app2_data[2] == ['9000']
         assert app2_data[3] == "2016-04-18T20:48:13.732Z"
 
+    def test_get_job_details(self):
+        chronos = mock(Chronos)
+        jobs = [JobRecord('report', 'running', 'failure', '2016-05-02T11:00:00.000Z', 0, 3, ''),
+                JobRecord('etl', 'idle', 'success', '2016-05-02T10:00:00.000Z', 12, 1, 'registry/etl:v1')]
+        when(chronos).iterJobStatus(self.roger_env, "test").thenReturn(iter(jobs))
+        job_details = self.rogerps.get_job_details(chronos, "test", self.roger_env)
+        assert job_details[0] == ['etl', 'idle', 'success', '2016-05-02T10:00:00.000Z', 12, 1, 'registry/etl:v1']
+        assert job_details[1][6] == "-"
+
     def tearDown(self):
         pass
 
@@ -8,6 +8,8 @@ from jinja2 import Template, exceptions
 import json
 import yaml
 import sys
+import shutil
+import tempfile
 sys.path.insert(0, os.path.abspath(os.path.join(
     os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
 from cli.roger_push import RogerPush
@@ -251,6 +253,77 @@ class TestPush(unittest.TestCase):
         assert output['cpus'] == 1
         assert output['mem'] == 1024
 
+    def test_container_resolution_in_parallel(self):
+        settings = mock(Settings)
+        appConfig = mock(AppConfig)
+        roger_push = RogerPush()
+        roger_push.utils = mock(Utils)
+        marathon = mock(Marathon)
+        mockedHooks = mock(Hooks)
+        when(mockedHooks).run_hook(any(), any(), any(), any()).thenReturn(0)
+        roger_env = self.roger_env
+        config = self.test_config
+        data = self.test_data
+        sc = mock(StatsClient)
+
+        when(sc).timing(any(), any()).thenReturn(any())
+        when(roger_push.utils).getStatsClient().thenReturn(sc)
+        when(roger_push.utils).get_identifier(any(), any(), any()).thenReturn(any())
+        when(roger_push.utils).extract_app_name(any()).thenReturn("test")
+        when(marathon).getName().thenReturn('Marathon')
+        when(marathon).put(any(), any(), any()).thenReturn("Response [200]")
+        when(marathon).put(any(), any(), any()).thenReturn("Response [200]")
+        when(marathon).put(any(), any(), any()).thenReturn("Response [200]")
+        frameworkUtils = mock(FrameworkUtils)
+        when(frameworkUtils).getFramework(data).thenReturn(marathon)
+        when(settings).getComponentsDir().thenReturn(
+            self.base_dir + "/tests/components")
+        when(settings).getSecretsDir().thenReturn(
+            self.base_dir + "/tests/secrets")
+        when(settings).getTemplatesDir().thenReturn(
+            self.base_dir + "/tests/templates")
+        when(settings).getConfigDir().thenReturn(self.configs_dir)
+        when(settings).getCliDir().thenReturn(self.base_dir)
+        when(settings).getUser().thenReturn(any())
+        when(appConfig).getRogerEnv(self.configs_dir).thenReturn(roger_env)
+        when(appConfig).getConfig(any(), any()).thenReturn(config)
+        when(appConfig).getAppData(any(), any(), any()).thenReturn(data)
+
+        args = self.args
+        args.env = "dev"
+        args.secrets_file = ""
+        args.skip_push = True
+        args.app_name = 'grafana_test_app'
+        args.directory = self.base_dir + '/tests/testrepo'
+        args.config_file = 'test.json'
+        args.image_name = 'grafana/grafana:2.1.3'
+        args.parallelism = 3
+        roger_push.main(settings, appConfig, frameworkUtils, mockedHooks, args)
+        for name, cpus, mem in [('grafana1', 0.5, 512), ('grafana2', 1, 1024)]:
+            with open("{}/test-app-{}.json".format(self.components_dir, name)) as output:
+                output = json.load(output)
+            assert output['cpus'] == cpus
+            assert output['mem'] == mem
+        with open(self.base_dir + '/tests/templates/test-app-grafana.json') as output:
+            output = json.load(output)
+        assert output['container']['docker'][
+            'image'] == "grafana/grafana:2.1.3"
+        assert output['cpus'] == 2
+        assert output['mem'] == 1024
+        assert output['uris'] == ["abc", "xyz", "$ENV_VAR"]
+        with open(self.base_dir + '/tests/templates/test-app-grafana1.json') as output:
+            output = json.load(output)
+        assert output['container']['docker'][
+            'image'] == "grafana/grafana:2.1.3"
+        assert output['cpus'] == 0.5
+        assert output['mem'] == 512
+        with open(self.base_dir + '/tests/templates/test-app-grafana2.json') as output:
+            output = json.load(output)
+        assert output['container']['docker'][
+            'image'] == "grafana/grafana:2.1.3"
+        assert output['cpus'] == 1
+        assert output['mem'] == 1024
+
     def test_roger_push_with_no_app_fails(self):
         settings = mock(Settings)
         appConfig = mock(AppConfig)
@@ -687,6 +760,8 @@ class TestPush(unittest.TestCase):
         when(marathon).put(any(), any(), any(),
                            any(), any()).thenReturn(["Response [200]", any()])
         when(marathon).runDeploymentChecks(any(), any()).thenReturn(True)
+        when(marathon).matchesRunningDefinition(any(), any(), any(), any()).thenReturn(False)
+        when(marathon).getPushLevels(any(), any(), any()).thenReturn(None)
         frameworkUtils = mock(FrameworkUtils)
         frameworkUtils = mock(FrameworkUtils)
 
@@ -797,6 +872,8 @@ class TestPush(unittest.TestCase):
         when(marathon).put(any(), any(), any(),
                            any(), any()).thenReturn(["Response [200]", any()])
         when(marathon).runDeploymentChecks(any(), any()).thenReturn(True)
+        when(marathon).matchesRunningDefinition(any(), any(), any(), any()).thenReturn(False)
+        when(marathon).getPushLevels(any(), any(), any()).thenReturn(None)
         when(settings).getComponentsDir().thenReturn(
             self.base_dir + "/tests/components")
         when(settings).getSecretsDir().thenReturn(
@@ -824,6 +901,179 @@ class TestPush(unittest.TestCase):
             settings, appConfig, frameworkUtils, mockedHooks, args)
         verify(frameworkUtils, times=0).put(any(), any(), any(), any())
 
+    def test_push_skipped_when_definition_unchanged(self):
+        settings = mock(Settings)
+        appConfig = mock(AppConfig)
+        roger_push = RogerPush()
+        roger_push.utils = mock(Utils)
+        marathon = mock(Marathon)
+        mockedHooks = mock(Hooks)
+        roger_env = self.roger_env
+        config = self.config
+        data = self.data
+
+        sc = mock(StatsClient)
+        when(sc).timing(any(), any()).thenReturn(any())
+        when(roger_push.utils).getStatsClient().thenReturn(sc)
+        when(roger_push.utils).get_identifier(any(), any(), any()).thenReturn(any())
+        when(roger_push.utils).extract_app_name(any()).thenReturn("test")
+        when(roger_push.utils).get_version().thenReturn(any())
+
+        frameworkUtils = mock(FrameworkUtils)
+        when(frameworkUtils).getFramework(data).thenReturn(marathon)
+        when(marathon).getName().thenReturn('Marathon')
+        when(marathon).runDeploymentChecks(any(), any()).thenReturn(True)
+        when(marathon).matchesRunningDefinition(any(), any(), any(), any()).thenReturn(True)
+        when(marathon).getPushLevels(any(), any(), any()).thenReturn(None)
+        when(settings).getComponentsDir().thenReturn(
+            self.base_dir + "/tests/components")
+        when(settings).getSecretsDir().thenReturn(
+            self.base_dir + "/tests/secrets")
+        when(settings).getTemplatesDir().thenReturn(
+            self.base_dir + "/tests/templates")
+        when(settings).getConfigDir().thenReturn(self.configs_dir)
+        when(settings).getCliDir().thenReturn(self.base_dir)
+        when(settings).getUser().thenReturn(any())
+        when(mockedHooks).run_hook(any(), any(), any(), any()).thenReturn(0)
+        when(appConfig).getRogerEnv(self.configs_dir).thenReturn(roger_env)
+        when(appConfig).getConfig(any(), any()).thenReturn(config)
+        when(appConfig).getAppData(any(), any(), any()).thenReturn(data)
+
+        args = self.args
+        args.env = "dev"
+        args.secrets_file = ""
+        args.skip_push = False
+        args.force_push = False
+        args.app_name = 'grafana_test_app'
+        args.config_file = 'test.json'
+        args.directory = self.base_dir + '/tests/testrepo'
+        args.image_name = 'grafana/grafana:2.1.3'
+        roger_push.main(settings, appConfig, frameworkUtils, mockedHooks, args)
+        verify(marathon, times=0).put(any(), any(), any(), any(), any())
+        assert roger_push.sync_summary['added'] == []
+        assert roger_push.sync_summary['changed'] == []
+        assert len(roger_push.sync_summary['unchanged']) > 0
+        assert roger_push.outcome == 1
+
+    def test_batch_push(self):
+        settings = mock(Settings)
+        appConfig = mock(AppConfig)
+        roger_push = RogerPush()
+        roger_push.utils = mock(Utils)
+        marathon = mock(Marathon)
+        mockedHooks = mock(Hooks)
+        roger_env = self.roger_env
+        config = self.test_config
+        data = self.test_data
+
+        sc = mock(StatsClient)
+        when(sc).timing(any(), any()).thenReturn(any())
+        when(roger_push.utils).getStatsClient().thenReturn(sc)
+        when(roger_push.utils).get_identifier(any(), any(), any()).thenReturn(any())
+        when(roger_push.utils).extract_app_name(any()).thenReturn("test")
+        when(roger_push.utils).get_version().thenReturn(any())
+        when(roger_push.utils).modify_task_id(any()).thenReturn([])
+
+        resp = MagicMock(status_code=200)
+        frameworkUtils = mock(FrameworkUtils)
+        when(frameworkUtils).getFramework(data).thenReturn(marathon)
+        when(marathon).getName().thenReturn('Marathon')
+        when(marathon).runDeploymentChecks(any(), any()).thenReturn(True)
+        when(marathon).matchesRunningDefinition(any(), any(), any(), any()).thenReturn(False)
+        when(marathon).getPushLevels(any(), any(), any()).thenReturn(None)
+        when(marathon).isBatchable(any()).thenReturn(True)
+        when(marathon).putBatch(any(), any(), any(), any(), any()).thenReturn((resp, [["test-app-grafana1"]]))
+        when(settings).getComponentsDir().thenReturn(
+            self.base_dir + "/tests/components")
+        when(settings).getSecretsDir().thenReturn(
+            self.base_dir + "/tests/secrets")
+        when(settings).getTemplatesDir().thenReturn(
+            self.base_dir + "/tests/templates")
+        when(settings).getConfigDir().thenReturn(self.configs_dir)
+        when(settings).getCliDir().thenReturn(self.base_dir)
+        when(settings).getUser().thenReturn(any())
+        when(mockedHooks).run_hook(any(), any(), any(), any()).thenReturn(0)
+        when(appConfig).getRogerEnv(self.configs_dir).thenReturn(roger_env)
+        when(appConfig).getConfig(any(), any()).thenReturn(config)
+        when(appConfig).getAppData(any(), any(), any()).thenReturn(data)
+
+        args = self.args
+        args.env = "dev"
+        args.secrets_file = ""
+        args.skip_push = False
+        args.force_push = False
+        args.app_name = 'grafana_test_app'
+        args.config_file = 'test.json'
+        args.directory = self.base_dir + '/tests/testrepo'
+        args.image_name = 'grafana/grafana:2.1.3'
+        args.batch = True
+        args.batch_size = 1
+        roger_push.main(settings, appConfig, frameworkUtils, mockedHooks, args)
+        # One batch per container with a batch size of 1
+        verify(marathon, times=3).putBatch(any(), any(), any(), any(), any())
+        verify(marathon, times=0).put(any(), any(), any(), any(), any())
+        assert roger_push.outcome == 1
+
+    def test_failed_batch_fails_its_containers(self):
+        settings = mock(Settings)
+        appConfig = mock(AppConfig)
+        roger_push = RogerPush()
+        roger_push.utils = mock(Utils)
+        marathon = mock(Marathon)
+        mockedHooks = mock(Hooks)
+        roger_env = self.roger_env
+        config = self.test_config
+        data = self.test_data
+
+        sc = mock(StatsClient)
+        when(sc).timing(any(), any()).thenReturn(any())
+        when(roger_push.utils).getStatsClient().thenReturn(sc)
+        when(roger_push.utils).get_identifier(any(), any(), any()).thenReturn(any())
+        when(roger_push.utils).extract_app_name(any()).thenReturn("test")
+        when(roger_push.utils).get_version().thenReturn(any())
+        when(roger_push.utils).modify_task_id(any()).thenReturn([])
+
+        resp = MagicMock(status_code=200)
+        frameworkUtils = mock(FrameworkUtils)
+        when(frameworkUtils).getFramework(data).thenReturn(marathon)
+        when(marathon).getName().thenReturn('Marathon')
+        when(marathon).runDeploymentChecks(any(), any()).thenReturn(True)
+        when(marathon).matchesRunningDefinition(any(), any(), any(), any()).thenReturn(False)
+        when(marathon).getPushLevels(any(), any(), any()).thenReturn(None)
+        when(marathon).isBatchable(any()).thenReturn(True)
+        when(marathon).putBatch(any(), any(), any(), any(), any()).thenRaise(ValueError("Connection refused"))
+        when(settings).getComponentsDir().thenReturn(
+            self.base_dir + "/tests/components")
+        when(settings).getSecretsDir().thenReturn(
+            self.base_dir + "/tests/secrets")
+        when(settings).getTemplatesDir().thenReturn(
+            self.base_dir + "/tests/templates")
+        when(settings).getConfigDir().thenReturn(self.configs_dir)
+        when(settings).getCliDir().thenReturn(self.base_dir)
+        when(settings).getUser().thenReturn(any())
+        when(mockedHooks).run_hook(any(), any(), any(), any()).thenReturn(0)
+        when(appConfig).getRogerEnv(self.configs_dir).thenReturn(roger_env)
+        when(appConfig).getConfig(any(), any()).thenReturn(config)
+        when(appConfig).getAppData(any(), any(), any()).thenReturn(data)
+
+        args = self.args
+        args.env = "dev"
+        args.secrets_file = ""
+        args.skip_push = False
+        args.force_push = False
+        args.app_name = 'grafana_test_app'
+        args.config_file = 'test.json'
+        args.directory = self.base_dir + '/tests/testrepo'
+        args.image_name = 'grafana/grafana:2.1.3'
+        args.batch = True
+        args.batch_size = 1
+        with self.assertRaises(ValueError):
+            roger_push.main(settings, appConfig, frameworkUtils, mockedHooks, args)
+        # Every batch is tried, and a failed batch is a failed push of its containers
+        verify(marathon, times=3).putBatch(any(), any(), any(), any(), any())
+        verify(marathon, times=0).put(any(), any(), any(), any(), any())
+        assert roger_push.outcome == 0
+
     def test_roger_push_secrets_replaced(self):
         settings = mock(Settings)
         appConfig = mock(AppConfig)
@@ -922,6 +1172,83 @@ class TestPush(unittest.TestCase):
         assert result['env']['ENV_VAR1'] == 'test_value1'
         assert result['env']['ENV_VAR2'] == 'test_value2'
 
+    def test_render_all_envs(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            with open(tmp_dir + "/matrix-web.json", "w") as fh:
+                fh.write('{"id": "/matrix/web", "mem": {{ mem }}, "instances": {{ instances }}}')
+            with open(tmp_dir + "/matrix-api.json", "w") as fh:
+                fh.write('{"id": "/matrix/api", "mem": {{ mem }}}')
+            config = {'name': 'matrix', 'vars': {'global': {'instances': 1},
+                                                 'environment': {'dev': {'mem': 128}, 'prod': {'mem': 1024}}},
+                      'apps': {'matrix': {'name': 'matrix', 'containers': ['web', 'api']}}}
+            data = config['apps']['matrix']
+            settings = mock(Settings)
+            appConfig = mock(AppConfig)
+            roger_push = RogerPush()
+            roger_push.utils = mock(Utils)
+            marathon = mock(Marathon)
+            mockedHooks = mock(Hooks)
+            when(mockedHooks).run_hook(any(), any(), any(), any()).thenReturn(0)
+            when(roger_push.utils).get_identifier(any(), any(), any()).thenReturn(any())
+            when(roger_push.utils).extract_app_name(any()).thenReturn("matrix")
+            when(marathon).getName().thenReturn('Marathon')
+            frameworkUtils = mock(FrameworkUtils)
+            when(frameworkUtils).getFramework(data).thenReturn(marathon)
+            when(settings).getComponentsDir().thenReturn(tmp_dir + "/components")
+            when(settings).getSecretsDir().thenReturn(tmp_dir + "/secrets")
+            when(settings).getTemplatesDir().thenReturn(tmp_dir)
+            when(settings).getConfigDir().thenReturn(self.configs_dir)
+            when(settings).getUser().thenReturn(any())
+            when(appConfig).getRogerEnv(self.configs_dir).thenReturn(self.roger_env)
+            when(appConfig).getConfig(any(), any()).thenReturn(config)
+            when(appConfig).getAppData(any(), any(), any()).thenReturn(data)
+
+            args = self.parser.parse_args(['-e', 'dev'])
+            args.skip_push = False
+            args.all_envs = True
+            args.secrets_file = None
+            args.app_name = 'matrix'
+            args.config_file = 'matrix.json'
+            args.image_name = 'matrix:1'
+            args.parallelism = 4
+            with self.assertRaises(ValueError) as context:
+                roger_push.main(settings, appConfig, frameworkUtils, mockedHooks, args)
+            assert str(context.exception) == "Rendering failed for environment(s): stage."
+            for env, mem in [('dev', 128), ('prod', 1024)]:
+                for container in ['web', 'api']:
+                    with open("{}/components/{}/matrix-{}.json".format(tmp_dir, env, container)) as fh:
+                        assert json.load(fh)['mem'] == mem
+            assert not os.path.exists(tmp_dir + "/components/stage/matrix-web.json")
+            verify(marathon, times=0).put(any(), any(), any())
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_secrets_loaded_once_per_run(self):
+        args = self.args
+        args.secrets_file = "test_app-container1.json"
+        secrets_dir = self.base_dir + "/tests/secrets"
+        roger_push = RogerPush()
+        secret_vars = roger_push.loadSecrets(secrets_dir, "test-app-grafana1.json", args, "test")
+        assert roger_push.loadSecrets(secrets_dir, "test-app-grafana2.json", args, "dev") is secret_vars
+        assert RogerPush().loadSecrets(secrets_dir, "test-app-grafana1.json", args, "test") is not secret_vars
+
+    def test_substitute_secrets(self):
+        roger_push = RogerPush()
+        output = {"id": "/app", "env": {"DB_PASSWORD": "SECRET", "USER": "app"},
+                  "apps": [{"env": {"API_KEY": "SECRET", "TOKEN": "SECRET"}}, ["SECRET"]]}
+        unresolved = roger_push.substituteSecrets(output, {"DB_PASSWORD": "pw", "API_KEY": "key"})
+        assert output["env"] == {"DB_PASSWORD": "pw", "USER": "app"}
+        assert output["apps"][0]["env"] == {"API_KEY": "key", "TOKEN": "SECRET"}
+        assert unresolved == ["apps[0].env.TOKEN", "apps[1][0]"]
+
+    def test_merge_secrets(self):
+        roger_push = RogerPush()
+        json_str = '{"env": {"DB_PASSWORD": "SECRET", "USER": "app"}}'
+        output = roger_push.mergeSecrets(json_str, {"DB_PASSWORD": "pw"})
+        assert json.loads(output) == {"env": {"DB_PASSWORD": "pw", "USER": "app"}}
+        assert roger_push.mergeSecrets(json_str, {}) == "StandardError"
+
     def tearDown(self):
         pass
 
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.roger_routes import RogerRoutes
+from cli.haproxyparser import HAProxyParser, RoutingSnapshot
+from cli.appconfig import AppConfig
+from cli.settings import Settings
+from mockito import mock, when, verify
+
+# Test basic functionalities of roger-routes script
+
+
+class TestRogerRoutes(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.roger_routes = RogerRoutes()
+        self.parser = self.roger_routes.parse_args()
+        self.roger_env = {'default_environment': 'test', 'environments': {'test': {'host': 'http://testhost'}}}
+        self.settings = mock(Settings)
+        when(self.settings).getConfigDir().thenReturn("/config")
+        when(self.settings).getCacheDir().thenReturn(os.path.join(self.tmp_dir, "cache"))
+        self.appconfig = mock(AppConfig)
+        when(self.appconfig).getRogerEnv("/config").thenReturn(self.roger_env)
+        self.haproxyparser = mock(HAProxyParser)
+        self.snapshot = RoutingSnapshot('test', {'/test/app': '/test/app'}, {'3000': '/test/app'})
+        when(self.haproxyparser).get_snapshot('test').thenReturn(self.snapshot)
+        when(self.haproxyparser).clear_cache('test').thenReturn(None)
+
+    def test_snapshot_saves_current_routes(self):
+        args = self.parser.parse_args(['snapshot', '-e', 'test'])
+        path = self.roger_routes.main(self.settings, self.appconfig, self.haproxyparser, args)
+        assert path == os.path.join(self.tmp_dir, "cache", "routes-test.json")
+        verify(self.haproxyparser).clear_cache('test')
+        loaded = RoutingSnapshot.load(path)
+        assert loaded.environment == 'test'
+        assert loaded.get_path_begin_values() == {'/test/app': '/test/app'}
+        assert loaded.get_backend_tcp_ports() == {'3000': '/test/app'}
+
+    def test_snapshot_to_output_file(self):
+        output = os.path.join(self.tmp_dir, "routes.json")
+        args = self.parser.parse_args(['snapshot', '-e', 'test', '-o', output])
+        assert self.roger_routes.main(self.settings, self.appconfig, self.haproxyparser, args) == output
+        assert os.path.exists(output)
+
+    def test_snapshot_without_routes_needs_force(self):
+        when(self.haproxyparser).get_snapshot('test').thenReturn(RoutingSnapshot('test', {}, {}))
+        output = os.path.join(self.tmp_dir, "routes.json")
+        args = self.parser.parse_args(['snapshot', '-e', 'test', '-o', output])
+        with self.assertRaises(ValueError):
+            self.roger_routes.main(self.settings, self.appconfig, self.haproxyparser, args)
+        assert not os.path.exists(output)
+        args = self.parser.parse_args(['snapshot', '-e', 'test', '-o', output, '--force'])
+        assert self.roger_routes.main(self.settings, self.appconfig, self.haproxyparser, args) == output
+
+    def test_unknown_environment(self):
+        args = self.parser.parse_args(['snapshot', '-e', 'prod'])
+        with self.assertRaises(ValueError):
+            self.roger_routes.main(self.settings, self.appconfig, self.haproxyparser, args)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
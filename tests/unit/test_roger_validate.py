@@ -0,0 +1,96 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import json
+import os
+import sys
+import shutil
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.roger_validate import RogerValidate, find_conflicts
+from cli.haproxyparser import HAProxyParser, RoutingSnapshot
+from cli.records import RouteRecord
+from cli.appconfig import AppConfig
+from cli.settings import Settings
+from mockito import mock, when
+
+# Test basic functionalities of roger-validate script
+
+class TestRogerValidate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_dir = os.path.join(self.tmp_dir, "config")
+        self.templ_dir = os.path.join(self.tmp_dir, "templates")
+        self.secrets_dir = os.path.join(self.tmp_dir, "secrets")
+        for path in [self.config_dir, self.templ_dir, self.secrets_dir]:
+            os.makedirs(path)
+        self.write_config("search.json", "search", {"api": ("/search/api", "/api", "9000"),
+                                                    "web": ("/search/web", "/web", "9001")})
+        self.write_config("links.json", "links", {"api": ("/links/api", "/api", "9002")})
+        self.write_config("reports.json", "reports", {"api": ("/reports/api", "/reports", "9001")})
+        with open(os.path.join(self.config_dir, "roger-mesos-tools.config"), "w") as fh:
+            fh.write("environments:\n  dev:\n    marathon_endpoint: http://marathon\n")
+
+        self.roger_env = {'registry': 'registry.example.com:5000', 'default_environment': 'dev',
+                          'environments': {'dev': {'host': 'http://dev'}}}
+        self.settings = mock(Settings)
+        when(self.settings).getConfigDir().thenReturn(self.config_dir)
+        when(self.settings).getTemplatesDir().thenReturn(self.templ_dir)
+        when(self.settings).getSecretsDir().thenReturn(self.secrets_dir)
+        self.appconfig = mock(AppConfig)
+        when(self.appconfig).getRogerEnv(self.config_dir).thenReturn(self.roger_env)
+        self.haproxyparser = mock(HAProxyParser)
+        when(self.haproxyparser).get_snapshot('dev').thenReturn(
+            RoutingSnapshot('dev', {'/reports': '/reports/api'}, {'9002': '/legacy/app'}))
+        self.roger_validate = RogerValidate()
+        self.parser = self.roger_validate.parse_args()
+
+    def write_config(self, config_file, name, containers):
+        config = {"name": name, "apps": {"app": {"name": "app", "containers": sorted(containers.keys())}}}
+        for container, (app_id, http_prefix, tcp_port) in containers.items():
+            template = {"id": app_id, "instances": "{{ instances }}",
+                        "env": {"HTTP_PREFIX": http_prefix, "TCP_PORTS": json.dumps({tcp_port: "PORT1"})}}
+            with open(os.path.join(self.templ_dir, "{}-{}.json".format(name, container)), "w") as fh:
+                json.dump(template, fh)
+        config["vars"] = {"global": {"instances": 1}}
+        with open(os.path.join(self.config_dir, config_file), "w") as fh:
+            json.dump(config, fh)
+
+    def test_find_conflicts(self):
+        routes = [RouteRecord("a.json", "app", "c1", "/a/one", "/one", ["9000"], False),
+                  RouteRecord("b.json", "app", "c1", "/b/one", "/one", ["9001"], False),
+                  RouteRecord("c.json", "app", "c1", "/c/sticky", "/sticky", [], True),
+                  RouteRecord("d.json", "app", "c1", "/d/sticky", "/sticky", ["9001"], True)]
+        routing = RoutingSnapshot('dev', {'/sticky': '/c/sticky'}, {'9000': '/a/one', '9001': '/x/other'})
+        errors, warnings = find_conflicts(routes, routing)
+        assert errors[0].startswith("HTTP_PREFIX '/one' is used by: /a/one (a.json:app/c1), /b/one")
+        assert errors[1].startswith("TCP PORT '9001' is used by:")
+        assert errors[2].endswith("is already in use by app id: '/x/other'")
+        assert len(errors) == 3
+        assert warnings == ["HTTP_PREFIX '/sticky' is used by: /c/sticky (c.json:app/c1), /d/sticky (d.json:app/c1)"]
+
+    def test_validate_all_configs(self):
+        for processes in ['1', '2']:
+            args = self.parser.parse_args(['--all', '-e', 'dev', '-P', processes])
+            errors, warnings = self.roger_validate.main(self.settings, self.appconfig, self.haproxyparser, args)
+            assert len(errors) == 3
+            assert "HTTP_PREFIX '/api' is used by: /links/api (links.json:app/api), /search/api" in errors[0]
+            assert errors[1].startswith("TCP PORT '9001' is used by: /reports/api (reports.json:app/api)")
+            assert errors[2] == "TCP PORT '9002' of /links/api (links.json:app/api) is already in use by app id: " \
+                "'/legacy/app'"
+            assert warnings == []
+
+    def test_validate_named_configs_without_haproxy(self):
+        args = self.parser.parse_args(['links.json', 'search.json', '-e', 'dev', '--skip-haproxy', '-P', '1'])
+        errors, warnings = self.roger_validate.main(self.settings, self.appconfig, self.haproxyparser, args)
+        assert len(errors) == 1
+        assert errors[0].startswith("HTTP_PREFIX '/api' is used by:")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
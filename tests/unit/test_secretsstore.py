@@ -0,0 +1,73 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import json
+import os
+import sys
+import shutil
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.secretsstore import SecretsStore, thaw
+
+# Test basic functionalities of SecretsStore class
+
+
+class TestSecretsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.secrets_dir = tempfile.mkdtemp()
+        self.json_path = os.path.join(self.secrets_dir, "app-web.json")
+        with open(self.json_path, "w") as fh:
+            json.dump({"DB_PASSWORD": "pw", "hosts": ["a", "b"], "nested": {"key": "value"}}, fh)
+        self.yml_path = os.path.join(self.secrets_dir, "app-api.yml")
+        with open(self.yml_path, "w") as fh:
+            fh.write("API_KEY: key\n")
+
+    def test_load(self):
+        store = SecretsStore()
+        secrets = store.load(self.json_path)
+        assert secrets["DB_PASSWORD"] == "pw"
+        assert store.load(self.json_path) is secrets
+        assert store.load(self.yml_path) == {"API_KEY": "key"}
+        with self.assertRaises(IOError):
+            store.load(os.path.join(self.secrets_dir, "missing.json"))
+        with open(self.yml_path, "w") as fh:
+            fh.write("API_KEY: [key\n")
+        os.utime(self.yml_path, (0, 0))
+        with self.assertRaises(ValueError):
+            store.load(self.yml_path)
+
+    def test_load_again_when_changed(self):
+        store = SecretsStore()
+        secrets = store.load(self.json_path)
+        with open(self.json_path, "w") as fh:
+            json.dump({"DB_PASSWORD": "new"}, fh)
+        os.utime(self.json_path, (0, 0))
+        assert store.load(self.json_path)["DB_PASSWORD"] == "new"
+        assert len(store.secrets) == 1
+
+    def test_read_only(self):
+        secrets = SecretsStore().load(self.json_path)
+        with self.assertRaises(TypeError):
+            secrets["DB_PASSWORD"] = "changed"
+        with self.assertRaises(TypeError):
+            secrets["nested"]["key"] = "changed"
+        assert secrets["hosts"] == ("a", "b")
+        hosts = thaw(secrets["hosts"])
+        hosts.append("c")
+        assert thaw(secrets) == {"DB_PASSWORD": "pw", "hosts": ["a", "b"], "nested": {"key": "value"}}
+
+    def test_ensure_dir(self):
+        store = SecretsStore()
+        secrets_dir = os.path.join(self.secrets_dir, "new")
+        store.ensure_dir(secrets_dir)
+        store.ensure_dir(secrets_dir)
+        assert os.path.isdir(secrets_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.secrets_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from jinja2 import StrictUndefined
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.templatecache import TemplateCache
+
+# Test basic functionalities of TemplateCache class
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.templ_dir = os.path.join(self.tmp_dir, "templates")
+        os.makedirs(self.templ_dir)
+        self.cache_dir = os.path.join(self.tmp_dir, "components", ".jinja2-cache")
+        self.write_template("app.json", '{"id": "{{ name }}"}')
+
+    def write_template(self, filename, content):
+        with open(os.path.join(self.templ_dir, filename), "w") as fh:
+            fh.write(content)
+
+    def test_get_environment(self):
+        template_cache = TemplateCache()
+        env = template_cache.get_environment(self.templ_dir, self.cache_dir, StrictUndefined)
+        assert template_cache.get_environment(self.templ_dir + "/", self.cache_dir, StrictUndefined) is env
+        assert template_cache.get_environment(self.templ_dir, self.cache_dir) is not env
+        assert template_cache.get_environment(self.templ_dir).bytecode_cache is None
+        assert env.get_template("app.json") is env.get_template("app.json")
+        assert env.get_template("app.json").render(name="search") == '{"id": "search"}'
+
+    def test_bytecode_cache(self):
+        template_cache = TemplateCache()
+        env = template_cache.get_environment(self.templ_dir, self.cache_dir)
+        env.get_template("app.json")
+        cached = [name for name in os.listdir(self.cache_dir) if name.endswith(".cache")]
+        assert len(cached) == 1
+        # A later run loads the bytecode, and recompiles once the template changes
+        template_cache.clear()
+        env = template_cache.get_environment(self.templ_dir, self.cache_dir)
+        assert env.get_template("app.json").render(name="search") == '{"id": "search"}'
+        self.write_template("app.json", '{"id": "{{ name }}-v2"}')
+        template_cache.clear()
+        env = template_cache.get_environment(self.templ_dir, self.cache_dir)
+        assert env.get_template("app.json").render(name="search") == '{"id": "search-v2"}'
+        assert not [name for name in os.listdir(self.cache_dir) if name.startswith(".tmp-")]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.variablescopes import VariableScopes
+from cli.roger_push import RogerPush
+
+# Test basic functionalities of VariableScopes class
+
+
+class TestVariableScopes(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {'name': 'app', 'vars': {'global': {'instances': 1, 'mem': 128, 'cpus': 0.1},
+                                               'environment': {'dev': {'mem': 256}, 'prod': {'mem': 1024}}}}
+        self.app_data = {'name': 'web', 'vars': {'environment': {'dev': {'cpus': 0.5}}}}
+        self.container = {'vars': {'global': {'instances': 2}}}
+
+    def test_precedence(self):
+        scopes = VariableScopes.for_app('dev', 'registry/app:1', self.config, self.app_data)
+        container_scopes = scopes.for_container(self.container, 'dev', [('secrets', {'password': 'pw'})])
+        assert container_scopes.flatten() == {'environment': 'dev', 'image': 'registry/app:1', 'instances': 2,
+                                              'mem': 256, 'cpus': 0.5, 'password': 'pw'}
+        assert container_scopes.where('instances') == 'container vars.global'
+        assert container_scopes.where('mem') == 'config vars.environment.dev'
+        assert container_scopes.where('cpus') == 'app vars.environment.dev'
+        assert container_scopes.where('image') == 'environment and image'
+        assert container_scopes.where('password') == 'secrets'
+        assert container_scopes.where('missing') is None
+        assert 'password' in container_scopes and container_scopes['mem'] == 256
+        # Containers do not see each other's layers
+        assert 'password' not in scopes
+        assert scopes.for_container('plain', 'dev').get('instances') == 1
+
+    def test_template_variables(self):
+        roger_push = RogerPush()
+        variables = roger_push.templateVariables('prod', 'image', self.app_data, self.config, self.container,
+                                                 {'mem': 2048})
+        assert variables['mem'] == 2048
+        assert variables['instances'] == 2
+        assert variables['cpus'] == 0.1
+
+    def test_app_scopes_merged_once(self):
+        roger_push = RogerPush()
+        scopes = roger_push.get_app_scopes('dev', 'image', self.config, self.app_data)
+        assert roger_push.get_app_scopes('dev', 'image', self.config, self.app_data) is scopes
+        assert roger_push.get_app_scopes('prod', 'image', self.config, self.app_data) is not scopes
+        # Keyed by the config and app names, not by the objects
+        assert roger_push.get_app_scopes('dev', 'image', dict(self.config), dict(self.app_data)) is scopes
+        other_app = dict(self.app_data, name='api')
+        assert roger_push.get_app_scopes('dev', 'image', self.config, other_app) is not scopes
+
+    def test_template_variables_use_app_scopes(self):
+        roger_push = RogerPush()
+        scopes = roger_push.get_app_scopes('dev', 'image', self.config, self.app_data)
+        scopes.variables['mem'] = 512
+        variables = roger_push.templateVariables('dev', 'image', self.app_data, self.config, self.container, {})
+        assert variables['mem'] == 512
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/python
+
+from __future__ import print_function
+import unittest
+import os
+import sys
+import time
+from StringIO import StringIO
+sys.path.insert(0, os.path.abspath(os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "cli")))
+from cli.workerpool import WorkerPool
+
+# Test basic functionalities of WorkerPool class
+
+
+def slow_echo(item):
+    # Later items finish first
+    time.sleep(0.01 * (5 - item))
+    print("start {}".format(item))
+    print("done {}".format(item))
+    return item * 10
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def test_results_and_output_are_in_item_order(self):
+        results = WorkerPool(4).map(slow_echo, range(5))
+        assert results == [0, 10, 20, 30, 40]
+        expected = "".join("start {0}\ndone {0}\n".format(i) for i in range(5))
+        assert sys.stdout.getvalue() == expected
+
+    def test_sequential_when_parallelism_is_one(self):
+        assert WorkerPool(1).map(slow_echo, [1, 2]) == [10, 20]
+        assert WorkerPool(None).map(slow_echo, []) == []
+
+    def test_first_error_is_raised_after_output(self):
+        def fail_on_two(item):
+            print("item {}".format(item))
+            if item == 2:
+                raise ValueError("bad item {}".format(item))
+            return item
+
+        with self.assertRaises(ValueError) as context:
+            WorkerPool(2).map(fail_on_two, range(3))
+        assert str(context.exception) == "bad item 2"
+        assert sys.stdout.getvalue().startswith("item 0\nitem 1\nitem 2\n")
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+
+if __name__ == '__main__':
+    unittest.main()